@@ -1,9 +1,14 @@
+import pandas as pd
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 from .config import Config
 
+# Copy-on-Write：列子集、浅拷贝与 DataFrame 方法的返回值共享底层数组，只在真正写入时才复制。
+# 预处理/建模链路因此可以用 df[cols] 与 copy(deep=False) 代替整表深拷贝，也不会改写调用方（或缓存）的数据。
+pd.set_option('mode.copy_on_write', True)
+
 db = SQLAlchemy()
 migrate = Migrate()
 
@@ -27,6 +32,9 @@ def create_app(config_class=Config):
                 static_url_path='/')
     app.config.from_object(config_class)
 
+    from app.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -35,6 +43,9 @@ def create_app(config_class=Config):
     from app.api import register_blueprints
     register_blueprints(app)
 
+    from app.utils import alloc_report
+    alloc_report.init_app(app)
+
     @app.errorhandler(404)
     def not_found(e):
         from flask import request
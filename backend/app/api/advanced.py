@@ -35,7 +35,7 @@ def fit_rcs(current_user):
     if event_col: required_cols.append(event_col)
     
     # Optimization: Load only required columns
-    df = DataService.load_data_optimized(dataset.filepath, columns=required_cols)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required_cols, compact=True)
     
     # Validation
     features = [exposure] + covariates
@@ -79,7 +79,7 @@ def subgroup_analysis(current_user):
     # Deduplicate
     required = list(set(required))
     
-    df = DataService.load_data_optimized(dataset.filepath, columns=required)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, compact=True)
           
     results = AdvancedModelingService.perform_subgroup(
         df, target, event_col, exposure, subgroups, covariates, model_type
@@ -176,7 +176,7 @@ def compare_models(current_user):
         for f in conf['features']:
             required.add(f)
             
-    df = DataService.load_data_optimized(dataset.filepath, columns=list(required))
+    df = DataService.load_data_optimized(dataset.filepath, columns=list(required), compact=True)
              
     results = AdvancedModelingService.compare_models(
         df, target, model_configs, model_type, event_col
@@ -201,7 +201,7 @@ def fit_competing_risks(current_user):
         return jsonify({'message': 'Time, Event columns and Covariates are required.'}), 400
         
     required = [time_col, event_col] + covariates
-    df = DataService.load_data_optimized(dataset.filepath, columns=required)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, compact=True)
     
     # Check Integrity
     # We implicitly allow integer distinct events > 0
@@ -9,6 +9,17 @@ import traceback
 
 clinical_bp = Blueprint('clinical', __name__)
 
+def _attach_derived_columns(filepath, df_inputs, derived):
+    """
+    将基于投影输入列计算出的衍生列拼回完整数据集。
+
+    两次加载均未做行过滤，行顺序一致（DuckDB 保持插入顺序），因此可按索引直接对齐。
+    同名列（如重复衍生 eGFR）会被新值替换，与原先在完整数据集上计算的行为一致。
+    """
+    new_cols = [c for c in derived.columns if c not in df_inputs.columns]
+    full_df = DataService.load_data(filepath)
+    return full_df.assign(**{c: derived[c] for c in new_cols})
+
 @clinical_bp.route('/derive-egfr', methods=['POST'])
 @token_required
 def derive_egfr(current_user):
@@ -35,19 +46,22 @@ def derive_egfr(current_user):
         return jsonify({'message': 'Dataset not found or unauthorized'}), 404
         
     # Load data
-    df = DataService.load_data(dataset.filepath)
-    if df is None:
-        return jsonify({'message': 'Failed to load dataset'}), 500
-        
+    # NOTE: 逐行 apply 的开销与列数成正比，宽表上只对公式所需的输入列计算，
+    # 再把衍生列拼回完整数据集（完整数据集通常已在进程缓存中）。
+    df_inputs = DataService.load_data_optimized(dataset.filepath, columns=DataService.collect_columns(params), strict=False)
+    
     # Derive
-    new_df = PreprocessingService.derive_variable(df, formula_type, params)
+    derived = PreprocessingService.derive_variable(df_inputs, formula_type, params)
+    new_df = _attach_derived_columns(dataset.filepath, df_inputs, derived)
     
     # Save
     suffix = formula_type.replace('egfr_', 'Egfr')
     
     overwrite_id = dataset.id if save_mode == 'overwrite' else None
     
-    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, suffix, current_user.id, overwrite_id=overwrite_id)
+    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, suffix, current_user.id, overwrite_id=overwrite_id,
+                                                              action_type='derive', log={'type': formula_type, 'params': params},
+                                                              changed_columns=list(derived.columns))
     
     return jsonify({
         'message': 'Derived variable created successfully',
@@ -81,12 +95,15 @@ def stage_ckd(current_user):
     if not dataset or dataset.project.user_id != current_user.id:
         return jsonify({'message': 'Dataset not found or unauthorized'}), 404
         
-    df = DataService.load_data(dataset.filepath)
-    new_df = PreprocessingService.derive_ckd_staging(df, params)
+    df_inputs = DataService.load_data_optimized(dataset.filepath, columns=DataService.collect_columns(params), strict=False)
+    derived = PreprocessingService.derive_ckd_staging(df_inputs, params)
+    new_df = _attach_derived_columns(dataset.filepath, df_inputs, derived)
     
     overwrite_id = dataset.id if save_mode == 'overwrite' else None
     
-    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, 'Staged', current_user.id, overwrite_id=overwrite_id)
+    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, 'Staged', current_user.id, overwrite_id=overwrite_id,
+                                                              action_type='ckd_stage', log=params,
+                                                              changed_columns=list(derived.columns))
     
     return jsonify({
         'message': 'CKD Staging complete',
@@ -124,12 +141,15 @@ def melt_data(current_user):
     if not dataset or dataset.project.user_id != current_user.id:
         return jsonify({'message': 'Dataset not found or unauthorized'}), 404
         
-    df = DataService.load_data(dataset.filepath)
+    # 长表仅由 ID 列与各时间点列构成，无需加载其他列
+    df = DataService.load_data_optimized(dataset.filepath, columns=DataService.collect_columns(id_col, list(time_mapping.keys())), strict=False)
     new_df = PreprocessingService.melt_to_long(df, id_col, time_mapping, value_name)
     
     overwrite_id = dataset.id if save_mode == 'overwrite' else None
     
-    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, 'Long', current_user.id, overwrite_id=overwrite_id)
+    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, 'Long', current_user.id, overwrite_id=overwrite_id,
+                                                              action_type='melt',
+                                                              log={'id_col': id_col, 'time_mapping': time_mapping, 'value_name': value_name})
     
     return jsonify({
         'message': 'Data melted successfully',
@@ -167,7 +187,7 @@ def calculate_slope(current_user):
     if not dataset or dataset.project.user_id != current_user.id:
         return jsonify({'message': 'Dataset not found or unauthorized'}), 404
         
-    df = DataService.load_data(dataset.filepath)
+    df = DataService.load_data_optimized(dataset.filepath, columns=DataService.collect_columns(id_col, time_col, value_col))
     new_df = PreprocessingService.calculate_slope(df, id_col, time_col, value_col)
     
     # Merge slope back to original unique patient list?
@@ -176,7 +196,9 @@ def calculate_slope(current_user):
     # This is perfect for subsequent analysis.
     
     overwrite_id = dataset.id if save_mode == 'overwrite' else None
-    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, 'Slopes', current_user.id, overwrite_id=overwrite_id)
+    new_dataset = PreprocessingService.save_processed_dataset(dataset.id, new_df, 'Slopes', current_user.id, overwrite_id=overwrite_id,
+                                                              action_type='slope',
+                                                              log={'id_col': id_col, 'time_col': time_col, 'value_col': value_col})
     
     return jsonify({
         'message': 'Slope calculation complete',
@@ -4,12 +4,19 @@ app.api.data.py
 数据管理接口。
 提供数据上传、元数据查询及结果文件下载功能。
 """
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, Response, request, jsonify, current_app, send_file, send_from_directory
 from app.api.projects import token_required
 from app.services.data_service import DataService
+from app.services.eda_profile_service import EdaProfileService
+from app.services.export_service import ExportService
+from app.services.job_service import JobService
+from app.services.storage_service import StorageService
 from app.models.project import Project
 from app import db
+import json
 import os
+import unicodedata
+from urllib.parse import quote
 
 data_bp = Blueprint('data', __name__)
 
@@ -22,6 +29,8 @@ def upload_data(current_user, project_id):
     上传数据集文件。
     
     支持并发存入文件系统，并自动提取变量元数据存入数据库。
+    带 ?async=1 时导入在后台任务中执行：立即返回 202 与 job_id，
+    数据集以 pending 状态登记，元数据构建完成后置为 ready。
     """
     project = Project.query.get_or_404(project_id)
     if project.author != current_user:
@@ -34,22 +43,76 @@ def upload_data(current_user, project_id):
         return jsonify({'message': 'No selected file'}), 400
     
     if file:
-        # Save temp file for ingestion
+        # Save temp file for ingestion (hashed while streaming to disk)
+        upload_folder = current_app.config['UPLOAD_FOLDER']
         raw_filename = f"temp_{project_id}_{file.filename}"
-        raw_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], raw_filename)
+        raw_filepath = os.path.join(upload_folder, raw_filename)
         os.makedirs(os.path.dirname(raw_filepath), exist_ok=True)
-        file.save(raw_filepath)
-        
-        # Define target DuckDB file path
-        # Use simple replacing of extension or appending
-        base_name = os.path.splitext(file.filename)[0]
-        # Sanitize filename? relying on secure_filename upstream usually, but here simple
-        db_filename = f"project_{project_id}_{base_name}.duckdb"
-        db_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], db_filename)
+        digest = StorageService.save_upload(file.stream, raw_filepath)
+
+        ext = os.path.splitext(file.filename)[1].lower()
+        content_hash = StorageService.upload_hash(digest, ext)
+        # 编码只在这里按字节采样检测一次，随后传给导入并记录在数据集上
+        encoding = DataService.detect_encoding(raw_filepath) if ext == '.csv' else None
+
+        # 相同内容已导入过：直接引用已有文件与元数据，跳过导入与画像
+        existing = StorageService.find_reusable(content_hash)
+        if existing is not None:
+            os.remove(raw_filepath)
+            new_dataset = Dataset(
+                project_id=project.id,
+                name=file.filename,
+                filepath=existing.filepath,
+                content_hash=content_hash,
+                encoding=existing.encoding or encoding
+            )
+            new_dataset.meta_data = existing.meta_data
+            db.session.add(new_dataset)
+            db.session.flush()
+            project.active_dataset_id = new_dataset.id
+            db.session.commit()
+            EdaProfileService.schedule(existing.filepath)
+            return jsonify({
+                'message': 'File uploaded successfully (reused identical data)',
+                'dataset_id': new_dataset.id,
+                'metadata': new_dataset.meta_data,
+                'reused': True
+            }), 201
+
+        # Content-addressed DuckDB file; the raw upload is kept beside it for self-healing
+        db_filepath = StorageService.unique_path(StorageService.object_path(upload_folder, content_hash))
+        kept_raw = os.path.splitext(db_filepath)[0] + ext
+        os.replace(raw_filepath, kept_raw)
+        raw_filepath = kept_raw
+
+        if request.args.get('async', '').lower() in ('1', 'true'):
+            pending = Dataset(
+                project_id=project.id,
+                name=file.filename,
+                filepath=db_filepath,
+                content_hash=content_hash,
+                encoding=encoding,
+                status='pending'
+            )
+            db.session.add(pending)
+            db.session.commit()
+
+            app = current_app._get_current_object()
+            job = JobService.submit(
+                'ingest', _run_ingest_job, app, pending.id, raw_filepath, db_filepath, encoding,
+                owner_id=current_user.id,
+                on_cancel=lambda j: _discard_pending_dataset(app, pending.id),
+                on_error=lambda j, e: _mark_dataset_failed(app, pending.id)
+            )
+            return jsonify({
+                'message': 'Upload accepted, ingestion started',
+                'job_id': job.id,
+                'dataset_id': pending.id,
+                'status': 'pending'
+            }), 202
         
         # Ingest (Convert Raw -> DuckDB)
-        # This will remove the raw_filepath after success
-        DataService.ingest_data(raw_filepath, db_filepath)
+        DataService.ingest_data(raw_filepath, db_filepath, encoding=encoding)
         
         # Parse and get metadata (Reads from .duckdb now)
         metadata = DataService.get_initial_metadata(db_filepath)
@@ -58,13 +121,17 @@ def upload_data(current_user, project_id):
         new_dataset = Dataset(
             project_id=project.id,
             name=file.filename, # Keep original name
-            filepath=db_filepath
+            filepath=db_filepath,
+            content_hash=content_hash,
+            encoding=encoding
         )
         new_dataset.meta_data = metadata
         db.session.add(new_dataset)
         db.session.flush() # Get ID
         project.active_dataset_id = new_dataset.id
         db.session.commit()
+        # EDA 画像在后台预先算好，打开 EDA 页面时直接读取
+        EdaProfileService.schedule(db_filepath)
         
         return jsonify({
             'message': 'File uploaded successfully', 
@@ -72,6 +139,73 @@ def upload_data(current_user, project_id):
             'metadata': metadata
         }), 201
 
+def _run_ingest_job(job, app, dataset_id, raw_filepath, db_filepath, encoding=None):
+    """
+    后台导入任务：流式导入 -> 构建元数据 -> 数据集置为 ready 并设为当前数据集。
+    """
+    with app.app_context():
+        DataService.ingest_data(
+            raw_filepath, db_filepath,
+            progress_callback=lambda phase, read, total, rows: job.update(
+                phase=phase, bytes_read=read, bytes_total=total, rows=rows),
+            cancel_event=job.cancel_event,
+            encoding=encoding
+        )
+        job.update(phase='profiling')
+        metadata = DataService.get_initial_metadata(db_filepath)
+        job.check_cancelled()
+
+        dataset = db.session.get(Dataset, dataset_id)
+        if dataset is None:
+            # 数据集在导入期间被用户删除
+            raise ValueError("数据集已被删除")
+        dataset.meta_data = metadata
+        dataset.status = 'ready'
+        dataset.project.active_dataset_id = dataset.id
+        db.session.commit()
+        EdaProfileService.schedule(db_filepath)
+        job.update(phase='done')
+        return {'dataset_id': dataset_id, 'row_count': metadata.get('row_count')}
+
+def _discard_pending_dataset(app, dataset_id):
+    # 删除记录会触发 after_delete 监听器，一并清理写了一半的 DuckDB 文件
+    with app.app_context():
+        dataset = db.session.get(Dataset, dataset_id)
+        if dataset is not None:
+            db.session.delete(dataset)
+            db.session.commit()
+
+def _mark_dataset_failed(app, dataset_id):
+    with app.app_context():
+        dataset = db.session.get(Dataset, dataset_id)
+        if dataset is not None:
+            dataset.status = 'failed'
+            db.session.commit()
+
+@data_bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job(current_user, job_id):
+    """
+    查询后台任务进度 (phase, bytes_read, rows, status)。
+    """
+    job = JobService.get(job_id)
+    if job is None or job.owner_id != current_user.id:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@data_bp.route('/jobs/<job_id>', methods=['DELETE'])
+@token_required
+def cancel_job(current_user, job_id):
+    """
+    取消后台任务。导入中的数据集记录与文件会被清理。
+    """
+    job = JobService.get(job_id)
+    if job is None or job.owner_id != current_user.id:
+        return jsonify({'message': 'Job not found'}), 404
+    if not JobService.cancel(job_id):
+        return jsonify({'message': f'Job already {job.status}'}), 409
+    return jsonify({'message': 'Cancellation requested', 'job_id': job_id}), 202
+
 @data_bp.route('/metadata/<int:project_id>', methods=['GET'])
 @token_required
 def get_metadata(current_user, project_id):
@@ -87,7 +221,7 @@ def get_metadata(current_user, project_id):
             
     if not project.active_dataset_id or not dataset:
         # Fallback to latest
-        dataset = Dataset.query.filter_by(project_id=project.id).order_by(Dataset.created_at.desc()).first()
+        dataset = Dataset.query.filter_by(project_id=project.id, status='ready').order_by(Dataset.created_at.desc()).first()
     
     if not dataset:
          return jsonify({'message': 'No dataset found for this project'}), 404
@@ -95,10 +229,235 @@ def get_metadata(current_user, project_id):
     return jsonify({
         'dataset_id': dataset.id,
         'name': dataset.name,
+        'status': dataset.status,
         'metadata': dataset.meta_data,
         'created_at': dataset.created_at
     }), 200
          
+@data_bp.route('/<int:dataset_id>/profile', methods=['GET'])
+@token_required
+def get_dataset_profile(current_user, dataset_id):
+    """
+    按需获取数据集的逐列画像（计数、缺失、基数、最值、分位数、高频取值）。
+    可通过 ?columns=a,b 只取部分列；画像首次请求时生成并随数据文件持久化。
+    """
+    from app.services.profile_service import ProfileService
+
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.project.author != current_user:
+        return jsonify({'message': 'Permission denied'}), 403
+    if dataset.status != 'ready':
+        return jsonify({'message': f'Dataset is {dataset.status}'}), 409
+    if not os.path.exists(dataset.filepath):
+        return jsonify({'message': 'File not found'}), 404
+
+    profile = ProfileService.profile(dataset.filepath)
+    # 增量追加用的草图只在服务端使用
+    columns = [{k: v for k, v in c.items() if k != 'sketch'} for c in profile['columns']]
+    requested = request.args.get('columns')
+    if requested:
+        wanted = set(requested.split(','))
+        columns = [c for c in columns if c['name'] in wanted]
+
+    return jsonify(DataService.sanitize_for_json({
+        'dataset_id': dataset.id,
+        'version': dataset.version,
+        'row_count': profile['row_count'],
+        'columns': columns
+    })), 200
+
+@data_bp.route('/<int:dataset_id>/rows', methods=['GET'])
+@token_required
+def browse_dataset_rows(current_user, dataset_id):
+    """
+    按页浏览数据集（供虚拟滚动表格使用），投影/排序/过滤均在 DuckDB 中完成。
+    参数: columns=a,b  sort=a:desc,b  filter=[{"column","op","value"}] (JSON)
+          limit=200  cursor=<上一页的 next_cursor>  total=1（返回过滤后总行数）
+    返回按列组织的一页数据: {'columns', 'data': {列: [...]}, 'row_ids', 'rows', 'next_cursor'}。
+    """
+    from app.services.browse_service import BrowseService
+
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.project.author != current_user:
+        return jsonify({'message': 'Permission denied'}), 403
+    if dataset.status != 'ready':
+        return jsonify({'message': f'Dataset is {dataset.status}'}), 409
+    if not os.path.exists(dataset.filepath):
+        return jsonify({'message': 'File not found'}), 404
+
+    columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+    filters = request.args.get('filter')
+    if filters:
+        try:
+            filters = json.loads(filters)
+        except ValueError:
+            return jsonify({'message': 'filter must be a JSON array'}), 400
+        if isinstance(filters, dict):
+            filters = [filters]
+        if not isinstance(filters, list):
+            return jsonify({'message': 'filter must be a JSON array'}), 400
+
+    page = BrowseService.page(
+        dataset.filepath,
+        columns=columns,
+        sort=BrowseService.parse_sort(request.args.get('sort')),
+        filters=filters,
+        limit=request.args.get('limit'),
+        cursor=request.args.get('cursor'),
+        with_total=request.args.get('total', '').lower() in ('1', 'true')
+    )
+    page['dataset_id'] = dataset.id
+    page['version'] = dataset.version
+    return jsonify(page), 200
+
+@data_bp.route('/<int:dataset_id>/rows', methods=['POST'])
+@token_required
+def append_dataset_rows(current_user, dataset_id):
+    """
+    上传新一批数据 (CSV/Excel) 并追加到已有数据集（如登记库的月度增量），已有数据不重新导入。
+    结构按列名对齐，画像增量合并；数据集版本号递增，缓存随文件替换失效。
+    """
+    from app.services.preprocessing_service import PreprocessingService
+
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.project.author != current_user:
+        return jsonify({'message': 'Permission denied'}), 403
+    if dataset.status != 'ready':
+        return jsonify({'message': f'Dataset is {dataset.status}'}), 409
+    if not os.path.exists(dataset.filepath):
+        return jsonify({'message': 'File not found'}), 404
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return jsonify({'message': 'No file part'}), 400
+    ext = os.path.splitext(file.filename)[1].lower()
+    if ext not in ('.csv', '.xlsx', '.xls'):
+        return jsonify({'message': 'Unsupported format'}), 400
+
+    raw_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f"temp_append_{dataset_id}_{file.filename}")
+    os.makedirs(os.path.dirname(raw_filepath), exist_ok=True)
+    digest = StorageService.save_upload(file.stream, raw_filepath)
+    try:
+        encoding = DataService.detect_encoding(raw_filepath) if ext == '.csv' else None
+        old_filepath = dataset.filepath
+        if StorageService.is_shared(dataset):
+            # 写时复制：文件仍被其他数据集引用
+            target = StorageService.unique_path(old_filepath)
+        else:
+            # 原地替换。以增量形式依赖该文件的派生数据集先物化；同名原始文件已不能代表新内容，不再用于自愈
+            target = old_filepath
+            PreprocessingService.compact_dependents(dataset)
+        info = DataService.append_rows(raw_filepath, old_filepath, encoding=encoding, target_filepath=target)
+        if target == old_filepath and os.path.basename(target).startswith('ds_'):
+            stem = os.path.splitext(target)[0]
+            for path in (stem + e for e in ('.csv', '.xlsx', '.xls')):
+                if os.path.exists(path):
+                    os.remove(path)
+    finally:
+        if os.path.exists(raw_filepath):
+            os.remove(raw_filepath)
+
+    dataset.filepath = target
+    dataset.content_hash = StorageService.derived_hash(
+        dataset.content_hash, 'append_rows', {'batch': StorageService.upload_hash(digest, ext)})
+    # 画像已增量更新并绑定新文件版本，这里只读取不扫描；meta_data 赋值使版本号递增
+    dataset.meta_data = DataService.get_initial_metadata(target)
+    db.session.commit()
+    EdaProfileService.schedule(target)
+    return jsonify({
+        'message': 'Rows appended',
+        'dataset_id': dataset.id,
+        'version': dataset.version,
+        **info
+    }), 200
+
+@data_bp.route('/<int:dataset_id>/cohort', methods=['POST'])
+@token_required
+def create_cohort(current_user, dataset_id):
+    """
+    按纳入/排除条件创建队列子数据集（DuckDB 过滤视图，不复制数据）。
+    请求体: {'name', 'match': 'all'|'any', 'conditions': [{'column', 'op', 'value'}, ...], 'dry_run'}
+    dry_run 为真时只返回满足条件的行数，不创建数据集。
+    """
+    from app.services.cohort_service import CohortService
+
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if dataset.project.author != current_user:
+        return jsonify({'message': 'Permission denied'}), 403
+    if dataset.status != 'ready':
+        return jsonify({'message': f'Dataset is {dataset.status}'}), 409
+    if not os.path.exists(dataset.filepath):
+        return jsonify({'message': 'File not found'}), 404
+
+    data = request.get_json() or {}
+    definition = {'match': data.get('match', 'all'), 'conditions': data.get('conditions')}
+    if data.get('dry_run'):
+        info = CohortService.preview(dataset.filepath, definition)
+        return jsonify({k: info[k] for k in ('definition', 'row_count', 'parent_row_count')}), 200
+
+    cohort, info = CohortService.create_cohort(dataset, definition, name=data.get('name'))
+    return jsonify({
+        'message': 'Cohort created',
+        'new_dataset_id': cohort.id,
+        'definition': info['definition'],
+        'row_count': info['row_count'],
+        'parent_row_count': info['parent_row_count']
+    }), 201
+
+def _owned_dataset(dataset_id, current_user):
+    dataset = db.session.get(Dataset, dataset_id) if isinstance(dataset_id, int) else None
+    if dataset is None or dataset.project.author != current_user:
+        return None
+    return dataset
+
+@data_bp.route('/<int:dataset_id>/join', methods=['POST'])
+@token_required
+def join_datasets(current_user, dataset_id):
+    """
+    按键连接两个数据集（在 DuckDB 中执行），结果登记为当前数据集的派生数据集。
+    请求体: {'right_dataset_id', 'on' | 'left_on' + 'right_on', 'how', 'validate', 'suffixes', 'name'}
+    """
+    from app.services.merge_service import MergeService
+
+    data = request.get_json() or {}
+    left = _owned_dataset(dataset_id, current_user)
+    right = _owned_dataset(data.get('right_dataset_id'), current_user)
+    if left is None or right is None:
+        return jsonify({'message': 'Dataset not found'}), 404
+
+    dataset, info = MergeService.join(
+        left, right,
+        on=data.get('on'),
+        left_on=data.get('left_on'),
+        right_on=data.get('right_on'),
+        how=data.get('how', 'inner'),
+        validate=data.get('validate'),
+        suffixes=tuple(data.get('suffixes') or ('_x', '_y')),
+        name=data.get('name')
+    )
+    return jsonify({'message': 'Datasets joined', 'new_dataset_id': dataset.id, **info}), 201
+
+@data_bp.route('/<int:dataset_id>/append', methods=['POST'])
+@token_required
+def append_datasets(current_user, dataset_id):
+    """
+    将其他数据集按列名追加到当前数据集之后（在 DuckDB 中执行），结果登记为派生数据集。
+    请求体: {'dataset_ids': [...], 'source_column', 'name'}
+    """
+    from app.services.merge_service import MergeService
+
+    data = request.get_json() or {}
+    target = _owned_dataset(dataset_id, current_user)
+    ids = data.get('dataset_ids')
+    if not isinstance(ids, list) or not ids:
+        return jsonify({'message': 'dataset_ids must be a non-empty list'}), 400
+    others = [_owned_dataset(i, current_user) for i in ids]
+    if target is None or any(ds is None for ds in others):
+        return jsonify({'message': 'Dataset not found'}), 404
+
+    dataset, info = MergeService.append(target, others, source_column=data.get('source_column'),
+                                        name=data.get('name'))
+    return jsonify({'message': 'Datasets appended', 'new_dataset_id': dataset.id, **info}), 201
+
 @data_bp.route('/download/<filename>', methods=['GET'])
 def download_file(filename):
     # Security: Ensure filename is safe (simple check for now)
@@ -117,44 +476,81 @@ def download_file(filename):
 @token_required
 def download_dataset(current_user, dataset_id):
     """
-    Download dataset. Automatically converts DuckDB to CSV.
+    下载数据集。
+
+    Query Params:
+        format: csv (默认) | parquet | arrow
+        compression: gzip（csv / arrow 可用）
+
+    DuckDB 数据按 record batch 流式编码后直接写入响应，不落地临时文件；
+    首次导出的结果写入导出缓存，数据集版本不变时重复下载直接返回缓存文件。
     """
     dataset = db.session.get(Dataset, dataset_id)
     if not dataset:
         return jsonify({'message': 'Dataset not found'}), 404
     if dataset.project.author != current_user:
         return jsonify({'message': 'Permission denied'}), 403
+    if dataset.status != 'ready':
+        return jsonify({'message': f'Dataset is {dataset.status}'}), 409
 
     filepath = dataset.filepath
-    if not os.path.exists(filepath):
+    if not filepath or not os.path.exists(filepath):
         return jsonify({'message': 'File not found'}), 404
 
-    # Determine output filename (use original name from DB)
-    original_name = dataset.name
-    # Ensure it ends with .csv if we are converting
-    if not original_name.lower().endswith('.csv'):
-        original_name += '.csv'
+    try:
+        fmt, use_gzip = ExportService.resolve_format(request.args.get('format'), request.args.get('compression'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-    # If it's a DuckDB file, export to temp CSV
-    if filepath.endswith('.duckdb'):
-        try:
-            temp_dir = current_app.config['UPLOAD_FOLDER']
-            temp_filename = f"export_{dataset.id}_{original_name}"
-            temp_filepath = os.path.join(temp_dir, temp_filename)
-            
-            # Export
-            DataService.export_to_csv(filepath, temp_filepath)
-            
-            return send_from_directory(temp_dir, temp_filename, as_attachment=True, download_name=original_name)
-        except Exception as e:
-            current_app.logger.error(f"Export failed: {e}")
-            return jsonify({'message': f'Export failed: {str(e)}'}), 500
-    else:
-        # Fallback for legacy files
-        directory = os.path.dirname(filepath)
-        filename = os.path.basename(filepath)
-        return send_from_directory(directory, filename, as_attachment=True, download_name=original_name)
-    return send_from_directory(directory, filename, as_attachment=True)
+    download_name = ExportService.download_name(dataset.name, fmt, use_gzip)
+    mimetype = ExportService.mimetype(fmt, use_gzip)
+
+    # Legacy raw CSV files are already in the requested shape
+    if not filepath.endswith('.duckdb') and filepath.lower().endswith('.csv') and fmt == 'csv' and not use_gzip:
+        return send_file(filepath, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    cached = ExportService.cached(upload_folder, dataset, fmt, use_gzip)
+    if cached:
+        return send_file(cached, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+    version = dataset.version or 1
+    try:
+        chunks = ExportService.stream(
+            filepath, fmt, use_gzip,
+            cache_path=ExportService.cache_path(upload_folder, dataset, fmt, use_gzip),
+            on_cached=lambda _: ExportService.purge(upload_folder, dataset_id, keep_version=version)
+        )
+    except Exception as e:
+        current_app.logger.error(f"Export failed: {e}")
+        return jsonify({'message': f'Export failed: {str(e)}'}), 500
+
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = _content_disposition(download_name)
+    return response
+
+def _content_disposition(filename):
+    """与 send_file 相同的附件文件名编码（非 ASCII 文件名使用 RFC 5987 filename*）。"""
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return f'attachment; filename="{simple}"; filename*=UTF-8\'\'{quote(filename, safe="!#$&+-.^_`|~")}'
+
+@data_bp.route('/cache/stats', methods=['GET'])
+@token_required
+def cache_stats(current_user):
+    """
+    查看当前进程 DataFrame 缓存的命中/未命中计数与内存占用、各计算结果缓存（描述统计、相关矩阵、
+    近似 EDA 样本）的计数，以及 DuckDB 连接池状态。
+    """
+    from app.utils.frame_cache import frame_cache, result_caches
+    from app.utils.connection_pool import connection_pool
+    stats = frame_cache.stats()
+    stats['results'] = {name: cache.stats() for name, cache in result_caches.items()}
+    stats['connections'] = connection_pool.stats()
+    return jsonify(stats), 200
 
 @data_bp.route('/<int:dataset_id>', methods=['DELETE'])
 @token_required
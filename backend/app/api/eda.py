@@ -1,11 +1,83 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from app.services.approximate_eda_service import ApproximateEdaService
 from app.services.eda_service import EdaService
+from app.services.eda_profile_service import EdaProfileService
 from app.models.dataset import Dataset
 from app.models.project import Project
 from app.api.projects import token_required
 
 eda_bp = Blueprint('eda', __name__)
 
+def _flag(name):
+    return request.args.get(name, '').lower() in ('1', 'true')
+
+def _ndjson_line(obj):
+    return current_app.json.dumps(obj) + '\n'
+
+def _progressive(filepath, approximate, exact, columns=None):
+    """
+    渐进模式（?progressive=1）：以 NDJSON 流先返回样本上的近似结果，完整扫描结束后再返回精确结果。
+    每行 {'stage': 'approximate' | 'exact', 'result': 与非渐进模式相同的响应体}，近似行另含 row_count 与 sample_size。
+
+    请求指定了列时现场抽取只含这些列的样本；涉及全部列时只使用已缓存的样本（由 EDA 画像的后台任务预先抽取），
+    否则抽样本身就要读取每一列，不比精确计算快多少。
+    无可用样本（数据集较小、画像已可回答、非 DuckDB 格式、全部列的样本尚未抽取）时只有精确行；
+    精确阶段出错时最后一行为 {'stage': 'error', 'message'}。
+    """
+    info = None
+    if approximate is not None and filepath.endswith('.duckdb'):
+        info = ApproximateEdaService.sample(filepath, columns, build=columns is not None)
+    if info is None:
+        return Response(_ndjson_line({'stage': 'exact', 'result': exact()}), mimetype='application/x-ndjson')
+
+    # 近似阶段在响应开始前完成，参数错误仍按 400 返回
+    first = _ndjson_line({
+        'stage': 'approximate',
+        'row_count': info['row_count'],
+        'sample_size': info['sample_size'],
+        'result': approximate(info)
+    })
+
+    def generate():
+        yield first
+        try:
+            result = exact()
+        except Exception as e:
+            current_app.logger.error(f"Progressive EDA failed: {e}")
+            yield _ndjson_line({'stage': 'error', 'message': str(e)})
+            return
+        yield _ndjson_line({'stage': 'exact', 'result': result})
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@eda_bp.route('/profile/<int:dataset_id>', methods=['GET'])
+@token_required
+def get_profile(current_user, dataset_id):
+    """
+    获取预计算的 EDA 画像（描述统计、分布、相关性）。
+    画像尚未生成或已过期时提交后台构建并返回 202，前端稍后重试；
+    当前版本的数据构建失败时返回 500 与错误信息，不再重复提交。
+    """
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if not dataset.filepath.endswith('.duckdb'):
+        return jsonify({'message': 'EDA 画像仅支持已转换为 DuckDB 格式的数据集'}), 400
+    profile = EdaProfileService.load(dataset.filepath)
+    if profile is None:
+        error = EdaProfileService.failure(dataset.filepath)
+        if error is not None:
+            return jsonify({'status': 'failed', 'message': f'EDA 画像生成失败: {error}'}), 500
+        EdaProfileService.schedule(dataset.filepath, force=True)
+        return jsonify({'status': 'building'}), 202
+    return jsonify({
+        'status': 'ready',
+        'built_at': profile['built_at'],
+        'stats': profile['stats'],
+        'distributions': profile['distributions'],
+        'correlation': profile['correlation']
+    }), 200
+
 @eda_bp.route('/stats/<int:dataset_id>', methods=['GET'])
 @token_required
 def get_stats(current_user, dataset_id):
@@ -13,24 +85,119 @@ def get_stats(current_user, dataset_id):
     # Permission check or project check
     
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
-    stats = EdaService.get_basic_stats(df)
-    return jsonify({'stats': stats}), 200
+    if dataset.filepath.endswith('.duckdb'):
+        # 统计下推到 DuckDB，不物化整张表；?exact=1 时分位数与唯一值个数精确计算
+        exact = _flag('exact')
+        profile = None if exact else EdaProfileService.load(dataset.filepath)
+
+        def compute():
+            if profile is not None:
+                return {'stats': profile['stats']}
+            return {'stats': EdaService.get_basic_stats_sql(dataset.filepath, exact=exact)}
+    else:
+        def compute():
+            # EDA 只读描述统计，使用 Arrow 字符串列以降低宽表/字符串表的内存占用
+            df = DataService.load_data(dataset.filepath, arrow=True)
+            return {'stats': EdaService.get_basic_stats(df)}
+        profile = None
+
+    if _flag('progressive'):
+        approximate = None if profile is not None else (lambda info: {'stats': ApproximateEdaService.stats(info)})
+        return _progressive(dataset.filepath, approximate, compute)
+    return jsonify(compute()), 200
 
 @eda_bp.route('/correlation/<int:dataset_id>', methods=['GET'])
 @token_required
 def get_correlation(current_user, dataset_id):
     dataset = Dataset.query.get_or_404(dataset_id)
-    from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
-    corr_data = EdaService.get_correlation(df)
-    return jsonify(corr_data), 200
+    from app.services.correlation_service import CorrelationService
+    method = request.args.get('method', 'pearson')
+    columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+    top_k = request.args.get('top_k', type=int)
+    # 默认参数（Pearson、全部数值列）下优先读取预计算的画像
+    profile = EdaProfileService.load(dataset.filepath) if method == 'pearson' and columns is None else None
+    stored = None
+    if profile is not None:
+        if top_k is None:
+            stored = profile['correlation']['heatmap']
+        else:
+            stored = EdaProfileService.top_pairs(profile, top_k) if top_k > 0 else None
+
+    def compute():
+        if stored is not None:
+            return stored
+        if top_k is not None:
+            # 超宽数据：只返回相关性最强的 k 对变量，不返回完整热力图
+            return CorrelationService.dataset_top_pairs(dataset.filepath, method, top_k, columns)
+        result = CorrelationService.dataset_matrix(dataset.filepath, method, columns)
+        return EdaService.correlation_heatmap(result)
+
+    if _flag('progressive'):
+        approximate = None if stored is not None else (
+            lambda info: ApproximateEdaService.correlation(info, method, columns, top_k))
+        return _progressive(dataset.filepath, approximate, compute, columns)
+    return jsonify(compute()), 200
 
 @eda_bp.route('/distribution/<int:dataset_id>/<string:column>', methods=['GET'])
 @token_required
 def get_distribution(current_user, dataset_id, column):
     dataset = Dataset.query.get_or_404(dataset_id)
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
-    dist_data = EdaService.get_distribution(df, column)
-    return jsonify(dist_data), 200
+    if dataset.filepath.endswith('.duckdb'):
+        # 分箱 / 频数在 DuckDB 中聚合，只读取该列
+        from app.services.distribution_service import DistributionService
+        bins = DistributionService.parse_bins(request.args.get('bins'))
+        top_n = request.args.get('top_n', 20, type=int)
+        profile = EdaProfileService.load(dataset.filepath)
+        found, stored = EdaProfileService.distribution(profile, column, bins, top_n) if profile else (False, None)
+
+        def compute():
+            if found:
+                return stored
+            return DistributionService.distribution(dataset.filepath, column, bins, top_n)
+
+        approximate = None if found else (
+            lambda info: ApproximateEdaService.distributions(info, [column], bins, top_n).get(column))
+    else:
+        def compute():
+            df = DataService.load_data_optimized(dataset.filepath, columns=[column], dropna=[column], strict=False,
+                                                 arrow=True)
+            return EdaService.get_distribution(df, column)
+        approximate = None
+
+    if _flag('progressive'):
+        return _progressive(dataset.filepath, approximate, compute, [column])
+    return jsonify(compute()), 200
+
+@eda_bp.route('/distributions/<int:dataset_id>', methods=['GET'])
+@token_required
+def get_distributions(current_user, dataset_id):
+    """
+    批量获取多个变量的分布（EDA 缩略图），一次请求、每列只扫描一次。
+    参数: columns（逗号分隔，缺省为全部列）, bins, top_n。
+    """
+    dataset = Dataset.query.get_or_404(dataset_id)
+    if not dataset.filepath.endswith('.duckdb'):
+        return jsonify({'message': '批量分布仅支持已转换为 DuckDB 格式的数据集'}), 400
+    from app.services.distribution_service import DistributionService
+    columns = [c for c in request.args.get('columns', '').split(',') if c] or None
+    bins = DistributionService.parse_bins(request.args.get('bins'))
+    top_n = request.args.get('top_n', 10, type=int)
+    profile = EdaProfileService.load(dataset.filepath)
+    stored = None
+    if profile is not None:
+        wanted = columns if columns is not None else list(profile['distributions'])
+        found = {c: EdaProfileService.distribution(profile, c, bins, top_n) for c in wanted}
+        if all(ok for ok, _ in found.values()):
+            stored = {'distributions': {c: dist for c, (_, dist) in found.items()}}
+
+    def compute():
+        if stored is not None:
+            return stored
+        return {'distributions': DistributionService.batch(dataset.filepath, columns, bins, top_n)}
+
+    if _flag('progressive'):
+        approximate = None if stored is not None else (
+            lambda info: {'distributions': ApproximateEdaService.distributions(info, columns, bins, top_n)})
+        return _progressive(dataset.filepath, approximate, compute, columns)
+    return jsonify(compute()), 200
@@ -23,7 +23,9 @@ def fit_lmm(current_user):
         return jsonify({'message': 'Missing required parameters'}), 400
         
     dataset = Dataset.query.get_or_404(dataset_id)
-    df = DataService.load_data(dataset.filepath)
+    # LMM 只使用完整病例 (complete case)，所有涉及变量的缺失行可直接在 DuckDB 中剔除
+    required = DataService.collect_columns(id_col, time_col, outcome_col, fixed_effects)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, dropna=required)
     
     try:
         results = LongitudinalService.fit_lmm(df, id_col, time_col, outcome_col, fixed_effects)
@@ -45,7 +47,8 @@ def cluster_trajectories(current_user):
         return jsonify({'message': 'Missing required parameters'}), 400
         
     dataset = Dataset.query.get_or_404(dataset_id)
-    df = DataService.load_data(dataset.filepath)
+    required = DataService.collect_columns(id_col, time_col, outcome_col)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, dropna=required)
     
     try:
         results = LongitudinalService.cluster_trajectories(df, id_col, time_col, outcome_col, n_clusters)
@@ -65,7 +68,8 @@ def calculate_variability(current_user):
         return jsonify({'message': 'Missing required parameters'}), 400
         
     dataset = Dataset.query.get_or_404(dataset_id)
-    df = DataService.load_data(dataset.filepath)
+    required = DataService.collect_columns(id_col, outcome_col)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, dropna=required)
     
     try:
         results = LongitudinalService.calculate_variability(df, id_col, outcome_col)
@@ -73,7 +73,7 @@ def run_model(current_user):
     # Dedup strings
     required = list(set(required_cols))
     
-    df = DataService.load_data_optimized(dataset.filepath, columns=required)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, compact=True)
         
     # Run model
     results = ModelingService.run_model(df, model_type, target, features)
@@ -103,7 +103,7 @@ def export_model(current_user):
     # Dedup
     required = list(set(required))
     
-    df = DataService.load_data_optimized(dataset.filepath, columns=required)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, compact=True)
         
     # Run model
     results = ModelingService.run_model(df, model_type, target, features)
@@ -153,7 +153,7 @@ def select_variables(current_user):
         required_cols.append(target)
     
     required = list(set(required_cols))
-    df = DataService.load_data_optimized(dataset.filepath, columns=required)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, compact=True)
     
     # 执行筛选
     from app.services.model_selection_service import ModelSelectionService
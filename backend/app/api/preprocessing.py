@@ -37,7 +37,8 @@ def impute(current_user):
         current_user.id,
         parent_id=dataset_id,
         action_type='impute',
-        log=strategies
+        log=strategies,
+        changed_columns=list(strategies.keys())
     )
     return jsonify({'message': 'Imputation successful', 'new_dataset_id': new_dataset.id}), 200
 
@@ -63,7 +64,8 @@ def encode(current_user):
         current_user.id,
         parent_id=dataset_id,
         action_type='encode',
-        log={'columns': columns}
+        log={'columns': columns},
+        changed_columns=columns
     )
     return jsonify({'message': 'Encoding successful', 'new_dataset_id': new_dataset.id}), 200
 
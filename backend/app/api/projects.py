@@ -37,14 +37,8 @@ def get_project(current_user, project_id):
     if project.author != current_user:
         return jsonify({'message': 'Permission denied'}), 403
     
-    datasets = []
-    for ds in project.datasets:
-        datasets.append({
-            'id': ds.id,
-            'name': ds.name,
-            'created_at': ds.created_at,
-            'meta_data': ds.meta_data 
-        })
+    # 只返回摘要：逐列元数据与预览按需通过 /api/data/<id>/profile 获取
+    datasets = [ds.summary() for ds in project.datasets]
         
     return jsonify({
         'id': project.id,
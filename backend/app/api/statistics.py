@@ -31,7 +31,14 @@ def generate_table1(current_user):
     dataset = Dataset.query.get_or_404(dataset_id)
     
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
+    # 仅加载分组变量与待描述变量；分组缺失的行在服务中本就会被剔除，可直接下推
+    df = DataService.load_data_optimized(
+        dataset.filepath,
+        columns=DataService.collect_columns(group_by, variables),
+        dropna=[group_by] if group_by else None,
+        strict=False,
+        arrow=True
+    )
     
     result = StatisticsService.generate_table_one(df, group_by, variables)
     return jsonify({
@@ -57,7 +64,8 @@ def generate_km(current_user):
     dataset = Dataset.query.get_or_404(dataset_id)
     
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
+    required = DataService.collect_columns(time_col, event_col, group_col)
+    df = DataService.load_data_optimized(dataset.filepath, columns=required, dropna=required)
     
     result = StatisticsService.generate_km_data(df, time_col, event_col, group_col)
     return jsonify({'km_data': result}), 200
@@ -80,7 +88,13 @@ def perform_psm(current_user):
     dataset = Dataset.query.get_or_404(dataset_id)
     
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
+    from app.services.preprocessing_service import PreprocessingService
+    if save_result:
+        # 保存匹配结果需要完整列，且行索引必须与原始数据集一致，因此不做下推
+        df = DataService.load_data(dataset.filepath)
+    else:
+        required = DataService.collect_columns(treatment, covariates)
+        df = DataService.load_data_optimized(dataset.filepath, columns=required, dropna=required)
     
     result = StatisticsService.perform_psm(df, treatment, covariates)
     
@@ -90,29 +104,15 @@ def perform_psm(current_user):
         matched_indices = result['matched_indices']
         matched_df = df.loc[matched_indices]
         
-        # Save new file
-        new_filename = f"{os.path.splitext(dataset.name)[0]}_matched.csv"
-        new_filepath = os.path.join(os.path.dirname(dataset.filepath), new_filename)
-        matched_df.to_csv(new_filepath, index=False)
-        
-        # Create new Dataset record
+        # Save new dataset (matched rows only: stored as a row selection over the parent when possible)
         # For lineage in PSM, we treat original dataset as parent
-        import json
-        new_dataset = Dataset(
-            name=new_filename,
-            filepath=new_filepath,
-            project_id=dataset.project_id,
+        new_dataset = PreprocessingService.save_processed_dataset(
+            dataset.id, matched_df, 'matched', current_user.id,
             parent_id=dataset.id,
             action_type='psm',
-            action_log=json.dumps({'treatment': treatment, 'covariates': covariates})
+            log={'treatment': treatment, 'covariates': covariates}
         )
-        # Add metadata?
-        try:
-            new_dataset.meta_data = DataService.get_initial_metadata(new_filepath)
-        except:
-            new_dataset.meta_data = dataset.meta_data # Fallback
-        
-        db.session.add(new_dataset)
+        new_dataset.name = f"{os.path.splitext(dataset.name)[0]}_matched.csv"
         db.session.commit()
         matched_dataset_id = new_dataset.id
     
@@ -139,7 +139,12 @@ def perform_iptw(current_user):
         from flask import g
         
         dataset = Dataset.query.get_or_404(data.get('dataset_id'))
-        df = DataService.load_data(dataset.filepath)
+        if data.get('save'):
+            # 保存加权数据集需要完整列与原始行索引
+            df = DataService.load_data(dataset.filepath)
+        else:
+            required = DataService.collect_columns(data.get('treatment'), data.get('covariates'))
+            df = DataService.load_data_optimized(dataset.filepath, columns=required, dropna=required)
         
         res = StatisticsService.perform_iptw(
             df,
@@ -157,7 +162,10 @@ def perform_iptw(current_user):
             
             new_id = PreprocessingService.save_processed_dataset(
                 data.get('dataset_id'), subset_df, 'iptw', current_user.id,
-                log={'type': 'iptw', 'treatment': data.get('treatment')}
+                action_type='iptw',
+                log={'type': 'iptw', 'treatment': data.get('treatment'), 'covariates': data.get('covariates'),
+                     'weight_type': data.get('weight_type', 'ATE'), 'stabilized': data.get('stabilized', True),
+                     'truncate': data.get('truncate', True)}
             ).id
             res['new_dataset_id'] = new_id
             
@@ -183,7 +191,13 @@ def export_table1(current_user):
     dataset = Dataset.query.get_or_404(dataset_id)
     
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
+    df = DataService.load_data_optimized(
+        dataset.filepath,
+        columns=DataService.collect_columns(group_by, variables),
+        dropna=[group_by] if group_by else None,
+        strict=False,
+        arrow=True
+    )
     
     # 1. Generate Table 1 data
     res_dict = StatisticsService.generate_table_one(df, group_by, variables)
@@ -253,7 +267,7 @@ def check_health(current_user):
         
     dataset = Dataset.query.get_or_404(dataset_id)
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
+    df = DataService.load_data_optimized(dataset.filepath, columns=DataService.collect_columns(variables), strict=False, arrow=True)
     
     report = StatisticsService.check_data_health(df, variables)
     return jsonify({'report': report}), 200
@@ -273,7 +287,12 @@ def get_distribution(current_user):
         
     dataset = Dataset.query.get_or_404(dataset_id)
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
+    if dataset.filepath.endswith('.duckdb'):
+        from app.services.distribution_service import DistributionService
+        bins = DistributionService.parse_bins(data.get('bins'), default='auto')
+        dist = DistributionService.distribution(dataset.filepath, variable, bins, data.get('top_n') or 50)
+        return jsonify({'distribution': StatisticsService.format_distribution(dist)}), 200
+    df = DataService.load_data_optimized(dataset.filepath, columns=[variable], dropna=[variable], strict=False, arrow=True)
     
     dist_data = StatisticsService.get_distribution(df, variable)
     return jsonify({'distribution': dist_data}), 200
@@ -293,9 +312,9 @@ def check_collinearity(current_user):
         
     dataset = Dataset.query.get_or_404(dataset_id)
     from app.services.data_service import DataService
-    df = DataService.load_data(dataset.filepath)
+    df = DataService.load_data_optimized(dataset.filepath, columns=DataService.collect_columns(features))
     
-    result = StatisticsService.check_multicollinearity(df, features)
+    result = StatisticsService.check_multicollinearity(df, features, source=dataset.filepath)
     return jsonify(result), 200
 
 @statistics_bp.route('/recommend-model', methods=['POST'])
@@ -17,6 +17,79 @@ class Config:
     # Uploads in CWD
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'data')
 
+    # In-process DataFrame cache budget (per worker)
+    FRAME_CACHE_MAX_MB = int(os.environ.get('FRAME_CACHE_MAX_MB') or 1024)
+
+    # Ingestion: DuckDB spills to <db>.tmp beyond this limit; XLSX is streamed in row batches
+    INGEST_MEMORY_LIMIT = os.environ.get('INGEST_MEMORY_LIMIT') or '2GB'
+    INGEST_BATCH_ROWS = int(os.environ.get('INGEST_BATCH_ROWS') or 50000)
+    # CSV encoding is sniffed once from a sample of this many bytes (BOM, UTF-8 validity, GB18030)
+    ENCODING_SAMPLE_BYTES = int(os.environ.get('ENCODING_SAMPLE_BYTES') or 65536)
+
+    # Metadata profiling: exact COUNT(DISTINCT) up to this many rows, HyperLogLog beyond
+    PROFILE_EXACT_DISTINCT_MAX_ROWS = int(os.environ.get('PROFILE_EXACT_DISTINCT_MAX_ROWS') or 1000000)
+    PROFILE_BATCH_COLUMNS = int(os.environ.get('PROFILE_BATCH_COLUMNS') or 200)
+    # Appending rows merges profiles via per-column sketches: k smallest value hashes (distinct count)
+    PROFILE_SKETCH_SIZE = int(os.environ.get('PROFILE_SKETCH_SIZE') or 512)
+    # EDA descriptive stats: exact quantiles / distinct counts up to this many rows (or on request)
+    EDA_EXACT_STATS_MAX_ROWS = int(os.environ.get('EDA_EXACT_STATS_MAX_ROWS') or 100000)
+    EDA_STATS_CACHE_ENTRIES = int(os.environ.get('EDA_STATS_CACHE_ENTRIES') or 256)
+    # Correlation engine: columns per BLAS block, and in-process cache budget for correlation matrices
+    CORRELATION_BLOCK_COLUMNS = int(os.environ.get('CORRELATION_BLOCK_COLUMNS') or 512)
+    CORRELATION_CACHE_MAX_MB = int(os.environ.get('CORRELATION_CACHE_MAX_MB') or 256)
+    # Distribution endpoints: upper bound on histogram bins (rule-based or requested)
+    DISTRIBUTION_MAX_BINS = int(os.environ.get('DISTRIBUTION_MAX_BINS') or 1000)
+    # Precomputed EDA profile (<file>.eda.json) built in the background after each dataset is created:
+    # strongest correlation pairs kept, and full heatmap only up to this many numeric columns
+    EDA_PROFILE_PRECOMPUTE = (os.environ.get('EDA_PROFILE_PRECOMPUTE') or 'true').lower() in ('1', 'true', 'yes')
+    EDA_PROFILE_TOP_PAIRS = int(os.environ.get('EDA_PROFILE_TOP_PAIRS') or 50)
+    EDA_PROFILE_HEATMAP_MAX_COLUMNS = int(os.environ.get('EDA_PROFILE_HEATMAP_MAX_COLUMNS') or 100)
+    # Progressive EDA: approximate first answer from a Bernoulli sample of about this many rows
+    # (datasets no larger than this are always answered exactly); samples kept in memory per dataset version
+    EDA_SAMPLE_ROWS = int(os.environ.get('EDA_SAMPLE_ROWS') or 100000)
+    EDA_SAMPLE_CACHE_ENTRIES = int(os.environ.get('EDA_SAMPLE_CACHE_ENTRIES') or 8)
+    # Above this many rows the sample is drawn by data block (system) instead of row by row (bernoulli)
+    EDA_SAMPLE_BERNOULLI_MAX_ROWS = int(os.environ.get('EDA_SAMPLE_BERNOULLI_MAX_ROWS') or 1000000)
+
+    # Modeling loads (compact=True): string columns with at most this many distinct values,
+    # and at most this fraction of the row count, are loaded as pandas categoricals
+    COMPACT_CATEGORY_MAX_DISTINCT = int(os.environ.get('COMPACT_CATEGORY_MAX_DISTINCT') or 1000)
+    COMPACT_CATEGORY_MAX_RATIO = float(os.environ.get('COMPACT_CATEGORY_MAX_RATIO') or 0.5)
+
+    # Derived datasets are stored as deltas over their parent up to this chain depth,
+    # and only while at most this fraction of columns changed; otherwise a full file is written
+    DELTA_MAX_DEPTH = int(os.environ.get('DELTA_MAX_DEPTH') or 8)
+    DELTA_MAX_CHANGED_FRACTION = float(os.environ.get('DELTA_MAX_CHANGED_FRACTION') or 0.5)
+
+    # Dataset downloads are encoded and streamed in record batches of this many rows
+    EXPORT_BATCH_ROWS = int(os.environ.get('EXPORT_BATCH_ROWS') or 65536)
+
+    # Shared in-process DuckDB instance for read queries; dataset files are attached read-only
+    # and up to DUCKDB_POOL_SIZE initialised connections per file are kept for reuse
+    DUCKDB_MEMORY_LIMIT = os.environ.get('DUCKDB_MEMORY_LIMIT') or '4GB'
+    DUCKDB_THREADS = int(os.environ.get('DUCKDB_THREADS') or 0)  # 0: DuckDB default (all cores)
+    DUCKDB_POOL_SIZE = int(os.environ.get('DUCKDB_POOL_SIZE') or 4)
+    DUCKDB_POOL_IDLE_SECONDS = int(os.environ.get('DUCKDB_POOL_IDLE_SECONDS') or 300)
+    DUCKDB_POOL_MAX_FILES = int(os.environ.get('DUCKDB_POOL_MAX_FILES') or 64)
+
+    # Data browser: rows per page by default and at most (keyset-paginated in DuckDB)
+    BROWSE_PAGE_SIZE = int(os.environ.get('BROWSE_PAGE_SIZE') or 200)
+    BROWSE_MAX_PAGE_SIZE = int(os.environ.get('BROWSE_MAX_PAGE_SIZE') or 2000)
+
+    # Seconds to wait for a dataset file read/write lock (shared across gunicorn workers via flock)
+    DATASET_LOCK_TIMEOUT = float(os.environ.get('DATASET_LOCK_TIMEOUT') or 60)
+
+    # Diagnostics: trace allocations per /api request (tracemalloc, slow) and report the peak
+    # in an X-Alloc-Peak-Bytes header and the app log, with the top allocation sites
+    ALLOC_REPORT = (os.environ.get('ALLOC_REPORT') or '').lower() in ('1', 'true', 'yes')
+    ALLOC_REPORT_TOP = int(os.environ.get('ALLOC_REPORT_TOP') or 5)
+
+    # Background jobs (async upload ingestion)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS') or 2)
+    JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS') or 3600)
+
 class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # Tests build EDA profiles explicitly instead of in background jobs
+    EDA_PROFILE_PRECOMPUTE = False
@@ -134,7 +134,6 @@ class LogisticRegressionStrategy(BaseModelStrategy):
         
         # 5 折交叉验证
         from sklearn.model_selection import KFold
-        from sklearn.metrics import roc_auc_score
         
         kf = KFold(n_splits=5, shuffle=True, random_state=42)
         cv_aucs = []
@@ -146,18 +145,10 @@ class LogisticRegressionStrategy(BaseModelStrategy):
             y_reset = y.reset_index(drop=True)
             
             for train_index, test_index in kf.split(X_reset):
-                X_train, X_test = X_reset.iloc[train_index], X_reset.iloc[test_index]
-                y_train, y_test = y_reset.iloc[train_index], y_reset.iloc[test_index]
-                
-                # Fit on train
                 try:
-                    cv_model = sm.Logit(y_train, X_train)
-                    cv_res = cv_model.fit(disp=0)
-                    # 在测试集上进行预测
-                    y_cv_prob = cv_res.predict(X_test)
-                    
-                    if len(np.unique(y_test)) == 2:
-                        cv_aucs.append(roc_auc_score(y_test, y_cv_prob))
+                    auc_score = self._cv_fold_auc(X_reset, y_reset, train_index, test_index)
+                    if auc_score is not None:
+                        cv_aucs.append(auc_score)
                 except Exception:
                     continue # 跳过失败的折叠 (例如由于完全分离)
                     
@@ -177,6 +168,23 @@ class LogisticRegressionStrategy(BaseModelStrategy):
         
         return self._format_results(res, metrics, plots, vif_data)
 
+    @staticmethod
+    def _cv_fold_auc(X, y, train_index, test_index):
+        """
+        单折交叉验证的 AUC。每折的训练集副本与拟合结果在函数返回时即释放，
+        内存峰值不会叠加上一折尚未回收的数据。
+        """
+        from sklearn.metrics import roc_auc_score
+
+        X_train, y_train = X.iloc[train_index], y.iloc[train_index]
+        cv_res = sm.Logit(y_train, X_train).fit(disp=0)
+        # 在测试集上进行预测
+        y_test = y.iloc[test_index]
+        y_cv_prob = cv_res.predict(X.iloc[test_index])
+        if len(np.unique(y_test)) == 2:
+            return roc_auc_score(y_test, y_cv_prob)
+        return None
+
     def _format_results(self, res, metrics=None, plots=None, vif_data=None):
         summary = []
         params = res.params
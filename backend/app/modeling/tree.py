@@ -51,7 +51,7 @@ class TreeModelStrategy(BaseModelStrategy):
              y = pd.Categorical(y).codes
         
         # 对特征变量 X 进行编码 (稳健的分类变量处理)
-        X = X.copy()
+        # NOTE: X 是 df 的列子集，Copy-on-Write 下改写其列不会影响 df，无需预先复制
         for col in X.columns:
             if not pd.api.types.is_numeric_dtype(X[col]):
                 X[col] = X[col].astype(str)
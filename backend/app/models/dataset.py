@@ -1,4 +1,5 @@
 from app import db
+from sqlalchemy.orm import deferred
 import json
 
 class Dataset(db.Model):
@@ -12,38 +13,85 @@ class Dataset(db.Model):
     parent_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=True) # Source dataset
     action_type = db.Column(db.String(32), nullable=True) # e.g. 'upload', 'impute', 'encode', 'psm'
     action_log = db.Column(db.Text, nullable=True) # JSON Logs of parameters
+
+    # Ingestion state: 'pending' while a background import job runs, then 'ready' or 'failed'
+    status = db.Column(db.String(16), nullable=False, default='ready', server_default='ready')
     
-    # Metadata stored as JSON string
-    _metadata_json = db.Column("metadata", db.Text)
+    # Summary columns: cheap to list, kept in sync by the meta_data setter
+    row_count = db.Column(db.Integer, nullable=True)
+    column_count = db.Column(db.Integer, nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    # Content address (sha256) used to share physical files between identical uploads / derived steps
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
+
+    # Source text encoding detected at upload (CSV only, e.g. 'utf-8', 'gb18030')
+    encoding = db.Column(db.String(16), nullable=True)
+
+    # Metadata stored as JSON string (deferred: only loaded when meta_data is accessed)
+    _metadata_json = deferred(db.Column("metadata", db.Text))
     
     project = db.relationship('Project', foreign_keys=[project_id], backref=db.backref('datasets', lazy=True, cascade="all, delete-orphan"))
     parent = db.relationship('Dataset', remote_side=[id], backref=db.backref('children', lazy=True, cascade="all, delete-orphan"))
 
     @property
     def meta_data(self):
-        if self._metadata_json:
-            return json.loads(self._metadata_json)
-        return {}
+        # 解析结果缓存在实例上（实例随请求的 session 存活），同一请求内多次访问只解析一次。
+        # NOTE: 返回的是共享对象，修改后需重新赋值给 meta_data 才会持久化。
+        raw = self._metadata_json
+        if not raw:
+            return {}
+        cached = self.__dict__.get('_meta_cache')
+        if cached is not None and cached[0] is raw:
+            return cached[1]
+        value = json.loads(raw)
+        self.__dict__['_meta_cache'] = (raw, value)
+        return value
 
     @meta_data.setter
     def meta_data(self, value):
-        self._metadata_json = json.dumps(value)
+        raw = json.dumps(value)
+        self._metadata_json = raw
+        self.__dict__['_meta_cache'] = (raw, value)
+        value = value or {}
+        self.row_count = value.get('row_count')
+        self.column_count = len(value['variables']) if 'variables' in value else None
+        # 每次写入元数据都意味着底层数据被重写，版本号用于前端/缓存判断是否过期
+        self.version = (self.version or 0) + 1
+
+    def summary(self):
+        """
+        数据集摘要（不含逐列画像与预览），用于项目页的数据集列表。
+        """
+        return {
+            'id': self.id,
+            'name': self.name,
+            'created_at': self.created_at,
+            'status': self.status,
+            'parent_id': self.parent_id,
+            'action_type': self.action_type,
+            'action_log': self.action_log,
+            'row_count': self.row_count,
+            'column_count': self.column_count,
+            'version': self.version,
+            'encoding': self.encoding
+        }
 
     def __repr__(self):
         return '<Dataset {}>'.format(self.name)
 
 # Event listener for file cleanup
 from sqlalchemy import event
-import os
 
 @event.listens_for(Dataset, 'after_delete')
 def receive_after_delete(mapper, connection, target):
     """
-    Automatically delete the physical file when a Dataset record is deleted.
+    Automatically delete the physical file when the last Dataset record pointing at it is deleted.
     """
-    if target.filepath and os.path.exists(target.filepath):
-        try:
-            os.remove(target.filepath)
-        except OSError:
-            # Log warning in production, for now pass
-            pass
+    if target.filepath:
+        from app.services.storage_service import StorageService
+        StorageService.release(connection, Dataset.__table__, target.filepath)
+    from flask import current_app, has_app_context
+    if target.id is not None and has_app_context() and current_app.config.get('UPLOAD_FOLDER'):
+        from app.services.export_service import ExportService
+        ExportService.purge(current_app.config['UPLOAD_FOLDER'], target.id)
@@ -0,0 +1,215 @@
+"""
+app.services.approximate_eda_service.py
+
+近似 EDA（渐进式 EDA 的第一阶段）。
+千万行级的数据集即使统计下推到 DuckDB，完整扫描也需要数秒。本模块从数据集中抽取随机样本
+（期望样本量 EDA_SAMPLE_ROWS，固定种子，只读取请求需要的列），在样本上计算描述统计、分布与相关系数，
+计数按总行数放大，并给出 95% 置信区间：
+
+- 计数、缺失数、各箱 / 各类别频数：二项比例的 Wilson 区间；
+- 均值：mean ± z·s/√n；
+- 分位数：次序统计量区间（样本在 p ± z·√(p(1-p)/n) 处的分位数）；
+- 相关系数：Fisher z 变换（Spearman 的标准误按 √(1.06/(n-3)) 修正）。
+
+最值与唯一值个数取自样本，只是总体值的内界。区间按行独立入样计算；超大表使用块抽样，
+数据按某个变量排序存放时区间会偏窄。
+样本按数据集版本缓存在内存 DuckDB 中，同一数据集之后的近似请求不再读取数据文件；
+全部列的样本由 EDA 画像的后台任务预先抽取（见 EdaProfileService.schedule）。
+"""
+import math
+import os
+from contextlib import closing
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from app.config import Config
+from app.services.correlation_service import CorrelationService
+from app.services.data_service import DataService
+from app.services.distribution_service import DistributionService
+from app.services.eda_service import EdaService
+from app.utils.frame_cache import ResultCache
+
+Z = 1.959963984540054  # 95% 双侧正态分位数
+SAMPLE_SEED = 42
+
+# 键: (文件路径, 增量链各文件版本, 列 | None 表示全部列)，值: 样本信息（数据集不需要抽样时为 False）
+_samples = ResultCache('eda_samples', max_entries=Config.EDA_SAMPLE_CACHE_ENTRIES)
+
+
+class ApproximateEdaService:
+    @staticmethod
+    def sample(filepath, columns=None, build=True):
+        """
+        抽取 .duckdb 数据集（含增量链）的样本，按 (数据集版本, 列) 缓存；已缓存的列超集样本可直接复用。
+
+        只读取所需的列：不超过 EDA_SAMPLE_BERNOULLI_MAX_ROWS 行时逐行伯努利抽样，
+        更大的表按数据块 (system) 抽样，不逐行判断。
+
+        Args:
+            columns (list, optional): 需要的列；None 表示全部列。不存在的列被忽略。
+            build (bool): 为 False 时只查缓存，不读取数据文件。
+
+        Returns:
+            dict | None: {'con': 内存 DuckDB 连接（表 data 即样本）, 'row_count': 总行数, 'sample_size': 样本行数}；
+                         总行数不超过 EDA_SAMPLE_ROWS（精确计算本身已足够快）、没有可用的列、
+                         或 build=False 且尚无缓存时为 None。
+        """
+        base = (os.path.abspath(filepath), DataService.chain_version(filepath))
+        wanted = None if columns is None else list(dict.fromkeys(columns))
+        cached = _samples.find(base, lambda key, info: info if (
+            info is False or key[2] is None or (wanted is not None and set(wanted) <= set(key[2]))) else None)
+        if cached is not None:
+            return cached or None
+        if not build:
+            return None
+
+        info = False
+        q = DataService.quote_ident
+        with DataService.connect(filepath) as con:
+            row_count = con.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+            if row_count <= Config.EDA_SAMPLE_ROWS:
+                key = base + (None,)
+            else:
+                names = list(con.execute("SELECT * FROM data LIMIT 0").df().columns)
+                cols = names if wanted is None else [c for c in wanted if c in names]
+                if not cols:
+                    return None
+                key = base + (None if wanted is None else tuple(cols),)
+                method = 'bernoulli' if row_count <= Config.EDA_SAMPLE_BERNOULLI_MAX_ROWS else 'system'
+                percent = 100.0 * Config.EDA_SAMPLE_ROWS / row_count
+                table = con.execute(
+                    f"SELECT {', '.join(map(q, cols))} FROM data "
+                    f"USING SAMPLE {percent:.9f} PERCENT ({method}, {SAMPLE_SEED})"
+                ).arrow()
+                if table.num_rows < 2:
+                    return None
+                mem = duckdb.connect(':memory:')
+                mem.register('sample_rows', table)
+                mem.execute("CREATE TABLE data AS SELECT * FROM sample_rows")
+                mem.unregister('sample_rows')
+                info = {'con': mem, 'row_count': int(row_count), 'sample_size': table.num_rows}
+
+        _samples.put(key, info)
+        return info or None
+
+    @staticmethod
+    def stats(info):
+        """
+        样本上的描述统计，与 EdaService.get_basic_stats_sql 同构，另含:
+            'intervals': {'count', 'missing'[, 'mean', 'q25', 'q50', 'q75']: [下限, 上限]}。
+        count / missing / top_counts 为按总行数放大后的估计值。结果随样本缓存。
+        """
+        if 'stats' in info:
+            return [dict(col) for col in info['stats']]
+        N, n = info['row_count'], info['sample_size']
+        q = DataService.quote_ident
+        with closing(info['con'].cursor()) as con:
+            dtypes = con.execute("SELECT * FROM data LIMIT 0").df().dtypes
+            sql_types = {r[0]: r[1] for r in con.execute("DESCRIBE data").fetchall()}
+            # 分位数随后在 numpy 中按样本精确计算，聚合语句里用最便宜的近似分位数
+            stats = EdaService._aggregate_stats(con, dtypes, sql_types, n, False)
+            numeric = [s for s in stats if 'mean' in s and s['count'] > 0]
+            batch_size = max(1, Config.PROFILE_BATCH_COLUMNS)
+            for start in range(0, len(numeric), batch_size):
+                batch = numeric[start:start + batch_size]
+                arrays = con.execute(
+                    f"SELECT {', '.join(q(s['name']) + '::DOUBLE' for s in batch)} FROM data").fetchnumpy()
+                for s, values in zip(batch, arrays.values()):
+                    x = np.ma.getdata(values).astype(np.float64)
+                    x = np.sort(x[~np.ma.getmaskarray(values) & ~np.isnan(x)])
+                    # 分位数的次序统计量区间：每个分位数另取 p ± z·√(p(1-p)/n) 两个概率点
+                    intervals = {}
+                    for name, p in (('q25', 0.25), ('q50', 0.5), ('q75', 0.75)):
+                        half = Z * math.sqrt(p * (1 - p) / len(x))
+                        lo, mid, hi = np.quantile(x, [max(0.0, p - half), p, min(1.0, p + half)])
+                        s[name] = float(mid)
+                        intervals[name] = [float(lo), float(hi)]
+                    s['intervals'] = intervals
+
+        for s in stats:
+            intervals = s.pop('intervals', {})
+            sample_count = s['count']
+            count, count_ci = ApproximateEdaService._count_estimate(sample_count, n, N)
+            intervals['count'] = count_ci
+            intervals['missing'] = [N - count_ci[1], N - count_ci[0]]
+            s['count'], s['missing'] = count, N - count
+            if s.get('mean') is not None and s.get('std') is not None:
+                half = Z * s['std'] / math.sqrt(sample_count)
+                intervals['mean'] = [s['mean'] - half, s['mean'] + half]
+            if 'top_counts' in s:
+                s['top_counts'] = [ApproximateEdaService._count_estimate(c, n, N)[0] for c in s['top_counts']]
+            s['intervals'] = intervals
+        # 样本不变，结果随样本一起缓存
+        info['stats'] = DataService.sanitize_for_json(stats)
+        return [dict(col) for col in info['stats']]
+
+    @staticmethod
+    def distributions(info, columns=None, bins=20, top_n=20):
+        """
+        样本上的变量分布，见 DistributionService.batch。频数（y、other、stats.n）为按总行数放大后的估计值，
+        另含 'intervals': 与 y 等长的 [下限, 上限] 列表。分箱边界由样本的取值范围确定。
+        """
+        N, n = info['row_count'], info['sample_size']
+        with closing(info['con'].cursor()) as con:
+            result = DistributionService._batch(con, columns, bins, top_n)
+        for dist in result.values():
+            if dist is None:
+                continue
+            estimates = [ApproximateEdaService._count_estimate(k, n, N) for k in dist['y']]
+            dist['y'] = [est for est, _ in estimates]
+            dist['intervals'] = [ci for _, ci in estimates]
+            dist['stats']['n'] = ApproximateEdaService._count_estimate(dist['stats']['n'], n, N)[0]
+            if dist['type'] == 'categorical':
+                dist['other'] = ApproximateEdaService._count_estimate(dist['other'], n, N)[0]
+        return result
+
+    @staticmethod
+    def correlation(info, method='pearson', columns=None, top_k=None):
+        """
+        样本上的相关系数：top_k 为 None 时返回热力图（另含 'lower' / 'upper' 矩阵），
+        否则返回最强的 k 对变量（每对另含 'interval'）。counts 为样本中的逐对样本量。
+        """
+        q = DataService.quote_ident
+        with closing(info['con'].cursor()) as con:
+            names = list(con.execute("SELECT * FROM data LIMIT 0").df().columns)
+            if columns is not None:
+                names = [c for c in dict.fromkeys(columns) if c in names]
+            df = con.execute(f"SELECT {', '.join(map(q, names))} FROM data").df() if names else pd.DataFrame()
+
+        if top_k is not None:
+            result = CorrelationService.top_pairs(df, method, top_k)
+            for pair in result['pairs']:
+                lo, hi = ApproximateEdaService._fisher_interval(np.array(pair['r']), np.array(pair['n']), method)
+                pair['interval'] = [float(lo), float(hi)]
+            return DataService.sanitize_for_json(result)
+        result = CorrelationService.matrix(df, method)
+        heatmap = EdaService.correlation_heatmap(result)
+        lower, upper = ApproximateEdaService._fisher_interval(result['r'], result['n'], method)
+        heatmap['lower'] = DataService.sanitize_for_json(lower)
+        heatmap['upper'] = DataService.sanitize_for_json(upper)
+        return heatmap
+
+    @staticmethod
+    def _count_estimate(k, n, N):
+        """样本 n 行中有 k 行满足条件时，总体 N 行中满足条件的行数的估计值与 Wilson 95% 区间。"""
+        p = k / n
+        denom = 1 + Z * Z / n
+        center = (p + Z * Z / (2 * n)) / denom
+        half = Z * math.sqrt(p * (1 - p) / n + Z * Z / (4 * n * n)) / denom
+        lo = math.floor(max(0.0, center - half) * N + 1e-6)
+        hi = math.ceil(min(1.0, center + half) * N - 1e-6)
+        return int(round(p * N)), [lo, hi]
+
+    @staticmethod
+    def _fisher_interval(r, n, method):
+        """相关系数的 Fisher z 区间；逐对样本量不超过 3 或系数无法计算时为 NaN。"""
+        r = np.asarray(r, dtype=np.float64)
+        n = np.asarray(n, dtype=np.float64)
+        factor = 1.06 if method == 'spearman' else 1.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.arctanh(np.clip(r, -1 + 1e-12, 1 - 1e-12))
+            se = np.sqrt(factor / (n - 3))
+            se = np.where(n > 3, se, np.nan)
+            return np.tanh(z - Z * se), np.tanh(z + Z * se)
@@ -0,0 +1,256 @@
+"""
+app.services.browse_service.py
+
+数据浏览服务。
+为前端虚拟滚动表格按页读取数据集：列投影、排序、过滤均在 DuckDB 中执行，
+每次只物化一页（limit 行），不把整表加载进 pandas。
+
+分页采用 keyset（游标）方式：按 (排序列..., 行号) 定序，下一页的条件是“排在上一页最后一行之后”，
+不论翻到第几页，DuckDB 都只需一次带过滤的 Top-N 扫描，而 OFFSET 需要先产出并丢弃前面所有行。
+"""
+import base64
+import hashlib
+import json
+import math
+
+from app.config import Config
+from app.services.data_service import DataService
+
+# 原样返回的类型；其余类型（日期时间、嵌套、二进制等）转为字符串，DECIMAL / 超宽整数转为 DOUBLE
+_PLAIN_TYPES = {
+    'BOOLEAN', 'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT',
+    'UTINYINT', 'USMALLINT', 'UINTEGER', 'FLOAT', 'DOUBLE', 'VARCHAR'
+}
+_DOUBLE_TYPES = {'HUGEINT', 'UBIGINT'}
+
+COMPARE_OPS = {'eq': '=', 'ne': '<>', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+FILTER_OPS = set(COMPARE_OPS) | {'in', 'not_in', 'between', 'contains', 'starts_with', 'is_null', 'not_null'}
+
+
+class BrowseService:
+    @staticmethod
+    def parse_sort(spec):
+        """
+        解析排序参数 "col1:desc,col2"（默认升序）为 [(列名, 'ASC'|'DESC'), ...]。
+        """
+        keys = []
+        for item in (spec or '').split(','):
+            item = item.strip()
+            if not item:
+                continue
+            name, _, direction = item.rpartition(':')
+            if not name or direction.lower() not in ('asc', 'desc'):
+                name, direction = item, 'asc'
+            keys.append((name, direction.upper()))
+        return keys
+
+    @staticmethod
+    def page(filepath, columns=None, sort=None, filters=None, limit=None, cursor=None, with_total=False):
+        """
+        读取数据集的一页。
+
+        Args:
+            filepath (str): .duckdb 数据文件路径。
+            columns (list, optional): 投影列，默认全部列。
+            sort (list, optional): [(列名, 'ASC'|'DESC')]，空值始终排在最后；行号作为最终排序键。
+            filters (list, optional): [{'column', 'op', 'value'}]，多个条件之间为 AND。
+                op: eq / ne / lt / le / gt / ge / in / not_in / between / contains / starts_with / is_null / not_null
+            limit (int, optional): 每页行数，默认 Config.BROWSE_PAGE_SIZE，上限 Config.BROWSE_MAX_PAGE_SIZE。
+            cursor (str, optional): 上一页返回的 next_cursor；必须与本次的排序和过滤条件一致。
+            with_total (bool): 是否返回满足过滤条件的总行数（需额外一次计数扫描）。
+
+        Returns:
+            dict: {'columns': [{'name', 'type'}], 'data': {列名: [值, ...]}, 'row_ids': [...],
+                   'rows', 'next_cursor', 'total'(可选)}。
+                   row_ids 为行在数据集中的逻辑行号（从 0 开始）。
+
+        Raises:
+            ValueError: 列名、排序、过滤条件或游标无效。
+        """
+        if not filepath.endswith('.duckdb'):
+            raise ValueError("数据浏览仅支持已转换为 DuckDB 格式的数据集")
+        limit = BrowseService._limit(limit)
+        sort = list(sort or [])
+        filters = list(filters or [])
+        if not all(isinstance(f, dict) for f in filters):
+            raise ValueError("过滤条件必须为 {column, op, value} 对象列表")
+
+        keyed = len(DataService.lineage_chain(filepath)) > 1
+        # 物理文件以 rowid 为行号；增量数据集以 __keyed 视图中的逻辑行序 __ord 为行号
+        source, row_expr = ("__keyed", "t.__ord") if keyed else ("data", "t.rowid")
+
+        with DataService.connect(filepath) as con:
+            schema = [(r[0], str(r[1]).upper()) for r in con.execute("DESCRIBE SELECT * FROM data").fetchall()]
+            types = dict(schema)
+            missing = [c for c in (columns or []) if c not in types]
+            missing += [c for c, _ in sort if c not in types]
+            missing += [f.get('column') for f in filters if f.get('column') not in types]
+            if missing:
+                raise ValueError(f"列不存在: {', '.join(map(str, dict.fromkeys(missing)))}")
+            selected = list(dict.fromkeys(columns)) if columns else [name for name, _ in schema]
+
+            params = []
+            where = [BrowseService._filter_sql(f, types[f['column']], params) for f in filters]
+            filter_params = list(params)
+            token = BrowseService._token(sort, filters)
+            if cursor:
+                where.append(BrowseService._after_sql(BrowseService._decode_cursor(cursor, token),
+                                                      sort, types, row_expr, params))
+
+            select = [f"{row_expr} AS __row"]
+            select += [f"{BrowseService._output_expr(f't.{DataService.quote_ident(c)}', types[c])} AS __c{i}"
+                       for i, c in enumerate(selected)]
+            select += [f"t.{DataService.quote_ident(c)} AS __k{j}" for j, (c, _) in enumerate(sort)]
+            order = [f"t.{DataService.quote_ident(c)} {d} NULLS LAST" for c, d in sort] + [f"{row_expr} ASC"]
+            where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+
+            sql = (f"SELECT {', '.join(select)} FROM {source} t{where_sql} "
+                   f"ORDER BY {', '.join(order)} LIMIT {limit + 1}")
+            try:
+                BrowseService._check_values(con, filters, types)
+                rows = con.execute(sql, params).fetchall()
+                total = None
+                if with_total:
+                    count_where = f" WHERE {' AND '.join(where[:len(filters)])}" if filters else ""
+                    total = con.execute(f"SELECT COUNT(*) FROM {source} t{count_where}", filter_params).fetchone()[0]
+            except Exception as e:
+                # 过滤值无法转换为列类型等输入错误
+                if type(e).__name__ in ('ConversionException', 'InvalidInputException', 'BinderException'):
+                    raise ValueError(f"过滤条件无效: {e}")
+                raise
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        values = list(zip(*rows)) if rows else [()] * (1 + len(selected) + len(sort))
+        result = {
+            'columns': [{'name': c, 'type': types[c]} for c in selected],
+            'data': {c: list(values[1 + i]) for i, c in enumerate(selected)},
+            'row_ids': list(values[0]),
+            'rows': len(rows),
+            'next_cursor': None
+        }
+        if has_more:
+            last = rows[-1]
+            keys = [last[1 + len(selected) + j] for j in range(len(sort))]
+            result['next_cursor'] = BrowseService._encode_cursor(keys, last[0], token)
+        if with_total:
+            result['total'] = int(total)
+        return result
+
+    @staticmethod
+    def _limit(limit):
+        if limit is None:
+            return Config.BROWSE_PAGE_SIZE
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError("limit 必须为整数")
+        if limit < 1:
+            raise ValueError("limit 必须大于 0")
+        return min(limit, Config.BROWSE_MAX_PAGE_SIZE)
+
+    @staticmethod
+    def _output_expr(expr, dtype):
+        if dtype in _PLAIN_TYPES:
+            return expr
+        if dtype in _DOUBLE_TYPES or dtype.startswith('DECIMAL'):
+            return f"CAST({expr} AS DOUBLE)"
+        return f"CAST({expr} AS VARCHAR)"
+
+    @staticmethod
+    def _filter_sql(f, dtype, params):
+        col = f"t.{DataService.quote_ident(f['column'])}"
+        op = f.get('op', 'eq')
+        value = f.get('value')
+        if op not in FILTER_OPS:
+            raise ValueError(f"不支持的过滤操作: {op}")
+        if op == 'is_null':
+            return f"{col} IS NULL"
+        if op == 'not_null':
+            return f"{col} IS NOT NULL"
+        if op in ('contains', 'starts_with'):
+            if value is None:
+                raise ValueError(f"过滤操作 {op} 需要提供 value")
+            params.append(str(value).lower())
+            return f"{op}(lower(CAST({col} AS VARCHAR)), ?)"
+        if op in ('in', 'not_in', 'between'):
+            if not isinstance(value, list) or not value or (op == 'between' and len(value) != 2):
+                raise ValueError(f"过滤操作 {op} 的 value 必须为{'两个元素的' if op == 'between' else '非空'}列表")
+            params.extend(value)
+            placeholders = [f"CAST(? AS {dtype})"] * len(value)
+            if op == 'between':
+                return f"{col} BETWEEN {placeholders[0]} AND {placeholders[1]}"
+            return f"{col} {'NOT IN' if op == 'not_in' else 'IN'} ({', '.join(placeholders)})"
+        if value is None:
+            raise ValueError(f"过滤操作 {op} 需要提供 value；空值请使用 is_null / not_null")
+        params.append(value)
+        return f"{col} {COMPARE_OPS[op]} CAST(? AS {dtype})"
+
+    @staticmethod
+    def _check_values(con, filters, types):
+        # 过滤条件下推到扫描后，无法转换的值只会得到空结果而不报错：先显式转换一次
+        casts, values = [], []
+        for f in filters:
+            if f.get('op', 'eq') in ('is_null', 'not_null', 'contains', 'starts_with'):
+                continue
+            value = f.get('value')
+            for v in (value if isinstance(value, list) else [value]):
+                casts.append(f"CAST(? AS {types[f['column']]})")
+                values.append(v)
+        if casts:
+            con.execute(f"SELECT {', '.join(casts)}", values).fetchall()
+
+    @staticmethod
+    def _after_sql(position, sort, types, row_expr, params):
+        """
+        “排在游标位置之后”的条件（空值排最后）：
+        (k1 在 v1 之后) OR (k1 = v1 AND k2 在 v2 之后) OR ... OR (所有键相等 AND 行号 > r)。
+        """
+        keys, row = position
+        if len(keys) != len(sort):
+            raise ValueError("游标与排序条件不匹配")
+        terms, equal, equal_params = [], [], []
+        for (name, direction), value in zip(sort, keys):
+            col = f"t.{DataService.quote_ident(name)}"
+            cast = f"CAST(? AS {types[name]})"
+            if value is None:
+                equal.append(f"{col} IS NULL")
+                continue
+            # 空值排在最后：任何非空位置之后都包含该列的全部空值
+            op = '>' if direction == 'ASC' else '<'
+            terms.append(equal + [f"({col} {op} {cast} OR {col} IS NULL)"])
+            params.extend(equal_params + [value])
+            equal.append(f"{col} IS NOT DISTINCT FROM {cast}")
+            equal_params.append(value)
+        terms.append(equal + [f"{row_expr} > ?"])
+        params.extend(equal_params + [row])
+        return "(" + " OR ".join("(" + " AND ".join(conds) + ")" for conds in terms) + ")"
+
+    @staticmethod
+    def _token(sort, filters):
+        # 游标只对生成它的排序/过滤条件有效
+        spec = json.dumps([sort, filters], sort_keys=True, default=str)
+        return hashlib.sha1(spec.encode('utf-8')).hexdigest()[:12]
+
+    @staticmethod
+    def _encode_cursor(keys, row, token):
+        def plain(v):
+            if v is None or isinstance(v, (bool, int, str)):
+                return v
+            if isinstance(v, float) and math.isfinite(v):
+                return v
+            return str(v)  # 日期、Decimal、NaN/Inf 等以字符串传递，查询时 CAST 回列类型
+        payload = json.dumps({'k': [plain(v) for v in keys], 'r': int(row), 't': token}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _decode_cursor(cursor, token):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            keys, row, cursor_token = payload['k'], int(payload['r']), payload['t']
+        except Exception:
+            raise ValueError("无效的分页游标")
+        if cursor_token != token:
+            raise ValueError("分页游标与当前的排序/过滤条件不匹配")
+        return keys, row
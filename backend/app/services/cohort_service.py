@@ -0,0 +1,184 @@
+"""
+app.services.cohort_service.py
+
+队列（Cohort）筛选服务。
+将纳入/排除条件编译为 DuckDB 谓词，并保存为引用父数据集的过滤视图（见 DataService.save_filtered）：
+子数据集不复制任何行，所有分析接口经常规加载路径（data 视图）读取筛选后的数据，行数由 COUNT(*) 得到。
+"""
+import json
+import math
+import os
+
+from app import db
+from app.models.dataset import Dataset
+from app.services.browse_service import FILTER_OPS, COMPARE_OPS
+from app.services.data_service import DataService
+from app.services.eda_profile_service import EdaProfileService
+from app.services.storage_service import StorageService
+
+
+class CohortService:
+    @staticmethod
+    def normalize(definition):
+        """
+        校验并规范化队列定义。
+
+        定义格式: {'match': 'all'|'any', 'conditions': [条件或嵌套定义, ...]}
+        条件格式: {'column', 'op', 'value'}，op 与数据浏览的过滤操作一致
+                 (eq / ne / lt / le / gt / ge / in / not_in / between / contains / starts_with / is_null / not_null)。
+
+        Raises:
+            ValueError: 定义格式无效。
+        """
+        if not isinstance(definition, dict):
+            raise ValueError("队列定义必须为对象")
+        match = definition.get('match', 'all')
+        conditions = definition.get('conditions')
+        if match not in ('all', 'any'):
+            raise ValueError("match 必须为 all 或 any")
+        if not isinstance(conditions, list) or not conditions:
+            raise ValueError("队列定义至少需要一个条件")
+
+        normalized = []
+        for cond in conditions:
+            if isinstance(cond, dict) and 'conditions' in cond:
+                normalized.append(CohortService.normalize(cond))
+                continue
+            if not isinstance(cond, dict) or not cond.get('column'):
+                raise ValueError("条件必须为 {column, op, value} 对象")
+            op = cond.get('op', 'eq')
+            if op not in FILTER_OPS:
+                raise ValueError(f"不支持的过滤操作: {op}")
+            item = {'column': cond['column'], 'op': op}
+            if op not in ('is_null', 'not_null'):
+                item['value'] = cond.get('value')
+            normalized.append(item)
+        return {'match': match, 'conditions': normalized}
+
+    @staticmethod
+    def compile(definition, types):
+        """
+        将规范化后的定义编译为 SQL 谓词（值以经过转义的字面量内联，视图中不能使用绑定参数）。
+
+        Args:
+            definition (dict): normalize() 的结果。
+            types (dict): {列名: DuckDB 类型}。
+
+        Returns:
+            str: 可直接用于 WHERE 的条件表达式。
+        """
+        parts = []
+        for cond in definition['conditions']:
+            if 'conditions' in cond:
+                parts.append(f"({CohortService.compile(cond, types)})")
+            else:
+                parts.append(CohortService._condition_sql(cond, types))
+        return f" {'AND' if definition['match'] == 'all' else 'OR'} ".join(parts)
+
+    @staticmethod
+    def _condition_sql(cond, types):
+        name, op, value = cond['column'], cond['op'], cond.get('value')
+        if name not in types:
+            raise ValueError(f"列不存在: {name}")
+        col = DataService.quote_ident(name)
+        if op == 'is_null':
+            return f"{col} IS NULL"
+        if op == 'not_null':
+            return f"{col} IS NOT NULL"
+        if op in ('contains', 'starts_with'):
+            if value is None:
+                raise ValueError(f"过滤操作 {op} 需要提供 value")
+            return f"{op}(lower(CAST({col} AS VARCHAR)), {CohortService._literal(str(value).lower())})"
+        dtype = types[name]
+        if op in ('in', 'not_in', 'between'):
+            if not isinstance(value, list) or not value or (op == 'between' and len(value) != 2):
+                raise ValueError(f"过滤操作 {op} 的 value 必须为{'两个元素的' if op == 'between' else '非空'}列表")
+            items = [CohortService._literal(v, dtype) for v in value]
+            if op == 'between':
+                return f"{col} BETWEEN {items[0]} AND {items[1]}"
+            return f"{col} {'NOT IN' if op == 'not_in' else 'IN'} ({', '.join(items)})"
+        if value is None:
+            raise ValueError(f"过滤操作 {op} 需要提供 value；空值请使用 is_null / not_null")
+        return f"{col} {COMPARE_OPS[op]} {CohortService._literal(value, dtype)}"
+
+    @staticmethod
+    def _literal(value, dtype=None):
+        if isinstance(value, (dict, list)) or value is None:
+            raise ValueError(f"无效的过滤值: {value!r}")
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValueError(f"无效的过滤值: {value!r}")
+        text = "'" + str(value).replace("'", "''") + "'"
+        return f"CAST({text} AS {dtype})" if dtype else text
+
+    @staticmethod
+    def preview(filepath, definition):
+        """
+        编译定义并在父数据上计数（同时校验过滤值能否转换为列类型）。
+
+        Returns:
+            dict: {'definition', 'predicate', 'row_count', 'parent_row_count'}。
+
+        Raises:
+            ValueError: 定义无效、列不存在或过滤值类型不符。
+        """
+        if not filepath.endswith('.duckdb'):
+            raise ValueError("队列筛选仅支持已转换为 DuckDB 格式的数据集")
+        definition = CohortService.normalize(definition)
+        with DataService.connect(filepath) as con:
+            types = {r[0]: str(r[1]).upper() for r in con.execute("DESCRIBE SELECT * FROM data").fetchall()}
+            predicate = CohortService.compile(definition, types)
+            try:
+                row_count, parent_row_count = con.execute(
+                    f"SELECT COUNT(*) FILTER (WHERE {predicate}), COUNT(*) FROM data"
+                ).fetchone()
+            except Exception as e:
+                if type(e).__name__ in ('ConversionException', 'InvalidInputException', 'BinderException'):
+                    raise ValueError(f"过滤条件无效: {e}")
+                raise
+        return {
+            'definition': definition,
+            'predicate': predicate,
+            'row_count': int(row_count),
+            'parent_row_count': int(parent_row_count)
+        }
+
+    @staticmethod
+    def create_cohort(dataset, definition, name=None):
+        """
+        在数据集上创建队列子数据集（过滤视图）。
+
+        定义记录在子数据集的 action_log（action_type='cohort'）；
+        相同父数据与相同定义的队列按内容寻址复用已有文件。
+
+        Returns:
+            tuple: (新 Dataset, preview() 的结果)。
+        """
+        info = CohortService.preview(dataset.filepath, definition)
+        definition = info['definition']
+
+        dir_name = os.path.dirname(dataset.filepath)
+        name_part, ext = os.path.splitext(os.path.basename(dataset.filepath))
+        display_part = os.path.splitext(dataset.name)[0] if dataset.name else name_part
+
+        content_hash = StorageService.derived_hash(dataset.content_hash, 'cohort', definition)
+        existing = StorageService.find_reusable(content_hash)
+        if existing is not None:
+            filepath = existing.filepath
+        else:
+            filepath = StorageService.unique_path(os.path.join(dir_name, f"{name_part}_cohort{ext}"))
+            DataService.save_filtered(filepath, dataset.filepath, info['predicate'], definition)
+
+        cohort = Dataset(
+            project_id=dataset.project_id,
+            name=name or f"{display_part}_cohort{ext}",
+            filepath=filepath,
+            parent_id=dataset.id,
+            action_type='cohort',
+            action_log=json.dumps(definition, ensure_ascii=False),
+            content_hash=content_hash
+        )
+        cohort.meta_data = existing.meta_data if existing is not None else DataService.get_initial_metadata(filepath)
+        db.session.add(cohort)
+        db.session.commit()
+        EdaProfileService.schedule(filepath)
+        return cohort, info
@@ -0,0 +1,235 @@
+"""
+app.services.correlation_service.py
+
+相关系数引擎。
+Pearson 与 Spearman（先做秩变换再求 Pearson）均以分块矩阵乘法 (BLAS) 计算：缺失值以 0/1 掩码参与运算，
+每对变量使用两者均非缺失的行（逐对完整样本，与 pandas DataFrame.corr 一致），并给出每对的样本量。
+超宽数据可只返回 |r| 最大的 k 对，不构造完整的 N×N 矩阵。
+数据集上的结果按 (数据集版本, 方法, 列) 缓存，EDA 热力图与共线性检查共用；
+逐对完整样本下每对的结果与其他列无关，因此列子集可直接从已缓存的矩阵中切出。
+"""
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from app.config import Config
+from app.services.data_service import DataService
+from app.utils.frame_cache import ResultCache
+
+METHODS = ('pearson', 'spearman')
+
+# 键: (文件路径, 增量链各文件版本, 方法, 变体)
+_cache = ResultCache('correlation', max_bytes=Config.CORRELATION_CACHE_MAX_MB * 1024 * 1024)
+
+
+class CorrelationService:
+    @staticmethod
+    def matrix(df, method='pearson'):
+        """
+        计算 DataFrame 中数值列的相关系数矩阵。
+
+        Args:
+            df (pd.DataFrame): 数据；非数值列被忽略。
+            method (str): 'pearson' 或 'spearman'。
+
+        Returns:
+            dict: {'method', 'columns', 'r': N×N 相关系数（无法计算处为 NaN）, 'n': N×N 逐对样本量}。
+
+        NOTE: Spearman 的秩在各列自身的非缺失值上计算；存在缺失值时与逐对重新排秩的结果略有差异。
+        """
+        names, X = CorrelationService._prepare(df, method)
+        size = len(names)
+        r = np.full((size, size), np.nan)
+        n = np.zeros((size, size), dtype=np.int64)
+        for a, b, r_block, n_block in CorrelationService._blocks(X):
+            r[a, b], n[a, b] = r_block, n_block
+            r[b, a], n[b, a] = r_block.T, n_block.T
+        return {'method': method, 'columns': names, 'r': r, 'n': n}
+
+    @staticmethod
+    def top_pairs(df, method='pearson', k=50, min_count=3):
+        """
+        返回 |r| 最大的 k 对变量，逐块扫描，内存占用与列数的平方无关。
+
+        Args:
+            min_count (int): 逐对样本量少于该值的变量对不参与排序。
+
+        Returns:
+            dict: {'method', 'column_count', 'pairs': [{'x', 'y', 'r', 'n'}, ...]}（按 |r| 降序）。
+        """
+        if not isinstance(k, int) or k < 1:
+            raise ValueError("k 必须为正整数")
+        names, X = CorrelationService._prepare(df, method)
+        rows = np.empty(0, dtype=np.int64)
+        cols = np.empty(0, dtype=np.int64)
+        rs = np.empty(0)
+        ns = np.empty(0, dtype=np.int64)
+        for a, b, r_block, n_block in CorrelationService._blocks(X):
+            valid = ~np.isnan(r_block) & (n_block >= min_count)
+            if a.start == b.start:
+                valid &= np.triu(np.ones(valid.shape, dtype=bool), 1)
+            idx = np.flatnonzero(valid)
+            if len(idx) > k:
+                idx = idx[np.argpartition(-np.abs(r_block.flat[idx]), k - 1)[:k]]
+            i, j = np.unravel_index(idx, r_block.shape)
+            rows = np.concatenate([rows, i + a.start])
+            cols = np.concatenate([cols, j + b.start])
+            rs = np.concatenate([rs, r_block[i, j]])
+            ns = np.concatenate([ns, n_block[i, j]])
+            if len(rs) > k:
+                keep = np.argpartition(-np.abs(rs), k - 1)[:k]
+                rows, cols, rs, ns = rows[keep], cols[keep], rs[keep], ns[keep]
+
+        order = np.lexsort((cols, rows, -np.abs(rs)))
+        return {
+            'method': method,
+            'column_count': len(names),
+            'pairs': [{'x': names[rows[o]], 'y': names[cols[o]], 'r': float(rs[o]), 'n': int(ns[o])} for o in order]
+        }
+
+    @staticmethod
+    def pairs_above(result, threshold):
+        """
+        从 matrix() 的结果中取出 |r| > threshold 的变量对 [(x, y, r)]，按矩阵上三角的行序排列。
+        """
+        r = result['r']
+        names = result['columns']
+        with np.errstate(invalid='ignore'):
+            mask = np.triu(np.abs(r) > threshold, 1)
+        return [(names[i], names[j], float(r[i, j])) for i, j in zip(*np.nonzero(mask))]
+
+    @staticmethod
+    def dataset_matrix(filepath, method='pearson', columns=None):
+        """
+        数据集上的相关系数矩阵（按数据集版本缓存）。
+
+        Args:
+            filepath (str): 数据文件路径。
+            columns (list, optional): 参与计算的列，非数值列被忽略；None 表示全部数值列。
+
+        Returns:
+            dict: 同 matrix()。
+        """
+        base = CorrelationService._base_key(filepath, method)
+        wanted = list(dict.fromkeys(columns)) if columns is not None else None
+        sliced = _cache.find(base, lambda key, cached: CorrelationService._slice(
+            cached, wanted, complete=key[3][1] is None) if key[3][0] == 'matrix' else None)
+        if sliced is not None:
+            return sliced
+
+        result = CorrelationService.matrix(CorrelationService._load(filepath, wanted), method)
+        return _cache.put(base + (('matrix', None if wanted is None else tuple(result['columns'])),),
+                          result, result['r'].nbytes + result['n'].nbytes)
+
+    @staticmethod
+    def dataset_top_pairs(filepath, method='pearson', k=50, columns=None, min_count=3):
+        """
+        数据集上 |r| 最大的 k 对变量（按数据集版本缓存），见 top_pairs。
+        """
+        base = CorrelationService._base_key(filepath, method)
+        key = base + (('top', k, min_count, None if columns is None else tuple(columns)),)
+        cached = _cache.get(key)
+        if cached is not None:
+            return cached
+        result = CorrelationService.top_pairs(CorrelationService._load(filepath, columns), method, k, min_count)
+        return _cache.put(key, result, 200 * len(result['pairs']))
+
+    @staticmethod
+    def _prepare(df, method):
+        if method not in METHODS:
+            raise ValueError(f"不支持的相关系数方法: {method}")
+        numeric = df.select_dtypes(include=[np.number])
+        names = list(numeric.columns)
+        X = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        # 无穷值与 NaN 一样视为缺失
+        inf = np.isinf(X)
+        if inf.any():
+            X = np.where(inf, np.nan, X)
+        if method == 'spearman':
+            X = pd.DataFrame(X).rank(method='average').to_numpy()
+        return names, X
+
+    @staticmethod
+    def _blocks(X):
+        """
+        逐块 (a, b)（a 不晚于 b）产出 (列切片 a, 列切片 b, r 块, n 块)。
+        先按列均值中心化，降低 Σxy - ΣxΣy/n 形式的抵消误差。
+        """
+        mask = ~np.isnan(X)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)  # 全空列的均值
+            means = np.nan_to_num(np.nanmean(X, axis=0)) if X.size else np.zeros(X.shape[1])
+        Xc = np.where(mask, X - means, 0.0)
+        complete = bool(mask.all())
+        M = mask.astype(np.float64)
+        norms = np.sqrt(np.einsum('ij,ij->j', Xc, Xc)) if complete else None
+        size = max(1, Config.CORRELATION_BLOCK_COLUMNS)
+        width = X.shape[1]
+
+        for a0 in range(0, width, size):
+            a = slice(a0, min(a0 + size, width))
+            for b0 in range(a0, width, size):
+                b = slice(b0, min(b0 + size, width))
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    if complete:
+                        n = np.full((a.stop - a.start, b.stop - b.start), X.shape[0], dtype=np.int64)
+                        r = (Xc[:, a].T @ Xc[:, b]) / np.outer(norms[a], norms[b])
+                        r[np.outer(norms[a], norms[b]) == 0] = np.nan
+                        if X.shape[0] < 2:
+                            r[:] = np.nan
+                    else:
+                        r, n = CorrelationService._pairwise(Xc[:, a], M[:, a], Xc[:, b], M[:, b])
+                yield a, b, np.clip(r, -1.0, 1.0), n
+
+    @staticmethod
+    def _pairwise(Xa, Ma, Xb, Mb):
+        """逐对完整样本下的相关系数：每个求和项都只累加两列均非缺失的行。"""
+        n = Ma.T @ Mb
+        sx = Xa.T @ Mb
+        sy = Ma.T @ Xb
+        sxx = (Xa * Xa).T @ Mb
+        syy = Ma.T @ (Xb * Xb)
+        cov = Xa.T @ Xb - sx * sy / n
+        vx = sxx - sx * sx / n
+        vy = syy - sy * sy / n
+        r = cov / np.sqrt(vx * vy)
+        r[(n < 2) | (vx <= 0) | (vy <= 0)] = np.nan
+        return r, np.rint(n).astype(np.int64)
+
+    @staticmethod
+    def _load(filepath, columns):
+        if columns is None and filepath.endswith('.duckdb'):
+            # 只加载数值列
+            with DataService.connect(filepath) as con:
+                dtypes = con.execute("SELECT * FROM data LIMIT 0").df().dtypes
+            columns = [c for c, t in dtypes.items()
+                       if pd.api.types.is_numeric_dtype(t) and not pd.api.types.is_bool_dtype(t)]
+            if not columns:
+                return pd.DataFrame()
+        return DataService.load_data_optimized(filepath, columns=columns, strict=False, arrow=True)
+
+    @staticmethod
+    def _slice(result, wanted, complete):
+        """
+        从已缓存的矩阵中取出所需列；缓存不包含全部所需列时返回 None。
+        complete 表示该矩阵覆盖数据集的全部数值列（缺席的列必为非数值列）。
+        """
+        if wanted is None:
+            return result if complete else None
+        pos = {c: i for i, c in enumerate(result['columns'])}
+        if not complete and any(c not in pos for c in wanted):
+            return None
+        names = [c for c in wanted if c in pos]
+        idx = np.array([pos[c] for c in names], dtype=np.int64)
+        return {
+            'method': result['method'], 'columns': names,
+            'r': result['r'][np.ix_(idx, idx)], 'n': result['n'][np.ix_(idx, idx)]
+        }
+
+    @staticmethod
+    def _base_key(filepath, method):
+        if method not in METHODS:
+            raise ValueError(f"不支持的相关系数方法: {method}")
+        return (os.path.abspath(filepath), DataService.chain_version(filepath), method)
@@ -7,8 +7,35 @@ app.services.data_service.py
 import pandas as pd
 import numpy as np
 import os
+import codecs
+import json
 import math
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+import contextlib
+from contextlib import contextmanager
 import duckdb
+from app.config import Config
+from app.utils.frame_cache import frame_cache
+from app.utils.connection_pool import connection_pool
+from app.utils.file_lock import dataset_lock
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pyarrow 为可选依赖：缺失时 Arrow 模式回退到 DuckDB 默认的 numpy 结果
+    pa = None
+
+# 增量文件父链解析缓存：文件路径 -> (链上各文件版本, 链)，链上任一文件被改写后自动失效
+_lineage_cache = {}
+_lineage_lock = threading.Lock()
+
+_WIDE_INT_TYPES = {'BIGINT', 'HUGEINT', 'UBIGINT', 'UINTEGER'}
+_NARROW_INT_TYPES = {'INTEGER', 'SMALLINT', 'TINYINT', 'USMALLINT', 'UTINYINT'}
+
 
 class DataService:
     MAX_FILE_SIZE_MB = 200
@@ -19,177 +46,1126 @@ class DataService:
         将 DataFrame 保存到文件，根据扩展名处理 DuckDB 或 CSV。
         """
         if filepath.endswith('.duckdb'):
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            con = duckdb.connect(filepath)
+            # 先写临时文件再原子替换：并发读取方只会看到旧文件或新文件，不会看到缺失/半成品
+            tmp_path = DataService._tmp_path(filepath)
             try:
-                con.sql("CREATE OR REPLACE TABLE data AS SELECT * FROM df")
+                con = duckdb.connect(tmp_path)
+                try:
+                    con.sql("CREATE OR REPLACE TABLE data AS SELECT * FROM df")
+                finally:
+                    con.close()
+                DataService._replace(tmp_path, filepath)
             finally:
-                con.close()
+                DataService._discard(tmp_path)
         else:
             df.to_csv(filepath, index=False)
 
     @staticmethod
-    def ingest_data(raw_filepath, db_filepath):
+    def _tmp_path(filepath):
+        """与目标同目录的唯一临时文件名（同一文件系统内 os.replace 才是原子的）。"""
+        return f"{filepath}.{uuid.uuid4().hex[:12]}.part"
+
+    @staticmethod
+    def _replace(tmp_path, filepath):
+        """持写锁将写好的临时文件原子替换到目标路径，并使缓存与池中的旧版本失效。"""
+        with dataset_lock(filepath, exclusive=True):
+            os.replace(tmp_path, filepath)
+            frame_cache.invalidate(filepath)
+            connection_pool.invalidate(filepath)
+
+    @staticmethod
+    def _discard(tmp_path):
+        """清理未能替换到位的临时文件（写入失败或被取消）。"""
+        for path in (tmp_path, tmp_path + '.wal'):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def read_lineage(filepath):
         """
-        将原始文件 (CSV/Excel) 导入持久化的 DuckDB 文件。
-        
+        读取增量 (delta) 数据集文件的父文件信息。
+
+        Returns:
+            tuple | None: (父文件绝对路径, 链深度)；物理数据文件返回 None。
+        """
+        con = duckdb.connect(filepath, read_only=True)
+        try:
+            tables = {r[0] for r in con.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+            if '__lineage' not in tables:
+                return None
+            parent, depth = con.execute("SELECT parent, depth FROM __lineage").fetchone()
+            # 父路径以相对路径保存，数据目录整体迁移后仍可解析
+            return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(filepath)), parent)), int(depth)
+        finally:
+            con.close()
+
+    @staticmethod
+    def lineage_chain(filepath):
+        """
+        返回从该文件到物理根文件的路径链 [filepath, parent, ..., root]。
+        结果按链上每个文件的版本缓存：子文件未变而祖先被改写（压缩、自愈）时重新解析。
+        """
+        chain = [filepath]
+        if not filepath.endswith('.duckdb') or not os.path.exists(filepath):
+            return chain
+        key = os.path.abspath(filepath)
+        with _lineage_lock:
+            cached = _lineage_cache.get(key)
+        if cached is not None:
+            versions, cached_chain = cached
+            if all(frame_cache.file_version(p) == v for p, v in zip(cached_chain, versions)):
+                return list(cached_chain)
+
+        # 版本在读取之前记录：读取期间文件被改写时，缓存项下次即失效
+        versions = [frame_cache.file_version(filepath)]
+        info = DataService.read_lineage(filepath)
+        while info is not None:
+            parent = info[0]
+            if not os.path.exists(parent):
+                raise ValueError(f"增量数据集的父文件缺失: {os.path.basename(parent)}")
+            chain.append(parent)
+            versions.append(frame_cache.file_version(parent))
+            info = DataService.read_lineage(parent)
+        with _lineage_lock:
+            if len(_lineage_cache) > 4096:
+                _lineage_cache.clear()
+            _lineage_cache[key] = (versions, list(chain))
+        return chain
+
+    @staticmethod
+    def chain_version(filepath):
+        """
+        增量链上每个文件的 ((绝对路径, 版本), ...)，用作计算结果缓存键的一部分（见 ResultCache）：
+        数据集或其任一祖先被改写后旧结果自然失效。不存在的文件版本为 None。
+
+        Raises:
+            ValueError: 增量链的父文件缺失。
+        """
+        return tuple((os.path.abspath(p), frame_cache.file_version(p)) for p in DataService.lineage_chain(filepath))
+
+    @staticmethod
+    def _create_delta_views(con, aliases, prefix=''):
+        """
+        在已挂载整条增量链的连接上创建视图（aliases 与 lineage_chain 一一对应，最后一个为物理根文件）：
+        - __keyed: 带 __rid（根表 rowid）与 __ord（行序）的完整行集
+        - data:    与物理文件同构的 data 视图（按 __ord 排序）
+        同一连接上挂载多个数据集时，用 prefix 区分各自的视图名（{prefix}__keyed / {prefix}data）。
+
+        每一层增量文件包含：
+        - __lineage(parent, depth)
+        - __columns(ord, name): 该层的最终列顺序
+        - __delta(__rid, ...): 新增或被替换的列（可选）
+        - __rows(__rid, __ord): 行选择及新行序（可选，缺省继承父层的全部行）
+        - __filter(predicate, definition): 行过滤谓词（可选，队列视图；按父层行序筛选，不存储任何行）
+        """
+        root = len(aliases) - 1
+        level_sql = f"SELECT rowid AS __rid, rowid AS __ord, * FROM {aliases[root]}.data"
+        for i in range(root - 1, -1, -1):
+            level = aliases[i]
+            tables = {r[0] for r in con.execute(
+                f"SELECT table_name FROM information_schema.tables WHERE table_catalog = '{level}'"
+            ).fetchall()}
+            columns = [r[0] for r in con.execute(f"SELECT name FROM {level}.__columns ORDER BY ord").fetchall()]
+            delta_cols = set()
+            if '__delta' in tables:
+                delta_cols = {r[0] for r in con.execute(f"DESCRIBE {level}.__delta").fetchall()} - {'__rid'}
+
+            if '__filter' in tables:
+                predicate = con.execute(f"SELECT predicate FROM {level}.__filter").fetchone()[0]
+                select = ["p.__rid", "row_number() OVER (ORDER BY p.__ord) - 1 AS __ord"]
+                select += [f"p.{DataService.quote_ident(name)}" for name in columns]
+                level_sql = f"SELECT {', '.join(select)} FROM ({level_sql}) p WHERE {predicate}"
+                continue
+
+            has_rows = '__rows' in tables
+            select = ["p.__rid", "s.__ord" if has_rows else "p.__ord"]
+            for name in columns:
+                q = DataService.quote_ident(name)
+                select.append(f"d.{q}" if name in delta_cols else f"p.{q}")
+            source = f"({level_sql}) p"
+            if has_rows:
+                source += f" JOIN {level}.__rows s ON s.__rid = p.__rid"
+            if delta_cols:
+                source += f" LEFT JOIN {level}.__delta d ON d.__rid = p.__rid"
+            level_sql = f"SELECT {', '.join(select)} FROM {source}"
+
+        con.execute(f"CREATE TEMP VIEW {prefix}__keyed AS {level_sql}")
+        con.execute(f"CREATE TEMP VIEW {prefix}data AS SELECT * EXCLUDE (__rid, __ord) FROM {prefix}__keyed ORDER BY __ord")
+
+    @staticmethod
+    def attach_dataset(con, filepath, alias, attached):
+        """
+        在任意连接上只读挂载一个数据集（含整条增量链），并创建临时视图 alias：数据集全部列 + 行序列 __ord。
+        用于在 DuckDB 内合并多个数据集（见 MergeService），调用方需在查询结束前对链上文件持读锁。
+
+        Args:
+            attached (dict): {文件绝对路径: 挂载名}，在同一连接的多次调用间共享（同一文件只能挂载一次）。
+
+        Returns:
+            list: 该数据集的 lineage_chain。
+        """
+        chain = DataService.lineage_chain(filepath)
+        aliases = []
+        for path in chain:
+            key = os.path.abspath(path)
+            if key not in attached:
+                attached[key] = f"__src{len(attached)}"
+                con.execute(f"ATTACH '{key}' AS {attached[key]} (READ_ONLY)")
+            aliases.append(attached[key])
+        if len(chain) == 1:
+            con.execute(f"CREATE TEMP VIEW {alias} AS SELECT rowid AS __ord, * FROM {aliases[0]}.data")
+        else:
+            DataService._create_delta_views(con, aliases, prefix=f"{alias}_")
+            con.execute(f"CREATE TEMP VIEW {alias} AS SELECT * EXCLUDE (__rid) FROM {alias}___keyed")
+        return chain
+
+    @staticmethod
+    def open_connection(filepath):
+        """
+        借出只读连接，连接上可直接查询 `data`。调用方负责 close()（归还连接池）。
+
+        连接来自进程级连接池（见 app.utils.connection_pool）：物理文件的连接默认库即该文件；
+        增量文件的连接挂载整条链并已建好视图，复用时无需重新打开文件和加载 catalog。
+        """
+        # 解析增量链与挂载期间对链上每个文件持读锁，保证子文件与父文件来自同一时刻；
+        # 挂载后连接固定在对应 inode 上，之后的查询无需持锁
+        with contextlib.ExitStack() as locks:
+            locks.enter_context(dataset_lock(filepath))
+            chain = DataService.lineage_chain(filepath)
+            for path in chain[1:]:
+                locks.enter_context(dataset_lock(path))
+            return DataService._open_chain(filepath, chain)
+
+    @staticmethod
+    def _open_chain(filepath, chain):
+        setup = DataService._create_delta_views if len(chain) > 1 else None
+        con = connection_pool.acquire(chain, setup)
+        if con is not None:
+            return con
+        # 文件刚被重写且旧版本连接尚未全部归还：本次使用一次性独立连接
+        if len(chain) == 1:
+            return duckdb.connect(filepath, read_only=True)
+        con = duckdb.connect(':memory:')
+        try:
+            for i, path in enumerate(chain):
+                con.execute(f"ATTACH '{path}' AS f{i} (READ_ONLY)")
+            DataService._create_delta_views(con, [f"f{i}" for i in range(len(chain))])
+        except Exception:
+            con.close()
+            raise
+        return con
+
+    @staticmethod
+    @contextmanager
+    def connect(filepath):
+        """
+        只读连接的上下文管理器版本，见 open_connection。
+        """
+        con = DataService.open_connection(filepath)
+        try:
+            yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _row_ids(filepath):
+        """返回数据集按逻辑行序排列的根表 rowid。"""
+        if len(DataService.lineage_chain(filepath)) == 1:
+            query = "SELECT rowid AS __rid FROM data"
+        else:
+            query = "SELECT __rid FROM __keyed ORDER BY __ord"
+        with DataService.connect(filepath) as con:
+            return con.execute(query).fetchnumpy()['__rid']
+
+    @staticmethod
+    def save_derived(df, filepath, parent_filepath):
+        """
+        保存派生数据集。能以增量形式表达时只写入变化的部分，否则写完整的物理文件。
+
+        行映射取自 df 的索引（派生 DataFrame 的索引即父数据集的行位置，dropna / 匹配抽样会保留它），
+        列是否变化通过与父数据逐值比较确定，因此即使索引被重置，未变化列的判定也不会出错。
+        以下情况写物理文件（相当于压缩）：父文件非 DuckDB、索引无法映射到父行、
+        链深度超过 DELTA_MAX_DEPTH、变化列占比超过 DELTA_MAX_CHANGED_FRACTION。
+
+        Returns:
+            bool: 是否以增量形式保存。
+        """
+        delta = None
+        if parent_filepath.endswith('.duckdb') and filepath.endswith('.duckdb') and \
+                os.path.abspath(filepath) != os.path.abspath(parent_filepath):
+            delta = DataService._plan_delta(df, parent_filepath)
+
+        if delta is None:
+            DataService.save_dataframe(df, filepath)
+            return False
+
+        rows, changed, depth = delta
+        parent_rids = DataService._row_ids(parent_filepath)
+        positions = df.index.to_numpy()
+        identity = rows is None
+
+        delta_df = df[changed].reset_index(drop=True)
+        delta_df.insert(0, '__rid', parent_rids[positions].astype('int64'))
+        columns_df = pd.DataFrame({'ord': np.arange(len(df.columns), dtype='int64'),
+                                   'name': [str(c) for c in df.columns]})
+        lineage_df = pd.DataFrame({
+            'parent': [os.path.relpath(os.path.abspath(parent_filepath), os.path.dirname(os.path.abspath(filepath)))],
+            'depth': [depth]
+        })
+
+        tmp_path = DataService._tmp_path(filepath)
+        try:
+            con = duckdb.connect(tmp_path)
+            try:
+                con.execute("CREATE TABLE __lineage AS SELECT * FROM lineage_df")
+                con.execute("CREATE TABLE __columns AS SELECT * FROM columns_df")
+                if changed:
+                    con.execute("CREATE TABLE __delta AS SELECT * FROM delta_df")
+                if not identity:
+                    rows_df = pd.DataFrame({'__rid': delta_df['__rid'], '__ord': np.arange(len(df), dtype='int64')})
+                    con.execute("CREATE TABLE __rows AS SELECT * FROM rows_df")
+            finally:
+                con.close()
+            DataService._replace(tmp_path, filepath)
+        finally:
+            DataService._discard(tmp_path)
+        return True
+
+    @staticmethod
+    def save_filtered(filepath, parent_filepath, predicate, definition=None):
+        """
+        保存行过滤视图（队列）：文件只记录父文件与过滤谓词，读取时在父数据上按谓词筛选，不复制数据。
+
+        predicate 为作用于父数据列的 SQL 条件（列名使用带引号的标识符，不带表别名），由调用方负责编译与校验。
+        链深度超过 DELTA_MAX_DEPTH 时改为写入筛选后的物理文件。
+
+        Returns:
+            bool: 是否以视图形式保存。
+        """
+        info = DataService.read_lineage(parent_filepath)
+        depth = (info[1] if info else 0) + 1
+        with DataService.connect(parent_filepath) as con:
+            if depth > Config.DELTA_MAX_DEPTH:
+                df = con.execute(f"SELECT * FROM data WHERE {predicate}").df()
+            else:
+                columns = [r[0] for r in con.execute("DESCRIBE SELECT * FROM data").fetchall()]
+        if depth > Config.DELTA_MAX_DEPTH:
+            DataService.save_dataframe(df, filepath)
+            return False
+
+        columns_df = pd.DataFrame({'ord': np.arange(len(columns), dtype='int64'), 'name': columns})
+        lineage_df = pd.DataFrame({
+            'parent': [os.path.relpath(os.path.abspath(parent_filepath), os.path.dirname(os.path.abspath(filepath)))],
+            'depth': [depth]
+        })
+        filter_df = pd.DataFrame({'predicate': [predicate], 'definition': [json.dumps(definition, ensure_ascii=False)]})
+
+        tmp_path = DataService._tmp_path(filepath)
+        try:
+            con = duckdb.connect(tmp_path)
+            try:
+                con.execute("CREATE TABLE __lineage AS SELECT * FROM lineage_df")
+                con.execute("CREATE TABLE __columns AS SELECT * FROM columns_df")
+                con.execute("CREATE TABLE __filter AS SELECT * FROM filter_df")
+            finally:
+                con.close()
+            DataService._replace(tmp_path, filepath)
+        finally:
+            DataService._discard(tmp_path)
+        return True
+
+    @staticmethod
+    def _plan_delta(df, parent_filepath):
+        """
+        判断能否以增量保存。
+
+        Returns:
+            tuple | None: (行选择位置 或 None 表示整表原序, 变化列列表, 新链深度)；不适合增量时返回 None。
+        """
+        info = DataService.read_lineage(parent_filepath)
+        depth = (info[1] if info else 0) + 1
+        if depth > Config.DELTA_MAX_DEPTH or len(df.columns) == 0:
+            return None
+        if not df.columns.is_unique or not all(isinstance(c, str) and not c.startswith('__') for c in df.columns):
+            return None
+
+        parent = DataService.load_data(parent_filepath)
+        n_parent = len(parent)
+        index = df.index
+        if not pd.api.types.is_integer_dtype(index.dtype) or not index.is_unique:
+            return None
+        if len(index) and (index.min() < 0 or index.max() >= n_parent):
+            return None
+        identity = len(index) == n_parent and index.equals(pd.RangeIndex(n_parent))
+        rows = None if identity else index.to_numpy()
+
+        changed = []
+        for col in df.columns:
+            if col not in parent.columns:
+                changed.append(col)
+                continue
+            base = parent[col] if identity else parent[col].iloc[rows]
+            if not df[col].reset_index(drop=True).equals(base.reset_index(drop=True)):
+                changed.append(col)
+
+        if len(changed) > Config.DELTA_MAX_CHANGED_FRACTION * len(df.columns):
+            return None
+        return rows, changed, depth
+
+    @staticmethod
+    def compact(filepath):
+        """
+        将增量数据集物化为独立的物理文件（原地替换）。物理文件直接返回 False。
+        在覆盖某个父文件之前，必须先压缩依赖它的增量数据集；一次物化多个文件时使用 compact_all（后代先于祖先）。
+        """
+        if len(DataService.lineage_chain(filepath)) == 1:
+            return False
+        with DataService.connect(filepath) as con:
+            df = con.execute("SELECT * FROM data").df()
+        DataService.save_dataframe(df, filepath)
+        return True
+
+    @staticmethod
+    def compact_all(filepaths):
+        """
+        将多个增量数据集物化为物理文件，后代先于祖先。
+
+        增量文件按根表 rowid 引用祖先的行；祖先先被物化时 rowid 从 0 重新编号，其后代会读到错位的行。
+        因此按链深度从深到浅处理（同深度按路径排序，结果与传入顺序无关）。
+
+        Returns:
+            list: 实际被物化的文件。
+        """
+        depths = {}
+        for path in filepaths:
+            key = os.path.abspath(path)
+            if key not in depths:
+                depths[key] = (len(DataService.lineage_chain(path)), path)
+        compacted = []
+        for key, (_, path) in sorted(depths.items(), key=lambda kv: (-kv[1][0], kv[0])):
+            if DataService.compact(path):
+                compacted.append(path)
+        return compacted
+
+    @staticmethod
+    def ingest_data(raw_filepath, db_filepath, progress_callback=None, cancel_event=None, encoding=None):
+        """
+        将原始文件 (CSV/Excel) 以流式方式导入持久化的 DuckDB 文件。
+
+        内存占用与文件大小无关：CSV 由 DuckDB 直接解析写盘（超过 INGEST_MEMORY_LIMIT 时
+        溢出到 <db>.tmp）；XLSX 以只读模式逐批读取行并追加到 data 表。
+
         参数:
             raw_filepath (str): 临时原始文件路径。
             db_filepath (str): 目标 .duckdb 文件路径。
+            progress_callback (callable, optional): 进度回调
+                progress_callback(phase, bytes_read, bytes_total, rows)，
+                phase 取值 'reading' / 'done'。回调抛出的异常会中止导入。
+            cancel_event (threading.Event, optional): 置位后中断正在执行的 DuckDB 查询。
+            encoding (str, optional): CSV 编码（见 detect_encoding）；缺省时现场检测。
+
+        Returns:
+            int: 导入的行数。
         """
-        if os.path.exists(db_filepath):
-            os.remove(db_filepath)
+        bytes_total = os.path.getsize(raw_filepath)
+
+        def report(phase, bytes_read, rows):
+            if progress_callback is not None:
+                progress_callback(phase, bytes_read, bytes_total, rows)
 
-        con = duckdb.connect(db_filepath)
+        # 导入到临时文件，完成后原子替换；失败或取消时原文件（如有）保持不变
+        tmp_path = DataService._tmp_path(db_filepath)
+        con = duckdb.connect(tmp_path)
+        finished = threading.Event()
+        if cancel_event is not None:
+            # 单条 CTAS 可能运行数分钟，回调没有机会执行；由旁路线程监听取消信号并中断查询
+            def watch():
+                while not finished.wait(0.2):
+                    if cancel_event.is_set():
+                        con.interrupt()
+                        return
+            threading.Thread(target=watch, daemon=True).start()
         try:
-            if raw_filepath.endswith('.csv'):
-                # Use read_csv_auto for robust robust type inference
-                # ignore_errors=True skips bad lines
-                con.sql(f"CREATE OR REPLACE TABLE data AS SELECT * FROM read_csv_auto('{raw_filepath}', ignore_errors=true)")
-            elif raw_filepath.endswith('.xlsx') or raw_filepath.endswith('.xls'):
-                # DuckDB Excel support requires extension, fall back to Pandas then insert
-                df = pd.read_excel(raw_filepath)
-                con.sql("CREATE OR REPLACE TABLE data AS SELECT * FROM df")
-            else:
-                 raise ValueError("Unsupported format")
+            try:
+                con.execute(f"SET memory_limit='{Config.INGEST_MEMORY_LIMIT}'")
+                report('reading', 0, 0)
+                lower = raw_filepath.lower()
+                if lower.endswith('.csv'):
+                    # NOTE: 保留 preserve_insertion_order（默认开启），下游 PSM/匹配依赖行序与索引对齐。
+                    with DataService.utf8_csv(raw_filepath, encoding) as source:
+                        con.execute(f"CREATE OR REPLACE TABLE data AS SELECT * FROM {DataService.read_csv_sql(source)}")
+                elif lower.endswith('.xlsx'):
+                    DataService._ingest_xlsx(con, raw_filepath, bytes_total, report)
+                elif lower.endswith('.xls'):
+                    # 旧版 .xls 无流式读取器 (xlrd)，只能整表读入
+                    df = pd.read_excel(raw_filepath)
+                    con.sql("CREATE OR REPLACE TABLE data AS SELECT * FROM df")
+                else:
+                     raise ValueError("Unsupported format")
+                rows = con.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+            finally:
+                finished.set()
+                con.close()
+            DataService._replace(tmp_path, db_filepath)
+            report('done', bytes_total, rows)
+            return rows
         finally:
-            con.close()
+            DataService._discard(tmp_path)
             # NOTE: We no longer delete the raw file here to prevent accidental data loss
             # during auto-healing or re-ingest operations.
 
+    @staticmethod
+    def append_rows(raw_filepath, db_filepath, encoding=None, target_filepath=None):
+        """
+        将新批次的原始文件 (CSV/Excel) 追加到已有的 DuckDB 数据集，已有数据不重新导入、不重新画像。
+
+        新批次先流式导入临时库；已有文件复制一份后在副本上对齐结构并 INSERT BY NAME，完成后原子替换：
+        - 新批次独有的列追加到表尾（已有行为空值），新批次缺少的列在新行中为空值；
+        - 同名列类型冲突时按 _widen_type 放宽（全空列不触发）；
+        - 画像由 ProfileService.merge_append 增量合并，仅被放宽类型的列重新扫描。
+
+        Args:
+            raw_filepath (str): 新批次原始文件。
+            db_filepath (str): 已有的物理 .duckdb 文件。
+            encoding (str, optional): CSV 编码。
+            target_filepath (str, optional): 结果写入的路径（写时复制时与 db_filepath 不同），默认原地替换。
+
+        Returns:
+            dict: {'rows_appended', 'row_count', 'added_columns', 'widened_columns'}。
+
+        Raises:
+            ValueError: 目标不是物理 DuckDB 文件，或新批次格式不受支持。
+        """
+        from app.services.profile_service import ProfileService
+
+        if not db_filepath.endswith('.duckdb') or len(DataService.lineage_chain(db_filepath)) > 1:
+            raise ValueError("只能向已导入的物理 DuckDB 数据集追加行")
+        target_filepath = target_filepath or db_filepath
+        q = DataService.quote_ident
+
+        with tempfile.TemporaryDirectory() as staging_dir:
+            staging = os.path.join(staging_dir, 'batch.duckdb')
+            rows_appended = DataService.ingest_data(raw_filepath, staging, encoding=encoding)
+
+            tmp_path = DataService._tmp_path(target_filepath)
+            try:
+                with dataset_lock(db_filepath):
+                    base = ProfileService.load(db_filepath)
+                    shutil.copyfile(db_filepath, tmp_path)
+                con = duckdb.connect(tmp_path)
+                try:
+                    con.execute(f"SET memory_limit='{Config.INGEST_MEMORY_LIMIT}'")
+                    con.execute(f"ATTACH '{staging}' AS __batch (READ_ONLY)")
+                    types = {r[0]: str(r[1]).upper() for r in con.execute("DESCRIBE data").fetchall()}
+                    incoming = [(r[0], str(r[1]).upper()) for r in con.execute("DESCRIBE __batch.data").fetchall()]
+                    counts = con.execute(
+                        f"SELECT {', '.join(f'count({q(n)})' for n, _ in incoming)} FROM __batch.data"
+                    ).fetchone()
+
+                    added, widened = [], []
+                    for (name, dtype), non_null in zip(incoming, counts):
+                        if name not in types:
+                            added.append(name)
+                            types[name] = dtype
+                        elif dtype != types[name] and non_null:
+                            target = DataService._widen_type(types[name], dtype)
+                            if target != types[name]:
+                                widened.append(name)
+                                types[name] = target
+
+                    merged = None
+                    if base is not None:
+                        merged = ProfileService.merge_append(con, base, '__batch.data', types, rescan=widened)
+                    for name in added:
+                        con.execute(f"ALTER TABLE data ADD COLUMN {q(name)} {types[name]}")
+                    for name in widened:
+                        con.execute(f"ALTER TABLE data ALTER {q(name)} TYPE {types[name]}")
+                    con.execute("INSERT INTO data BY NAME SELECT * FROM __batch.data")
+                    profile = None
+                    if merged is not None:
+                        profile = ProfileService.finish_append(con, merged, types, rescan=widened)
+                    row_count = con.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+                finally:
+                    con.close()
+                DataService._replace(tmp_path, target_filepath)
+            finally:
+                DataService._discard(tmp_path)
+
+        if profile is not None:
+            ProfileService.store(target_filepath, profile)
+        return {
+            'rows_appended': int(rows_appended),
+            'row_count': int(row_count),
+            'added_columns': added,
+            'widened_columns': widened
+        }
+
+    @staticmethod
+    def detect_encoding(filepath, sample_bytes=None):
+        """
+        基于字节采样判断 CSV 编码，不解析文件。
+
+        依次检查 BOM、UTF-8 合法性、GB18030 合法性（且非 ASCII 字符以 GB2312 常用区为主），
+        都不满足时回退为 latin1（任意字节均可解码）。开头全是 ASCII 时（英文表头 + 数值很常见），
+        向后定位到第一个非 ASCII 字节再取样。
+
+        Returns:
+            str: 'utf-8' / 'utf-8-sig' / 'utf-16' / 'gb18030' / 'latin1'
+        """
+        sample_bytes = sample_bytes or Config.ENCODING_SAMPLE_BYTES
+        with open(filepath, 'rb') as f:
+            sample = f.read(sample_bytes)
+            if sample.startswith(codecs.BOM_UTF8):
+                return 'utf-8-sig'
+            if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+                return 'utf-16'
+            while True:
+                match = re.search(rb'[\x80-\xff]', sample)
+                if match:
+                    # 前一个字节是 ASCII，所以此处必为多字节字符的起始字节
+                    sample = sample[match.start():] + f.read(match.start())
+                    break
+                sample = f.read(sample_bytes)
+                if not sample:
+                    return 'utf-8'
+            truncated = f.read(1) != b''
+
+        if DataService._decodes(sample, 'utf-8', truncated):
+            return 'utf-8'
+        if DataService._decodes(sample, 'gb18030', truncated):
+            # 常用汉字与全角符号都在 GB2312 区（两个字节均 >= 0xA1）；latin1 文本里的
+            # "é" + ASCII 字母也能凑成合法的 GBK 双字节，但尾字节落在 0x40-0x7E
+            wide = [c.encode('gb18030') for c in sample.decode('gb18030', errors='ignore') if ord(c) >= 0x80]
+            common = sum(1 for b in wide if len(b) == 2 and b[0] >= 0xA1 and b[1] >= 0xA1)
+            if wide and common / len(wide) >= 0.5:
+                return 'gb18030'
+        return 'latin1'
+
+    @staticmethod
+    def _decodes(sample, encoding, truncated):
+        try:
+            sample.decode(encoding)
+            return True
+        except UnicodeDecodeError as e:
+            # 采样可能截断在多字节字符中间（最长 4 字节）
+            return truncated and e.start >= len(sample) - 3
+
+    @staticmethod
+    def read_csv_sql(path):
+        """
+        DuckDB 读取 CSV 的表函数表达式。
+        首行固定作为表头（与 pandas 一致；自动检测在全字符串列时会把表头当成数据），跳过无法解析的行。
+        """
+        return f"read_csv_auto('{path}', header=true, ignore_errors=true)"
+
+    @staticmethod
+    @contextmanager
+    def utf8_csv(filepath, encoding=None):
+        """
+        返回 DuckDB 可直接读取的 UTF-8 CSV 路径。
+
+        DuckDB 的 CSV 读取器只支持 UTF-8：UTF-8 文件原样返回；其他编码流式转码到同目录临时文件
+        （仅解码一次，不解析），退出上下文后删除。样本之外的非法字节以替换字符处理。
+        """
+        encoding = encoding or DataService.detect_encoding(filepath)
+        if encoding in ('utf-8', 'utf-8-sig'):
+            yield filepath
+            return
+        fd, tmp_path = tempfile.mkstemp(suffix='.csv', dir=os.path.dirname(os.path.abspath(filepath)))
+        try:
+            with open(filepath, 'r', encoding=encoding, errors='replace', newline='') as src, \
+                    os.fdopen(fd, 'w', encoding='utf-8', newline='') as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            yield tmp_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _excel_header(row):
+        """
+        与 pd.read_excel 一致地规范化表头：空列名记为 'Unnamed: i'，重复列名追加 '.1', '.2'。
+        """
+        names, seen = [], {}
+        for i, value in enumerate(row):
+            name = f"Unnamed: {i}" if value is None or str(value).strip() == '' else str(value)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}.{seen[name]}"
+            else:
+                seen[name] = 0
+            names.append(name)
+        return names
+
+    @staticmethod
+    def _widen_type(current, incoming):
+        """
+        两批数据类型冲突时选择能同时容纳两者的列类型。
+        整数之间取 BIGINT，整数与浮点取 DOUBLE，其余（字符串、日期混合等）一律 VARCHAR。
+        """
+        integers = {'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT'}
+        floats = {'FLOAT', 'DOUBLE'}
+        if current in integers and incoming in integers:
+            return 'BIGINT'
+        if (current in integers | floats or current.startswith('DECIMAL')) and \
+                (incoming in integers | floats or incoming.startswith('DECIMAL')):
+            return 'DOUBLE'
+        return 'VARCHAR'
+
+    @staticmethod
+    def _append_batch(con, rows, header, created):
+        """
+        将一批 XLSX 行追加到 data 表；后续批次的类型与已建表不一致时先放宽列类型再插入。
+        """
+        width = len(header)
+        rows = [list(r[:width]) + [None] * (width - len(r)) for r in rows]
+        batch = pd.DataFrame.from_records(rows, columns=header).infer_objects()
+        con.register('ingest_batch', batch)
+        try:
+            if not created:
+                con.execute("CREATE TABLE data AS SELECT * FROM ingest_batch")
+                return
+            table_types = dict(con.execute(
+                "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'data'"
+            ).fetchall())
+            for name, dtype, *_ in con.execute("DESCRIBE SELECT * FROM ingest_batch").fetchall():
+                current = table_types[name]
+                # 全空列在 pandas 中是 object，DuckDB 推断为 INTEGER，不应触发放宽
+                if dtype == current or batch[name].isna().all():
+                    continue
+                target = DataService._widen_type(current, dtype)
+                if target != current:
+                    con.execute(f"ALTER TABLE data ALTER {DataService.quote_ident(name)} TYPE {target}")
+            con.execute("INSERT INTO data SELECT * FROM ingest_batch")
+        finally:
+            con.unregister('ingest_batch')
+
+    @staticmethod
+    def _ingest_xlsx(con, raw_filepath, bytes_total, report):
+        """
+        以 openpyxl 只读模式流式导入第一个工作表，每 INGEST_BATCH_ROWS 行写入一次。
+        """
+        from openpyxl import load_workbook
+
+        wb = load_workbook(raw_filepath, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            # max_row 来自工作表的 dimension 声明，可能缺失；仅用于估算进度
+            total_rows = ws.max_row if isinstance(ws.max_row, int) and ws.max_row > 1 else None
+            rows_iter = ws.iter_rows(values_only=True)
+            header_row = next(rows_iter, None)
+            if header_row is None:
+                raise ValueError("Excel 文件为空")
+            header = DataService._excel_header(header_row)
+
+            batch, rows, created = [], 0, False
+            for row in rows_iter:
+                if all(v is None for v in row):
+                    continue
+                batch.append(row)
+                if len(batch) >= Config.INGEST_BATCH_ROWS:
+                    DataService._append_batch(con, batch, header, created)
+                    created, rows, batch = True, rows + len(batch), []
+                    estimate = int(bytes_total * min(rows / total_rows, 1.0)) if total_rows else 0
+                    report('reading', estimate, rows)
+            if batch or not created:
+                DataService._append_batch(con, batch, header, created)
+        finally:
+            wb.close()
+
     @staticmethod
     def export_to_csv(db_filepath, output_csv_path):
         """
         将数据从 DuckDB 文件导出到 CSV。
         """
-        con = duckdb.connect(db_filepath, read_only=True)
-        try:
+        with DataService.connect(db_filepath) as con:
             # 使用带有 HEADER 的 COPY 语句进行高效导出
             con.sql(f"COPY data TO '{output_csv_path}' (HEADER, DELIMITER ',')")
+
+    @staticmethod
+    def _heal_from_source(filepath):
+        """
+        DuckDB 文件缺失/损坏/版本不兼容时，尝试从同名原始文件 (CSV/Excel) 重新导入。
+
+        Returns:
+            bool: 是否成功重建。
+        """
+        with dataset_lock(filepath, exclusive=True):
+            # 持写锁后复查：失败可能只是撞上了其他进程的重写，或已被别的请求修复
+            if DataService._readable(filepath):
+                return True
+            # Remove extension to get base path
+            base_path = filepath.rsplit('.', 1)[0]
+            for ext in ['.csv', '.xlsx', '.xls']:
+                src_path = base_path + ext
+                if os.path.exists(src_path):
+                    try:
+                        DataService.ingest_data(src_path, filepath)
+                        return True
+                    except Exception:
+                        continue
+            return False
+
+    @staticmethod
+    def _readable(filepath):
+        try:
+            with DataService.connect(filepath) as con:
+                con.execute("SELECT * FROM data LIMIT 0")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _arrow_types_mapper(arrow_type):
+        # 仅字符串列映射为 pyarrow 支撑的 StringDtype；数值列保持 numpy（无缺失时零拷贝），
+        # 字典编码 (DuckDB ENUM) 列由 pyarrow 默认转换为 pandas Categorical。
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return pd.StringDtype("pyarrow")
+        return None
+
+    @staticmethod
+    def _query_df(filepath, query, arrow=False, categorical=None):
+        """
+        在只读连接上执行查询并返回 DataFrame。
+
+        Args:
+            arrow (bool): True 时走 fetch_arrow_table -> pandas 路径。
+                          NOTE: `.df()` 会把每个 VARCHAR 转成 Python str 对象数组，字符串密集的
+                          临床表内存会膨胀 5-8 倍；Arrow 路径下字符串保持为连续的 Arrow 缓冲区。
+            categorical (list, optional): 在 Arrow 中字典编码后以 pandas Categorical 返回的列
+                          （类别按字典序排列，与 astype('category') 一致），不经过 Python str 对象。
+        """
+        con = DataService.open_connection(filepath)
+        try:
+            rel = con.sql(query)
+            if (arrow or categorical) and pa is not None:
+                table = rel.arrow()
+                # DECIMAL 在 Arrow 中会转成 Python Decimal 对象，与 `.df()` 保持一致转为 float64
+                for i, field in enumerate(table.schema):
+                    if pa.types.is_decimal(field.type):
+                        table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+                    elif categorical and field.name in categorical:
+                        table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+                if categorical:
+                    table = table.unify_dictionaries()
+                # NOTE: 不使用 split_blocks：零拷贝得到的数值数组是只读的，Copy-on-Write 下 dropna() 等不再复制，
+                # pandas 2.1 的 median 会就地写入底层数组而报错；合并成块时复制一次得到可写数组（与 `.df()` 相同）。
+                df = table.to_pandas(
+                    types_mapper=DataService._arrow_types_mapper if arrow else None,
+                    self_destruct=True
+                )
+                for name in categorical or []:
+                    if name in df.columns and isinstance(df[name].dtype, pd.CategoricalDtype):
+                        df[name] = df[name].cat.reorder_categories(sorted(df[name].cat.categories))
+                return df
+            return rel.df()
         finally:
             con.close()
 
     @staticmethod
-    def load_data(filepath, use_chunk=False):
+    def to_numpy_frame(df):
+        """
+        转换层：将 Arrow/可空扩展类型的列转换回 numpy 类型。
+
+        statsmodels / lifelines / sklearn 需要 numpy 数组，且无法识别 pd.NA，
+        因此在进入这些库之前统一转换：字符串 -> object (缺失为 NaN)，
+        可空数值 -> float64 (缺失为 NaN)，float32 -> float64。Categorical 本身基于 numpy，保持不变。
+
+        Args:
+            df (pd.DataFrame): 可能包含 Arrow 支撑列的数据框。
+
+        Returns:
+            pd.DataFrame: 仅含 numpy 兼容类型的数据框；无需转换时原样返回（不复制）。
+        """
+        converted = {}
+        for col in df.columns:
+            dtype = df[col].dtype
+            if dtype == np.float32:
+                # compact 加载的 float32 列：模型计算统一回到 float64 精度
+                converted[col] = df[col].to_numpy(dtype='float64')
+                continue
+            if isinstance(dtype, pd.CategoricalDtype) or not pd.api.types.is_extension_array_dtype(dtype):
+                continue
+            if pd.api.types.is_bool_dtype(dtype) and not df[col].hasnans:
+                converted[col] = df[col].to_numpy(dtype=bool)
+            elif pd.api.types.is_integer_dtype(dtype) and not df[col].hasnans:
+                converted[col] = df[col].to_numpy(dtype='int64')
+            elif pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+                converted[col] = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            else:
+                converted[col] = df[col].to_numpy(dtype=object, na_value=np.nan)
+        if not converted:
+            return df
+        return df.assign(**converted)
+
+    @staticmethod
+    def quote_ident(name):
+        """
+        将列名安全地引用为 SQL 标识符（双引号包裹，内部双引号转义）。
+        """
+        return '"' + str(name).replace('"', '""') + '"'
+
+    @staticmethod
+    def stddev_sql(x):
+        """
+        样本标准差的 SQL 表达式。DuckDB 的 stddev_samp 遇到 ±inf 会抛出 OutOfRangeException，
+        这里与 pandas 一致：含非有限值时结果为 NULL。
+        """
+        return f"CASE WHEN bool_and(isfinite({x})) THEN stddev_samp(CASE WHEN isfinite({x}) THEN {x} END) END"
+
+    @staticmethod
+    def collect_columns(*items):
+        """
+        汇总接口所需的列名：展开列表/字典、剔除 None 与空值，并按出现顺序去重。
+
+        Example:
+            collect_columns(time_col, event_col, group_col, covariates) -> ['time', 'event', 'age', ...]
+        """
+        cols = []
+        for item in items:
+            if item is None or item == '':
+                continue
+            if isinstance(item, dict):
+                values = list(item.values())
+            elif isinstance(item, (list, tuple, set)):
+                values = list(item)
+            else:
+                values = [item]
+            for v in values:
+                if v is not None and v != '' and v not in cols:
+                    cols.append(v)
+        return cols
+
+    @staticmethod
+    def _build_select(source, columns=None, dropna=None, casts=None):
+        """
+        构建带投影与非空过滤的 SELECT 语句。
+
+        NOTE: dropna 仅是性能优化（在 DuckDB 中提前剔除行），
+        各统计服务内部仍保留各自的 dropna，因此结果口径不变。
+        casts (dict, optional): 列名 -> 目标 SQL 类型，在 DuckDB 中完成类型收窄。
+        """
+        def item(c):
+            q = DataService.quote_ident(c)
+            return f"CAST({q} AS {casts[c]}) AS {q}" if casts and c in casts else q
+        cols_sql = ", ".join(item(c) for c in columns) if columns else "*"
+        query = f"SELECT {cols_sql} FROM {source}"
+        if dropna:
+            conds = " AND ".join(f"{DataService.quote_ident(c)} IS NOT NULL" for c in dropna)
+            query += f" WHERE {conds}"
+        return query
+
+    @staticmethod
+    def get_columns(filepath):
+        """
+        读取数据集的列名列表（不加载数据）。
+        """
+        if filepath.endswith('.duckdb'):
+            return list(DataService._query_df(filepath, "SELECT * FROM data LIMIT 0").columns)
+        if filepath.endswith('.csv'):
+            return list(pd.read_csv(filepath, nrows=0, encoding=DataService.detect_encoding(filepath),
+                                    encoding_errors='replace').columns)
+        return list(DataService.load_data(filepath).columns)
+
+    @staticmethod
+    def _load_duckdb(filepath, columns=None, dropna=None, arrow=False, compact=False):
+        """
+        从 DuckDB 文件加载数据（经过进程级缓存）。
+
+        Args:
+            filepath (str): .duckdb 文件路径。
+            columns (list, optional): 投影列；None 表示全部列。
+            dropna (list, optional): 下推到 DuckDB 的非空过滤列（等价于 df.dropna(subset=...)）。
+            arrow (bool): 是否使用 Arrow 支撑的字符串列（见 _query_df）。
+            compact (bool): 按画像收窄类型（见 _compact_plan），并在 df.attrs['schema'] 记录各列口径。
+
+        Returns:
+            pd.DataFrame: 只读底层数组的浅拷贝（见 FrameCache）。
+
+        Raises:
+            ValueError: 请求的列不存在，或投影查询失败且无法自愈。
+        """
+        variant = (tuple(dropna) if dropna else None, bool(arrow and pa is not None), bool(compact))
+        key = DataService._frame_key(filepath, columns, variant)
+        cached = frame_cache.get(key)
+        if cached is not None:
+            return cached
+
+        casts, categorical, schema = None, None, None
+        if compact and pa is not None:
+            casts, categorical, schema = DataService._compact_plan(filepath, columns)
+            columns_sql = columns or list(schema)
+        else:
+            columns_sql = columns
+        query = DataService._build_select("data", columns_sql, dropna, casts=casts)
+
+        try:
+            df = DataService._query_df(filepath, query, arrow=arrow, categorical=categorical)
+        except duckdb.BinderException as e:
+            # 列不存在属于调用方错误，不触发自愈
+            raise ValueError(f"DuckDB 查询错误: {e}")
+        except Exception as e:
+            # DuckDB version mismatch, missing file, or corruption: Attempt to heal if source exists
+            if not DataService._heal_from_source(filepath):
+                if columns:
+                    raise ValueError(f"DuckDB 查询错误: {e}")
+                raise e
+            df = DataService._query_df(filepath, query, arrow=arrow, categorical=categorical)
+            key = DataService._frame_key(filepath, columns, variant)
+
+        if schema is not None:
+            df.attrs['schema'] = {c: schema[c] for c in df.columns if c in schema}
+        return frame_cache.put(key, df)
+
+    @staticmethod
+    def _frame_key(filepath, columns, variant):
+        """DataFrame 缓存键，包含增量链上每个文件的版本；父链损坏时不缓存。"""
+        try:
+            chain = DataService.lineage_chain(filepath)
+        except ValueError:
+            return None
+        return frame_cache.make_key(filepath, columns, variant, chain=chain)
+
+    @staticmethod
+    def _compact_plan(filepath, columns=None):
+        """
+        根据已保存的数据画像（见 ProfileService）决定各列的加载类型，不额外扫描数据。
+
+        - 整数列：取值范围在 int32 内时收窄为 INTEGER；含缺失时 pandas 会转成 float64，
+          此时若 |值| < 2^24 收窄为 FLOAT（float32 可精确表示该范围内的整数）。
+          不再继续收窄到 int8/int16：后续派生计算（如 age * weight）在窄整型上会静默溢出。
+        - 浮点列保持 float64（临床测量值在 float32 下有损）。
+        - 字符串列：不同取值数不超过 COMPACT_CATEGORY_MAX_DISTINCT 且不超过行数的
+          COMPACT_CATEGORY_MAX_RATIO 时以 category 加载，其余保持 object。
+
+        Returns:
+            tuple: (casts, categorical, schema)。schema 为列名 -> 'numeric' / 'category' / 'text' / 'other'，
+            按数据集列顺序排列，供 preprocess_for_formula / preprocess_for_matrix 跳过类型探测。
+        """
+        from app.services.profile_service import ProfileService
+
+        profile = ProfileService.profile(filepath)
+        rows = profile['row_count']
+        wanted = set(columns) if columns else None
+        casts, categorical, schema = {}, [], {}
+        for col in profile['columns']:
+            name, dtype = col['name'], col['type']
+            if wanted is not None and name not in wanted:
+                continue
+            if dtype in _WIDE_INT_TYPES or dtype in _NARROW_INT_TYPES:
+                schema[name] = 'numeric'
+                lo, hi = col['min'], col['max']
+                if lo is None or hi is None:
+                    continue
+                if col['null_count']:
+                    if max(abs(lo), abs(hi)) < 2 ** 24:
+                        casts[name] = 'FLOAT'
+                elif dtype in _WIDE_INT_TYPES and -2 ** 31 <= lo and hi < 2 ** 31:
+                    casts[name] = 'INTEGER'
+            elif dtype in ('DOUBLE', 'FLOAT', 'REAL') or dtype.startswith('DECIMAL'):
+                schema[name] = 'numeric'
+            elif dtype == 'VARCHAR':
+                distinct = col['distinct']
+                if distinct is not None and distinct <= Config.COMPACT_CATEGORY_MAX_DISTINCT \
+                        and distinct <= max(1, rows * Config.COMPACT_CATEGORY_MAX_RATIO):
+                    categorical.append(name)
+                    schema[name] = 'category'
+                else:
+                    schema[name] = 'text'
+            else:
+                schema[name] = 'other'
+        return casts, categorical, schema
+
+    @staticmethod
+    def load_data(filepath, use_chunk=False, arrow=False, compact=False):
         """
         稳健地加载数据（支持 CSV, Excel）。
         
-        针对 CSV 格式，自动尝试 utf-8, gb18030 等多种编码，确保中文无乱码。
+        针对 CSV 格式，按字节采样检测编码（utf-8 / gb18030 / latin1 等），确保中文无乱码。
         使用 low_memory=False 保证大文件解析的准确性。
         
         Args:
             filepath (str): 文件路径
             use_chunk (bool): 是否使用 chunksize 读取（仅用于元数据预览），返回 iterator
+            arrow (bool): DuckDB 文件是否以 Arrow 支撑的字符串列加载（节省内存）。
+                          进入 statsmodels/lifelines 前需经 to_numpy_frame 转换。
+            compact (bool): DuckDB 文件是否按画像收窄类型：无损的整数收窄、低基数字符串列以 category 加载，
+                          并在 df.attrs['schema'] 中记录各列口径（见 _compact_plan）。
         """
         if filepath.endswith('.duckdb'):
-             try:
-                 con = duckdb.connect(filepath, read_only=True)
-                 try:
-                     return con.sql("SELECT * FROM data").df()
-                 finally:
-                     con.close()
-             except (duckdb.SerializationException, duckdb.CatalogException, Exception) as e:
-                 # DuckDB version mismatch, missing file, or corruption: Attempt to heal if source exists
-                 source_found = False
-                 # Remove extension to get base path
-                 base_path = filepath.rsplit('.', 1)[0]
-                 for ext in ['.csv', '.xlsx', '.xls']:
-                     src_path = base_path + ext
-                     if os.path.exists(src_path):
-                         try:
-                             DataService.ingest_data(src_path, filepath)
-                             source_found = True
-                             break
-                         except Exception as ingest_error:
-                             # print(f"Ingest failed during healing: {ingest_error}")
-                             continue
-                 
-                 if source_found:
-                     con = duckdb.connect(filepath, read_only=True)
-                     try:
-                         return con.sql("SELECT * FROM data").df()
-                     finally:
-                         con.close()
-                 raise e
+            return DataService._load_duckdb(filepath, arrow=arrow, compact=compact)
  
         # 1. 存在性检查
         if not os.path.exists(filepath):
              raise FileNotFoundError(f"文件未找到: {filepath}")
 
+        # MAX_FILE_SIZE_MB 只约束 pandas 解析器（内存峰值约为文件大小的数倍）；
+        # 上传路径走 ingest_data 流式导入，不受此限制。
         file_size_mb = os.path.getsize(filepath) / (1024 * 1024)
         if file_size_mb > DataService.MAX_FILE_SIZE_MB:
-            raise ValueError(f"文件大小 ({file_size_mb:.1f}MB) 超过限制 ({DataService.MAX_FILE_SIZE_MB}MB)。建议先进行本地预处理。")
+            if filepath.endswith('.csv') and not use_chunk:
+                # 大 CSV 改由 DuckDB 的多线程解析器读取，避免 pandas 的中间对象开销
+                # 共享实例上的临时游标，内存上限由 DUCKDB_MEMORY_LIMIT 统一约束
+                con = connection_pool.cursor()
+                try:
+                    with DataService.utf8_csv(filepath) as source:
+                        return con.execute(f"SELECT * FROM {DataService.read_csv_sql(source)}").df()
+                finally:
+                    con.close()
+            raise ValueError(f"文件大小 ({file_size_mb:.1f}MB) 超过限制 ({DataService.MAX_FILE_SIZE_MB}MB)。请通过上传导入为数据集后再分析。")
 
         if filepath.endswith('.csv'):
-             # 使用编码检测进行稳健解析
-            encodings = ['utf-8', 'gb18030', 'latin1']
-            df = None
-            for encoding in encodings:
-                try:
-                    # low_memory=False 以避免 DtypeWarning 并确保解析准确
-                    if use_chunk:
-                         # 仅读取第一个分块以获取元数据
-                         return pd.read_csv(filepath, encoding=encoding, chunksize=1000)
-                    else:
-                         df = pd.read_csv(filepath, encoding=encoding, low_memory=False)
-                    break 
-                except UnicodeDecodeError:
-                    continue
-            
-            if df is None:
-                raise ValueError("Failed to parse CSV file with supported encodings (utf-8, gb18030, latin1)")
-            return df
+            # 编码由字节采样确定，只解析一次；采样之外的个别非法字节替换而不是整体重试
+            encoding = DataService.detect_encoding(filepath)
+            if use_chunk:
+                # 仅读取第一个分块以获取元数据
+                return pd.read_csv(filepath, encoding=encoding, encoding_errors='replace', chunksize=1000)
+            # low_memory=False 以避免 DtypeWarning 并确保解析准确
+            return pd.read_csv(filepath, encoding=encoding, encoding_errors='replace', low_memory=False)
         elif filepath.endswith('.xlsx') or filepath.endswith('.xls'):
             return pd.read_excel(filepath)
         else:
             raise ValueError("Unsupported file format (only .csv, .xlsx, .xls)")
 
     @staticmethod
-    def load_data_optimized(filepath, columns=None):
+    def load_data_optimized(filepath, columns=None, dropna=None, strict=True, arrow=False, compact=False):
         """
         利用 DuckDB 的投影下推（Projection Pushdown）功能优化数据加载。
-        仅加载指定的列以最小化内存占用。
+        仅加载指定的列以最小化内存占用；可选地将非空过滤一并下推。
         
         参数:
-            filepath (str): 文件路径 (.csv, .xlsx, .parquet)。
+            filepath (str): 文件路径 (.duckdb, .csv, .xlsx)。
             columns (list): 要加载的列名列表。如果为 None，则加载所有列。
+            dropna (list, optional): 需要非空的列。等价于加载后执行 df.dropna(subset=dropna)，
+                                     但在 DuckDB 中完成，被剔除的行不会进入 pandas。
+                                     NOTE: 过滤后行索引重新从 0 编号，需要回写原始数据集的接口
+                                     (如 PSM 保存匹配结果) 不应使用该参数。
+            strict (bool): True 时请求不存在的列会抛出 ValueError；
+                           False 时静默忽略不存在的列（适用于服务内部自行跳过缺失变量的场景）。
+            arrow (bool): 是否以 Arrow 支撑的字符串列加载（仅 .duckdb，见 load_data）。
+            compact (bool): 是否按画像收窄类型（仅 .duckdb，见 load_data）。
             
         返回:
             pd.DataFrame: 仅包含所请求列的数据框。
         """
         if not columns:
-            return DataService.load_data(filepath)
-            
+            if dropna:
+                return DataService.load_data(filepath, arrow=arrow, compact=compact).dropna(subset=dropna)
+            return DataService.load_data(filepath, arrow=arrow, compact=compact)
+
+        if not strict:
+            available = set(DataService.get_columns(filepath))
+            columns = [c for c in columns if c in available]
+            dropna = [c for c in (dropna or []) if c in available]
+            if not columns:
+                return pd.DataFrame()
+
         if filepath.endswith('.duckdb'):
             # 零解析查询（直接内存读取）
-            try:
-                try:
-                    con = duckdb.connect(filepath, read_only=True)
-                except (duckdb.SerializationException, duckdb.CatalogException, Exception):
-                    # Recovery: Probe for source files
-                    source_found = False
-                    base_path = filepath.rsplit('.', 1)[0]
-                    for ext in ['.csv', '.xlsx', '.xls']:
-                        src_path = base_path + ext
-                        if os.path.exists(src_path):
-                            try:
-                                DataService.ingest_data(src_path, filepath)
-                                con = duckdb.connect(filepath, read_only=True)
-                                source_found = True
-                                break
-                            except:
-                                continue
-                    if not source_found:
-                        raise
-
-                cols_sql = ", ".join([f'"{c}"' for c in columns])
-                df = con.sql(f"SELECT {cols_sql} FROM data").df()
-                con.close()
-                return df
-            except Exception as e:
-                # 如果列缺失或数据库损坏，抛出
-                raise ValueError(f"DuckDB 查询错误: {e}")
+            return DataService._load_duckdb(filepath, columns=columns, dropna=dropna, arrow=arrow, compact=compact)
  
         if not filepath.endswith('.csv'):
             # 针对 Excel 回退到 Pandas（DuckDB 的 Excel 支持需要安装扩展）
@@ -197,21 +1173,14 @@ class DataService:
             missing = [c for c in columns if c not in df.columns]
             if missing:
                 raise ValueError(f"列未找到: {missing}")
-            return df[columns]
+            df = df[columns]
+            return df.dropna(subset=dropna) if dropna else df
             
         try:
-            # DuckDB SQL 注入保护：内部是否处理了参数化路径？
-            # 如果本地路径可信，DuckDB 的 Python API 通常使用 f-string 处理本地路径是安全的。
-            # 但列名需要进行清理。
-            # 假设列名已经在上游进行了验证/清理，或者足够可信。
-            
-            # 构建列名字符串
-            # 使用双引号引用列名以处理空格/特殊字符
-            cols_sql = ", ".join([f'"{c}"' for c in columns])
-            
             # 使用 DuckDB 进行查询
-            # read_csv_auto 自动处理表头和类型
-            query = f"SELECT {cols_sql} FROM read_csv_auto('{filepath}', ignore_errors=true)"
+            # read_csv_auto 自动处理表头和类型；列名通过 quote_ident 引用以处理空格/特殊字符
+            source = f"read_csv_auto('{filepath}', ignore_errors=true)"
+            query = DataService._build_select(source, columns, dropna)
             
             # 执行并获取 Pandas DataFrame
             # 这将触发投影下推：仅从磁盘读取这些特定的列
@@ -220,127 +1189,68 @@ class DataService:
             
         except Exception as e:
             # 如果 DuckDB 失败（例如编码问题，尽管 read_csv_auto 很稳健），则回退到 Pandas
-            # print(f"DuckDB failed: {e}, falling back to Pandas")
-            df = DataService.load_data(filepath)
-            return df[columns]
+            df = DataService.load_data(filepath)[columns]
+            return df.dropna(subset=dropna) if dropna else df
 
     @staticmethod
-    def get_initial_metadata(filepath):
+    def get_initial_metadata(filepath, reuse_from=None, changed_columns=None):
         """
         读取并生成数据集的初始元数据 (使用 DuckDB 优化大文件读取)。
 
+        统计量来自 ProfileService 的单次批量扫描，并随数据文件持久化；
+        同一文件重复调用不会重新扫描。
+
         Args:
             filepath (str): 数据文件路径 (.duckdb, .csv, .xlsx)。
+            reuse_from (str, optional): 派生数据的来源文件，未改动列的统计量直接复用。
+            changed_columns (list, optional): 相对来源文件被修改或新增的列。
 
         Returns:
             dict: 包含变量列表、类型推断、缺失值统计及数据预览的字典。
         """
-        preview_data = []
+        from app.services.profile_service import ProfileService
+
+        profile = ProfileService.profile(filepath, reuse_from=reuse_from, changed_columns=changed_columns)
+
         raw_metadata = []
-        row_count = 0
-        
-        # Use DuckDB for metadata extraction without full load
-        con = None
-        try:
-            # 1. Connect / Create View
-            if filepath.endswith('.duckdb'):
-                con = duckdb.connect(filepath, read_only=True)
-                table_name = "data"
+        for col in profile['columns']:
+            unique_count = int(col['distinct'] or 0)
+
+            # Type Inference
+            # Map DuckDB types to our system types (continuous, categorical)
+            db_type_str = col['type']
+            if any(x in db_type_str for x in ['INT', 'DOUBLE', 'FLOAT', 'DECIMAL', 'BIGINT']):
+                var_type = 'continuous'
             else:
-                con = duckdb.connect(":memory:")
-                if filepath.endswith('.csv'):
-                    # Create a view directly on the CSV file (zero-copy if possible)
-                    con.sql(f"CREATE VIEW data AS SELECT * FROM read_csv_auto('{filepath}', ignore_errors=true)")
-                    table_name = "data"
-                elif filepath.endswith('.xlsx') or filepath.endswith('.xls'):
-                    # Excel still needs Pandas load unfortunately, unless we use extensions
-                    # Assuming we might have ingested it to DuckDB in upload_data, but if not:
-                    df = pd.read_excel(filepath)
-                    con.sql("CREATE VIEW data AS SELECT * FROM df")
-                    table_name = "data"
-                else:
-                    raise ValueError("Unsupported format")
+                var_type = 'categorical'
 
-            # 2. Get Row Count
-            row_count = con.sql(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
-            
-            # 3. Get Preview (Limit 5)
-            # Use fetchdf() to get Pandas DF for easier dict conversion, limits memory usage
-            preview_df = con.sql(f"SELECT * FROM {table_name} LIMIT 5").df()
-            preview_data = preview_df.replace({np.nan: None}).to_dict(orient='records')
-            
-            # 4. Get Column Stats using SUMMARIZE
-            # SUMMARIZE returns: [column_name, column_type, min, max, approx_unique, avg, std, q25, q50, q75, count, null_percentage]
-            # Note: DuckDB SUMMARIZE format might vary by version, let's robustly map
-            summary_df = con.sql(f"SUMMARIZE {table_name}").df()
-            
-            # Map summarize results to our metadata format
-            for _, row in summary_df.iterrows():
-                col_name = row.get('column_name')
-                col_type = row.get('column_type') # DuckDB type (INTEGER, VARCHAR, etc.)
-                
-                # Missing count: SUMMARIZE gives null_percentage usually string '0.5%'
-                # Let's calculate missing count from null_percentage * row_count or 'count'
-                # Actually newer DuckDB SUMMARIZE has 'null_percentage'.
-                # Let's try to be safe. Some versions return 'count' as non-null count.
-                # null_count = row_count - count
-                not_null_count = row.get('count', row_count)
-                missing_count = row_count - int(not_null_count) if not_null_count is not None else 0
-                
-                # Unique count: 'approx_unique'
-                try:
-                    unique_count = int(row.get('approx_unique', 0))
-                except:
-                    unique_count = 0
-                
-                # Type Inference
-                # Map DuckDB types to our system types (continuous, categorical)
-                db_type_str = str(col_type).upper()
-                if any(x in db_type_str for x in ['INT', 'DOUBLE', 'FLOAT', 'DECIMAL', 'BIGINT']):
-                    var_type = 'continuous'
-                else:
-                    var_type = 'categorical'
-                
-                # Heuristics based on stats
-                # If continuous but very few uniques (e.g. 0/1), treat as categorical
-                if var_type == 'continuous' and unique_count < 10:
-                    var_type = 'categorical'
-                
-                # If categorical but too many uniques, treat as text/id
-                if var_type == 'categorical' and unique_count > 50:
-                    var_type = 'text/id'
-                    
-                # Get Categories for small categorical vars
-                categories = None
-                if var_type == 'categorical' and unique_count < 50:
-                    try:
-                        # Use DISTINCT query for this specific column
-                        cats_df = con.sql(f'SELECT DISTINCT "{col_name}" FROM {table_name} LIMIT 50').df()
-                        categories = cats_df.iloc[:,0].dropna().tolist()
-                    except:
-                        pass
-
-                raw_metadata.append({
-                    'name': col_name,
-                    'type': var_type,
-                    'role': 'covariate',
-                    'missing_count': int(missing_count),
-                    'unique_count': int(unique_count),
-                    'categories': categories
-                })
+            # Heuristics based on stats
+            # If continuous but very few uniques (e.g. 0/1), treat as categorical
+            if var_type == 'continuous' and unique_count < 10:
+                var_type = 'categorical'
 
-        except Exception as e:
-            # Fallback for very old DuckDB or weird errors
-            print(f"DuckDB metadata extraction failed: {e}")
-            raise e
-        finally:
-            if con:
-                con.close()
+            # If categorical but too many uniques, treat as text/id
+            if var_type == 'categorical' and unique_count > 50:
+                var_type = 'text/id'
+
+            # Categories for small categorical vars, ordered by frequency
+            categories = None
+            if var_type == 'categorical' and unique_count < 50 and col['top_values'] is not None:
+                categories = [value for value, _ in col['top_values']]
+
+            raw_metadata.append({
+                'name': col['name'],
+                'type': var_type,
+                'role': 'covariate',
+                'missing_count': int(col['null_count']),
+                'unique_count': unique_count,
+                'categories': categories
+            })
 
         raw_result = {
             'variables': raw_metadata,
-            'row_count': int(row_count),
-            'preview': preview_data
+            'row_count': int(profile['row_count']),
+            'preview': profile['preview']
         }
         return DataService.sanitize_for_json(raw_result)
 
@@ -352,10 +1262,15 @@ class DataService:
         处理逻辑：
         - 将 NaN / Inf 转换为 None。
         - 将 Numpy 数值类型转换为 Python 原生类型。
+        - 数值列表 / numpy 数组整体在 numpy 中转换，不再逐元素调用 pd.isna / .item()
+          （生存预测、ROC 曲线等结果中单个列表可达数十万个元素）。
         """
         if isinstance(obj, dict):
             return {k: DataService.sanitize_for_json(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
+        elif isinstance(obj, (list, np.ndarray)):
+            bulk = DataService._sanitize_numeric(obj)
+            if bulk is not None:
+                return bulk
             return [DataService.sanitize_for_json(v) for v in obj]
         elif isinstance(obj, float):
             if pd.isna(obj) or math.isinf(obj):
@@ -372,15 +1287,47 @@ class DataService:
             return None
         return obj
 
+    @staticmethod
+    def _sanitize_numeric(values):
+        """
+        数值（含布尔）列表或数组的批量清洗；非纯数值（含 None、字符串、字典等）时返回 None。
+        """
+        if isinstance(values, list):
+            if not values or not isinstance(values[0], (int, float, np.number)):
+                return None
+            try:
+                arr = np.asarray(values)
+            except ValueError:  # 不规则嵌套列表
+                return None
+        else:
+            arr = values
+        if arr.dtype.kind in 'biu':
+            return arr.tolist()
+        if arr.dtype.kind != 'f':
+            return None
+        finite = np.isfinite(arr)
+        if finite.all():
+            return arr.tolist()
+        return np.where(finite, arr, None).tolist()
+
     @staticmethod
     def preprocess_for_formula(df):
         """
         为基于公式的库 (statsmodels, lifelines) 准备数据框。
         确保将 Object 类型的列转换为 'category'，以便公式引擎能够自动对其进行编码。
         """
-        df_mod = df.copy()
+        schema = df.attrs.get('schema') or {}
+        # 浅拷贝：Copy-on-Write 下只有被转换类型的列会生成新数组，其余列与调用方共享
+        df_mod = DataService.to_numpy_frame(df).copy(deep=False)
         for col in df_mod.columns:
-            if df_mod[col].dtype == 'object':
+            if isinstance(df_mod[col].dtype, pd.CategoricalDtype):
+                # 行过滤后残留的类别会在设计矩阵中产生全零列
+                df_mod[col] = df_mod[col].cat.remove_unused_categories()
+            elif df_mod[col].dtype == 'object':
+                if schema.get(col) == 'text':
+                    # 加载时已确定为非数值字符串列，无需再尝试数值转换
+                    df_mod[col] = df_mod[col].astype('category')
+                    continue
                 try:
                     df_mod[col] = df_mod[col].astype('float')
                 except:
@@ -404,13 +1351,16 @@ class DataService:
         返回:
             tuple: (df_encoded, new_features_list)
         """
-        df_mod = df.copy()
+        df_mod = DataService.to_numpy_frame(df).copy(deep=False)
         
         # Identify categorical cols in FEATURES only
         cat_cols = []
         for col in features:
             if col in df_mod.columns:
                 is_cat = df_mod[col].dtype == 'object' or str(df_mod[col].dtype) == 'category'
+                if str(df_mod[col].dtype) == 'category':
+                    # 行过滤后残留的类别会被 get_dummies 编码为全零列
+                    df_mod[col] = df_mod[col].cat.remove_unused_categories()
                 # Also treat low cardinality numerics as cat if in ref_levels
                 if ref_levels and col in ref_levels:
                     is_cat = True
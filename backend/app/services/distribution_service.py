@@ -0,0 +1,204 @@
+"""
+app.services.distribution_service.py
+
+变量分布服务。
+直方图与分类频数在 DuckDB 中以分箱聚合完成，只读取所需的列，不把数据集载入 pandas：
+数值列支持固定箱数、Freedman–Diaconis / Sturges / auto 规则（与 numpy.histogram 的同名规则一致）或自定义边界；
+分类列返回 Top N 类别及其余类别的合计 ("other")。
+批量接口一次返回多列的分布（EDA 页面的缩略图），语句数与列数无关。
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from app.config import Config
+from app.services.data_service import DataService
+
+BIN_RULES = ('fd', 'sturges', 'auto')
+
+
+class DistributionService:
+    @staticmethod
+    def parse_bins(value, default=20):
+        """
+        解析查询参数中的分箱设置：整数箱数、'fd' / 'sturges' / 'auto'，或逗号分隔的边界值。
+
+        Raises:
+            ValueError: 格式无效。
+        """
+        if value is None or value == '':
+            return default
+        if isinstance(value, (int, list)):
+            bins = value
+        elif value in BIN_RULES:
+            return value
+        elif ',' in value:
+            try:
+                bins = [float(v) for v in value.split(',') if v.strip()]
+            except ValueError:
+                raise ValueError(f"无效的分箱边界: {value}")
+        else:
+            try:
+                bins = int(value)
+            except ValueError:
+                raise ValueError(f"bins 必须为正整数、{' / '.join(BIN_RULES)} 或边界列表")
+        if isinstance(bins, int):
+            if not 1 <= bins <= Config.DISTRIBUTION_MAX_BINS:
+                raise ValueError(f"箱数必须在 1 到 {Config.DISTRIBUTION_MAX_BINS} 之间")
+            return bins
+        edges = [float(v) for v in bins]
+        if len(edges) < 2 or any(not math.isfinite(v) for v in edges) or any(b <= a for a, b in zip(edges, edges[1:])):
+            raise ValueError("分箱边界至少需要两个严格递增的有限数值")
+        if len(edges) - 1 > Config.DISTRIBUTION_MAX_BINS:
+            raise ValueError(f"箱数不能超过 {Config.DISTRIBUTION_MAX_BINS}")
+        return edges
+
+    @staticmethod
+    def distribution(filepath, column, bins=20, top_n=20):
+        """
+        单个变量的分布，见 batch。列不存在或没有可用值时返回 None。
+        """
+        return DistributionService.batch(filepath, [column], bins, top_n).get(column)
+
+    @staticmethod
+    def batch(filepath, columns=None, bins=20, top_n=20):
+        """
+        一次计算多个变量的分布（.duckdb 数据文件，含增量链）。
+
+        共三条语句：一条批量聚合得到各列的样本量、均值、标准差、最值与四分位距（分箱规则需要时），
+        一条 UNION ALL 按列分箱计数，一条 UNION ALL 按列统计 Top N 类别；每列只被读取一次。
+
+        Args:
+            columns (list, optional): 变量名；None 表示全部列。不存在的列被忽略。
+            bins: 整数箱数、'fd' / 'sturges' / 'auto'，或自定义边界列表（落在边界外的值不计数，
+                  最后一箱包含右边界）。
+            top_n (int): 分类变量返回的类别数，其余类别合计为 other。
+
+        Returns:
+            dict: {列名: 分布 | None}（列全部缺失时为 None；数值列只统计有限值）。数值列:
+                  {'type': 'numerical', 'x': 箱中心, 'y': 计数, 'edges', 'stats': {n, mean, std, min, max}}；
+                  分类列: {'type': 'categorical', 'x': 类别, 'y': 计数, 'other', 'stats': {n, unique}}。
+        """
+        if isinstance(bins, str) and bins not in BIN_RULES:
+            raise ValueError(f"不支持的分箱规则: {bins}")
+        with DataService.connect(filepath) as con:
+            return DistributionService._batch(con, columns, bins, top_n)
+
+    @staticmethod
+    def _batch(con, columns, bins, top_n):
+        """在连接的 data 表 / 视图上计算各列分布，见 batch。"""
+        top_n = max(1, int(top_n))
+        q = DataService.quote_ident
+        dtypes = con.execute("SELECT * FROM data LIMIT 0").df().dtypes
+        if columns is None:
+            columns = list(dtypes.index)
+        columns = [c for c in dict.fromkeys(columns) if c in dtypes.index]
+        numeric = [c for c in columns
+                   if pd.api.types.is_numeric_dtype(dtypes[c]) and not pd.api.types.is_bool_dtype(dtypes[c])]
+        categorical = [c for c in columns if c not in numeric]
+
+        need_iqr = bins in ('fd', 'auto')
+        exprs = []
+        for c in numeric:
+            # 只统计有限值：±inf 会使 stddev_samp 报错，也无法确定箱边界
+            x = f"CASE WHEN isfinite({q(c)}::DOUBLE) THEN {q(c)}::DOUBLE END"
+            exprs += [f"count({x})", f"avg({x})", f"stddev_samp({x})", f"min({x})", f"max({x})"]
+            if need_iqr:
+                exprs.append(f"quantile_cont({x}, [0.25, 0.75])")
+        summary = {}
+        if exprs:
+            values = con.execute(f"SELECT {', '.join(exprs)} FROM data").fetchone()
+            width = 6 if need_iqr else 5
+            for i, c in enumerate(numeric):
+                n, mean, std, lo, hi = values[i * width:i * width + 5]
+                iqr = (values[i * width + 5][1] - values[i * width + 5][0]) if need_iqr and n else 0.0
+                summary[c] = {'n': int(n), 'mean': mean, 'std': std, 'min': lo, 'max': hi, 'iqr': iqr}
+
+        results = {c: None for c in columns}
+        binned = [c for c in numeric if summary[c]['n']]
+        edges = {c: DistributionService._edges(bins, summary[c]) for c in binned}
+        if binned:
+            # 分组键使用不易与列名冲突的别名（GROUP BY 优先绑定同名的列）
+            parts = [
+                f"(SELECT {i} AS i, {DistributionService._bin_sql(q(c) + '::DOUBLE', edges[c], bins)} AS __bin, "
+                f"count(*) AS n FROM data WHERE isfinite({q(c)}::DOUBLE) GROUP BY __bin)"
+                for i, c in enumerate(binned)
+            ]
+            counts = {c: np.zeros(len(edges[c]) - 1, dtype=np.int64) for c in binned}
+            for i, b, n in con.execute(" UNION ALL ".join(parts)).fetchall():
+                if b is not None:
+                    counts[binned[i]][b] = n
+            for c in binned:
+                e = np.asarray(edges[c])
+                s = summary[c]
+                results[c] = DataService.sanitize_for_json({
+                    'type': 'numerical',
+                    'x': (e[:-1] + e[1:]) / 2,
+                    'y': counts[c],
+                    'edges': e,
+                    'stats': {'n': s['n'], 'mean': s['mean'], 'std': s['std'], 'min': s['min'], 'max': s['max']}
+                })
+
+        if categorical:
+            parts = [
+                f"(SELECT {i} AS i, {q(c)}::VARCHAR AS v, count(*) AS c, count(*) OVER () AS g, "
+                f"sum(count(*)) OVER () AS t FROM data WHERE {q(c)} IS NOT NULL "
+                f"GROUP BY {q(c)} ORDER BY c DESC, v LIMIT {top_n})"
+                for i, c in enumerate(categorical)
+            ]
+            tops = {c: [] for c in categorical}
+            totals = {}
+            for i, v, n, groups, total in con.execute(" UNION ALL ".join(parts)).fetchall():
+                tops[categorical[i]].append((v, int(n)))
+                totals[categorical[i]] = (int(groups), int(total))
+            for c in categorical:
+                if c not in totals:
+                    continue
+                pairs = sorted(tops[c], key=lambda kv: (-kv[1], kv[0]))
+                groups, total = totals[c]
+                results[c] = {
+                    'type': 'categorical',
+                    'x': [v for v, _ in pairs],
+                    'y': [n for _, n in pairs],
+                    'other': total - sum(n for _, n in pairs),
+                    'stats': {'n': total, 'unique': groups}
+                }
+        return results
+
+    @staticmethod
+    def _edges(bins, s):
+        """按 numpy.histogram 的规则确定箱边界。"""
+        if isinstance(bins, list):
+            return [float(v) for v in bins]
+        lo, hi = float(s['min']), float(s['max'])
+        if lo == hi:
+            lo, hi = lo - 0.5, hi + 0.5
+        if isinstance(bins, int):
+            k = bins
+        else:
+            n = s['n']
+            sturges = (s['max'] - s['min']) / (math.log2(n) + 1.0)
+            fd = 2.0 * s['iqr'] * n ** (-1.0 / 3.0)
+            if bins == 'sturges':
+                width = sturges
+            elif bins == 'fd':
+                width = fd
+            else:
+                width = min(fd, sturges) if fd else sturges
+            k = int(math.ceil((hi - lo) / width)) if width else 1
+            k = min(max(k, 1), Config.DISTRIBUTION_MAX_BINS)
+        return np.linspace(lo, hi, k + 1).tolist()
+
+    @staticmethod
+    def _bin_sql(x, edges, bins):
+        """箱序号表达式；落在边界外的值为 NULL。"""
+        k = len(edges) - 1
+        lo, hi = edges[0], edges[-1]
+        if not isinstance(bins, list):
+            # 等宽分箱：先乘后除，整数数据落在边界上时不受舍入影响；最大值归入最后一箱
+            return (f"least(floor(({x} - {lo!r}::DOUBLE) * {k} / ({hi!r}::DOUBLE - {lo!r}::DOUBLE)), "
+                    f"{k - 1})::INTEGER")
+        cases = " ".join(f"WHEN {x} < {e!r}::DOUBLE THEN {i}" for i, e in enumerate(edges[1:-1]))
+        return (f"CASE WHEN {x} < {lo!r}::DOUBLE OR {x} > {hi!r}::DOUBLE THEN NULL {cases} "
+                f"ELSE {k - 1} END")
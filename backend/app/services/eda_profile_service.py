@@ -0,0 +1,238 @@
+"""
+app.services.eda_profile_service.py
+
+预计算的 EDA 画像。
+数据集创建（上传、预处理派生、合并、队列筛选、追加行）后在后台任务中一次算好 EDA 页面需要的全部内容：
+逐列描述统计、直方图与高频类别、相关性最强的变量对（列数不多时连同完整热力图），
+以 <file>.eda.json 的形式保存在数据文件旁。EDA 接口在参数与画像一致时直接读取该文件，
+打开 EDA 页面只是一次文件读取；画像以增量链上各文件的版本校验是否过期。
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+from app.config import Config
+from app.services.approximate_eda_service import ApproximateEdaService
+from app.services.correlation_service import CorrelationService
+from app.services.data_service import DataService
+from app.services.distribution_service import DistributionService
+from app.services.eda_service import EdaService
+from app.services.job_service import JobService
+
+EDA_PROFILE_FORMAT = 1
+# 画像中的分布按接口默认参数计算：20 个等宽箱，分类变量保留前 20 个类别
+PROFILE_BINS = 20
+PROFILE_TOP_N = 20
+
+_building = set()
+_building_lock = threading.Lock()
+# 构建失败的文件: {文件路径: (增量链各文件版本, 错误信息)}。同一版本不再重复提交注定失败的构建
+_failed = {}
+
+
+class EdaProfileService:
+    @staticmethod
+    def sidecar_path(filepath):
+        return filepath + '.eda.json'
+
+    @staticmethod
+    def _versions(filepath):
+        versions = [v for _, v in DataService.chain_version(filepath)]
+        if any(v is None for v in versions):
+            return None
+        return [list(v) for v in versions]
+
+    @staticmethod
+    def load(filepath):
+        """
+        读取已保存的 EDA 画像；不存在、格式不符或数据已被改写时返回 None。
+        """
+        if not filepath or not filepath.endswith('.duckdb'):
+            return None
+        try:
+            with open(EdaProfileService.sidecar_path(filepath), 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if profile.get('format') != EDA_PROFILE_FORMAT:
+            return None
+        try:
+            versions = EdaProfileService._versions(filepath)
+        except ValueError:
+            return None
+        if versions is None or profile.get('version') != versions:
+            return None
+        return profile
+
+    @staticmethod
+    def failure(filepath):
+        """
+        当前版本的数据文件上次构建画像失败时返回错误信息，否则返回 None。数据被改写后失败记录自然失效。
+        """
+        key = os.path.abspath(filepath)
+        with _building_lock:
+            if key not in _failed:
+                return None
+            versions, message = _failed[key]
+        try:
+            current = EdaProfileService._versions(filepath)
+        except ValueError:
+            current = None
+        if current is None or current != versions:
+            with _building_lock:
+                if _failed.get(key, (None,))[0] == versions:
+                    del _failed[key]
+            return None
+        return message
+
+    @staticmethod
+    def remove(filepath):
+        try:
+            os.remove(EdaProfileService.sidecar_path(filepath))
+        except OSError:
+            pass
+        with _building_lock:
+            _failed.pop(os.path.abspath(filepath), None)
+
+    @staticmethod
+    def build(filepath):
+        """
+        计算并保存 EDA 画像（已有最新画像时直接返回）。计算期间数据被改写时不保存。
+        """
+        existing = EdaProfileService.load(filepath)
+        if existing is not None:
+            return existing
+        versions = EdaProfileService._versions(filepath)
+        stats = EdaService.get_basic_stats_sql(filepath)
+        distributions = DistributionService.batch(filepath, None, PROFILE_BINS, PROFILE_TOP_N)
+        numeric_count = sum(1 for s in stats if 'mean' in s)
+        heatmap = None
+        if numeric_count <= Config.EDA_PROFILE_HEATMAP_MAX_COLUMNS:
+            heatmap = EdaService.correlation_heatmap(CorrelationService.dataset_matrix(filepath))
+        k = Config.EDA_PROFILE_TOP_PAIRS
+        pairs = CorrelationService.dataset_top_pairs(filepath, k=k)
+
+        profile = {
+            'format': EDA_PROFILE_FORMAT,
+            'version': versions,
+            'built_at': time.time(),
+            'stats': stats,
+            'distributions': distributions,
+            'correlation': {'heatmap': heatmap, 'top_pairs': pairs, 'k': k}
+        }
+        if versions is not None and EdaProfileService._versions(filepath) == versions:
+            EdaProfileService._save(filepath, profile)
+        return profile
+
+    @staticmethod
+    def _save(filepath, profile):
+        path = EdaProfileService.sidecar_path(filepath)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            # 画像只是加速缓存，写入失败不影响主流程
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    @staticmethod
+    def schedule(filepath, force=False):
+        """
+        在后台任务中为数据文件构建 EDA 画像并抽取近似 EDA 用的样本；同一文件正在构建、
+        或当前版本已构建失败（见 failure）时不重复提交。失败时记录日志与失败记录。
+        EDA_PROFILE_PRECOMPUTE 关闭（force 为 False 时）或文件不是 DuckDB 格式时不做任何事。
+
+        Args:
+            force (bool): 忽略 EDA_PROFILE_PRECOMPUTE，用于画像接口按需构建。
+
+        Returns:
+            Job | None: 已提交的任务。
+        """
+        if not filepath or not filepath.endswith('.duckdb'):
+            return None
+        enabled = Config.EDA_PROFILE_PRECOMPUTE
+        if has_app_context():
+            enabled = current_app.config.get('EDA_PROFILE_PRECOMPUTE', enabled)
+        if not enabled and not force:
+            return None
+        if EdaProfileService.failure(filepath) is not None:
+            return None
+        logger = current_app.logger if has_app_context() else logging.getLogger(__name__)
+        key = os.path.abspath(filepath)
+        with _building_lock:
+            if key in _building:
+                return None
+            _building.add(key)
+
+        def run(job):
+            try:
+                if not os.path.exists(filepath):
+                    return None
+                versions = EdaProfileService._versions(filepath)
+                try:
+                    EdaProfileService.build(filepath)
+                except Exception as e:
+                    logger.error(f"EDA profile build failed for {os.path.basename(filepath)}: {e}", exc_info=True)
+                    if versions is not None:
+                        with _building_lock:
+                            _failed[key] = (versions, str(e))
+                    raise
+                # 同时抽取全部列的样本，画像回答不了的 EDA 请求（其他分箱、Spearman 等）在渐进模式下可先给出近似结果
+                info = ApproximateEdaService.sample(filepath)
+                if info is not None:
+                    ApproximateEdaService.stats(info)
+                return {'filepath': os.path.basename(filepath)}
+            finally:
+                with _building_lock:
+                    _building.discard(key)
+
+        try:
+            return JobService.submit('eda_profile', run)
+        except Exception:
+            with _building_lock:
+                _building.discard(key)
+            raise
+
+    @staticmethod
+    def distribution(profile, column, bins, top_n):
+        """
+        从画像中取出单个变量的分布（分箱参数与画像一致、所需类别数不超过画像保存的类别数时）。
+
+        Returns:
+            tuple: (是否可由画像提供, 分布 | None)。
+        """
+        distributions = profile.get('distributions') or {}
+        if bins != PROFILE_BINS or column not in distributions:
+            return False, None
+        dist = distributions[column]
+        if dist is None or dist['type'] != 'categorical':
+            return True, dist
+        if top_n >= len(dist['x']):
+            # 需要的类别数超过画像保存的类别数：只有画像已包含全部类别时才能回答
+            return (True, dist) if not dist['other'] or top_n == len(dist['x']) else (False, None)
+        return True, {
+            **dist,
+            'x': dist['x'][:top_n],
+            'y': dist['y'][:top_n],
+            'other': dist['other'] + sum(dist['y'][top_n:])
+        }
+
+    @staticmethod
+    def top_pairs(profile, k):
+        """从画像中取出最强的 k 对变量；画像保存的变量对不足以回答时返回 None。"""
+        correlation = profile.get('correlation') or {}
+        stored = correlation.get('top_pairs')
+        if not stored:
+            return None
+        # 保存的变量对少于计算时的 k，说明已是全部可计算的变量对
+        if k > len(stored['pairs']) and len(stored['pairs']) >= correlation.get('k', 0):
+            return None
+        return {**stored, 'pairs': stored['pairs'][:k]}
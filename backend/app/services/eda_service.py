@@ -4,10 +4,21 @@ app.services.eda_service.py
 探索性数据分析 (EDA) 服务。
 提供基础描述性统计（均值、标准差、分位数）、相关性矩阵以及数据分布可视化数据。
 """
+import os
+
 import pandas as pd
 import numpy as np
 import math
+from app.config import Config
+from app.services.correlation_service import CorrelationService
 from app.services.data_service import DataService
+from app.utils.frame_cache import ResultCache
+
+STATS_TOP_N = 5
+_NESTED_MARKERS = ('[]', 'STRUCT', 'MAP', 'UNION', 'BLOB', 'BIT')
+
+# 描述统计结果缓存：键含增量链上每个文件的版本，数据集被改写后旧条目自然失效
+_stats_cache = ResultCache('eda_stats', max_entries=Config.EDA_STATS_CACHE_ENTRIES)
 
 class EdaService:
     @staticmethod
@@ -52,23 +63,117 @@ class EdaService:
         return DataService.sanitize_for_json(stats)
 
     @staticmethod
-    def get_correlation(df):
+    def get_basic_stats_sql(filepath, exact=False):
         """
-        计算数值型变量间的 Pearson 相关系数矩阵。
+        在 DuckDB 中计算 DuckDB 数据文件（含增量链）的基础描述性统计，结果与 get_basic_stats 同构。
+
+        所有列的计数及数值列的均值、标准差、最值与分位数由批量聚合语句给出（每 PROFILE_BATCH_COLUMNS 列一条）；
+        分类列的 Top 5 频数与唯一值个数由按列 GROUP BY 合并成的一条 UNION ALL 语句给出。
+        数据不经过 pandas，结果按数据集版本缓存。
+
+        Args:
+            filepath (str): .duckdb 数据文件路径。
+            exact (bool): 为 True 时分位数精确计算；否则超过 EDA_EXACT_STATS_MAX_ROWS 行的表
+                使用基于蓄水池抽样的近似分位数（其余指标始终精确）。
+
+        Returns:
+            list: 每列一个统计字典。
         """
-        numeric_df = df.select_dtypes(include=[np.number])
-        if numeric_df.empty:
-            return {'columns': [], 'matrix': []}
+        key = (os.path.abspath(filepath), DataService.chain_version(filepath), bool(exact))
+        cached = _stats_cache.get(key)
+        if cached is not None:
+            return [dict(col) for col in cached]
 
-        corr_matrix = numeric_df.corr(method='pearson')
-        
-        # 转换为 Heatmap 格式: x, y, z
-        columns = list(corr_matrix.columns)
-        z = corr_matrix.where(pd.notnull(corr_matrix), 0).values.tolist() # 将空相关系数替换为 0
-        
+        with DataService.connect(filepath) as con:
+            row_count = con.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+            dtypes = con.execute("SELECT * FROM data LIMIT 0").df().dtypes
+            sql_types = {r[0]: r[1] for r in con.execute("DESCRIBE data").fetchall()}
+            use_exact = bool(exact) or row_count <= Config.EDA_EXACT_STATS_MAX_ROWS
+            stats = EdaService._aggregate_stats(con, dtypes, sql_types, row_count, use_exact)
+
+        stats = _stats_cache.put(key, DataService.sanitize_for_json(stats))
+        return [dict(col) for col in stats]
+
+    @staticmethod
+    def _aggregate_stats(con, dtypes, sql_types, row_count, exact):
+        q = DataService.quote_ident
+        quantile_fn = 'quantile_cont' if exact else 'reservoir_quantile'
+        batch_size = max(1, Config.PROFILE_BATCH_COLUMNS)
+        names = list(dtypes.index)
+        stats = {}
+        categorical = []
+
+        for start in range(0, len(names), batch_size):
+            exprs, slots = [], []
+            for name in names[start:start + batch_size]:
+                col = q(name)
+                stats[name] = {'name': name, 'type': str(dtypes[name])}
+                fields = [('count', f"count({col})")]
+                if pd.api.types.is_numeric_dtype(dtypes[name]):
+                    x = f"{col}::DOUBLE"
+                    fields += [
+                        ('mean', f"avg({x})"), ('std', DataService.stddev_sql(x)),
+                        ('min', f"min({x})"), ('max', f"max({x})"),
+                        ('quantiles', f"{quantile_fn}({x}, [0.25, 0.5, 0.75])")
+                    ]
+                elif not any(m in sql_types[name] for m in _NESTED_MARKERS):
+                    categorical.append(name)
+                for field, expr in fields:
+                    exprs.append(expr)
+                    slots.append((name, field))
+            values = con.execute(f"SELECT {', '.join(exprs)} FROM data").fetchone()
+            for (name, field), value in zip(slots, values):
+                col_stats = stats[name]
+                if field == 'count':
+                    col_stats['count'] = int(value)
+                    col_stats['missing'] = int(row_count) - int(value)
+                elif field == 'quantiles':
+                    qs = value or [None, None, None]
+                    col_stats.update({'q25': qs[0], 'q50': qs[1], 'q75': qs[2]})
+                else:
+                    col_stats[field] = value
+
+        # 分类列：每列 GROUP BY 后取 Top N，窗口 count(*) OVER () 即分组数（精确的唯一值个数）。
+        # 比 histogram() 快，且不需要单独的 COUNT(DISTINCT) 扫描
+        for start in range(0, len(categorical), batch_size):
+            batch = categorical[start:start + batch_size]
+            parts = [
+                f"(SELECT {i} AS i, {q(n)}::VARCHAR AS v, count(*) AS c, count(*) OVER () AS n FROM data "
+                f"WHERE {q(n)} IS NOT NULL GROUP BY {q(n)} ORDER BY c DESC, v LIMIT {STATS_TOP_N})"
+                for i, n in enumerate(batch)
+            ]
+            tops = {n: [] for n in batch}
+            unique = {n: 0 for n in batch}
+            for i, v, c, n in con.execute(" UNION ALL ".join(parts)).fetchall():
+                tops[batch[i]].append((v, c))
+                unique[batch[i]] = n
+            for name in batch:
+                pairs = sorted(tops[name], key=lambda kv: (-kv[1], kv[0]))
+                stats[name].update({
+                    'top_values': [v for v, _ in pairs],
+                    'top_counts': [int(c) for _, c in pairs],
+                    'unique_count': int(unique[name])
+                })
+
+        return [stats[n] for n in names]
+
+    @staticmethod
+    def get_correlation(df, method='pearson'):
+        """
+        计算数值型变量间的相关系数矩阵（Pearson 或 Spearman，逐对完整样本），见 CorrelationService。
+        """
+        return EdaService.correlation_heatmap(CorrelationService.matrix(df, method))
+
+    @staticmethod
+    def correlation_heatmap(result):
+        """
+        将 CorrelationService 的矩阵结果转换为热力图格式（无法计算的系数记为 0）。
+        """
         return DataService.sanitize_for_json({
-            'columns': columns,
-            'matrix': z
+            'method': result['method'],
+            'columns': result['columns'],
+            'matrix': np.nan_to_num(result['r'], nan=0.0),
+            'counts': result['n']
         })
 
     @staticmethod
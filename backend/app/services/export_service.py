@@ -2,12 +2,66 @@
 app.services.export_service.py
 
 导出服务。
-负责将统计分析与建模结果导出为 Excel 格式，便于用户撰写论文或进行离线分析。
+负责将统计分析与建模结果导出为 Excel 格式，便于用户撰写论文或进行离线分析；
+以及数据集下载：从 DuckDB 按 record batch 读取，逐批编码为 CSV / Parquet / Arrow IPC（可选 gzip）
+直接写入 HTTP 响应，同时写入以 (数据集 id, version, 格式) 为键的导出缓存（UPLOAD_FOLDER/exports）。
 """
-import pandas as pd
+import glob
+import gzip
 import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from flask import current_app
 
+from app.config import Config
+from app.services.data_service import DataService
+
+EXPORT_FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.stream'),
+}
+# Parquet 自带列式压缩，再套一层 gzip 只会变慢
+GZIP_FORMATS = {'csv', 'arrow'}
+
+
+class _ChunkSink:
+    """
+    编码器的输出端：字节同时写入缓存文件并暂存，由生成器在每批之后取走发送给客户端。
+    """
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        if self.cache_file is not None:
+            self.cache_file.write(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
 class ExportService:
     @staticmethod
     def export_results_to_excel(results, filename):
@@ -37,3 +91,169 @@ class ExportService:
                 df_metrics.to_excel(writer, sheet_name='Metrics', index=False)
                 
         return filepath
+
+    @staticmethod
+    def resolve_format(fmt, compression=None):
+        """
+        校验导出格式与压缩方式。
+
+        Returns:
+            tuple: (fmt, use_gzip)
+
+        Raises:
+            ValueError: 不支持的格式或压缩组合。
+        """
+        fmt = (fmt or 'csv').lower()
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        compression = (compression or '').lower()
+        if compression not in ('', 'none', 'gzip'):
+            raise ValueError(f"Unsupported compression: {compression}")
+        use_gzip = compression == 'gzip'
+        if use_gzip and fmt not in GZIP_FORMATS:
+            raise ValueError(f"gzip compression is not supported for {fmt}")
+        return fmt, use_gzip
+
+    @staticmethod
+    def mimetype(fmt, use_gzip=False):
+        return 'application/gzip' if use_gzip else EXPORT_FORMATS[fmt][1]
+
+    @staticmethod
+    def download_name(dataset_name, fmt, use_gzip=False):
+        """
+        下载文件名。CSV 保持旧行为（原名非 .csv 结尾时追加 .csv），其余格式替换原扩展名。
+        """
+        name = dataset_name or 'dataset'
+        ext = EXPORT_FORMATS[fmt][0]
+        if fmt == 'csv':
+            if not name.lower().endswith('.csv'):
+                name += '.csv'
+        else:
+            stem, old_ext = os.path.splitext(name)
+            if old_ext.lower() in ('.csv', '.xlsx', '.xls', '.duckdb'):
+                name = stem
+            name += ext
+        return name + '.gz' if use_gzip else name
+
+    @staticmethod
+    def cache_dir(upload_folder):
+        return os.path.join(upload_folder, 'exports')
+
+    @staticmethod
+    def cache_path(upload_folder, dataset, fmt, use_gzip=False):
+        ext = EXPORT_FORMATS[fmt][0] + ('.gz' if use_gzip else '')
+        version = dataset.version or 1
+        return os.path.join(ExportService.cache_dir(upload_folder), f"{dataset.id}_v{version}{ext}")
+
+    @staticmethod
+    def cached(upload_folder, dataset, fmt, use_gzip=False):
+        """
+        返回可直接发送的缓存文件路径；缓存不存在或早于数据文件时返回 None。
+        """
+        path = ExportService.cache_path(upload_folder, dataset, fmt, use_gzip)
+        if not os.path.exists(path):
+            return None
+        if dataset.filepath and os.path.exists(dataset.filepath) \
+                and os.path.getmtime(path) < os.path.getmtime(dataset.filepath):
+            return None
+        return path
+
+    @staticmethod
+    def purge(upload_folder, dataset_id, keep_version=None):
+        """
+        删除某个数据集的导出缓存；指定 keep_version 时保留该版本的各格式文件。
+        """
+        keep = f"{dataset_id}_v{keep_version}" if keep_version is not None else None
+        pattern = os.path.join(ExportService.cache_dir(upload_folder), f"{dataset_id}_v*")
+        for path in glob.glob(pattern):
+            name = os.path.basename(path)
+            if name.endswith('.part') or name.split('.', 1)[0] == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _open_reader(filepath, batch_rows):
+        """
+        打开 record batch 读取器。
+
+        Returns:
+            tuple: (RecordBatchReader, close_fn)
+        """
+        if filepath.endswith('.duckdb'):
+            con = DataService.open_connection(filepath)
+            try:
+                reader = con.execute("SELECT * FROM data").fetch_record_batch(batch_rows)
+            except Exception:
+                con.close()
+                raise
+            return reader, con.close
+        # 旧版 CSV/Excel 文件：整表读入后按批编码
+        df = DataService.load_data(filepath)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        return table.to_reader(max_chunksize=batch_rows), lambda: None
+
+    @staticmethod
+    def _writer(fmt, target, schema):
+        if fmt == 'csv':
+            return pa_csv.CSVWriter(target, schema)
+        if fmt == 'parquet':
+            return pq.ParquetWriter(target, schema)
+        return pa.ipc.new_stream(target, schema)
+
+    @staticmethod
+    def stream(filepath, fmt, use_gzip=False, cache_path=None, on_cached=None):
+        """
+        生成导出内容的字节块，每个 record batch 编码后立即产出。
+
+        cache_path 非空时同时写入 <cache_path>.part，完整结束后原子替换为缓存文件并调用 on_cached(cache_path)；
+        客户端中途断开（生成器被关闭）时丢弃未完成的缓存文件。
+        """
+        batch_rows = Config.EXPORT_BATCH_ROWS
+        reader, close_reader = ExportService._open_reader(filepath, batch_rows)
+
+        tmp_path = cache_file = None
+        if cache_path:
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(
+                    dir=os.path.dirname(cache_path), prefix=os.path.basename(cache_path) + '.', suffix='.part')
+                cache_file = os.fdopen(fd, 'wb')
+            except OSError:
+                # 缓存目录不可写时仍然正常导出，只是不缓存
+                tmp_path = cache_file = None
+
+        return ExportService._generate(reader, close_reader, fmt, use_gzip, cache_file, tmp_path, cache_path, on_cached)
+
+    @staticmethod
+    def _generate(reader, close_reader, fmt, use_gzip, cache_file, tmp_path, cache_path, on_cached):
+        sink = _ChunkSink(cache_file)
+        compressor = gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=6) if use_gzip else None
+        completed = False
+        try:
+            writer = ExportService._writer(fmt, compressor or sink, reader.schema)
+            for batch in reader:
+                writer.write_batch(batch)
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            writer.close()
+            if compressor is not None:
+                compressor.close()
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+            completed = True
+        finally:
+            reader = None
+            close_reader()
+            if cache_file is not None:
+                cache_file.close()
+                if completed:
+                    os.replace(tmp_path, cache_path)
+                    if on_cached:
+                        on_cached(cache_path)
+                elif os.path.exists(tmp_path):
+                    os.remove(tmp_path)
@@ -0,0 +1,182 @@
+"""
+app.services.job_service.py
+
+后台任务服务。
+将耗时操作（如大文件导入）移出请求线程，提供任务编号、进度查询与协作式取消。
+任务注册表保存在进程内存中：多进程部署时需将同一用户的轮询请求路由到同一进程。
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import Config
+
+
+class JobCancelled(Exception):
+    """任务被用户取消时在工作线程内抛出，用于中止后续步骤。"""
+
+
+class Job:
+    """
+    单个后台任务的状态。
+
+    status: queued -> running -> succeeded / failed / cancelled
+    phase/bytes_read/bytes_total/rows 由任务函数通过 update() 汇报。
+    """
+
+    def __init__(self, kind, owner_id=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner_id = owner_id
+        self.status = 'queued'
+        self.phase = None
+        self.bytes_read = 0
+        self.bytes_total = None
+        self.rows = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        self._lock = threading.Lock()
+
+    def update(self, phase=None, bytes_read=None, bytes_total=None, rows=None):
+        """
+        汇报进度；若任务已被请求取消则抛出 JobCancelled，让任务在下一个检查点退出。
+        """
+        with self._lock:
+            if phase is not None:
+                self.phase = phase
+            if bytes_read is not None:
+                self.bytes_read = bytes_read
+            if bytes_total is not None:
+                self.bytes_total = bytes_total
+            if rows is not None:
+                self.rows = rows
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def wait(self, timeout=None):
+        """阻塞等待任务结束（主要用于测试与脚本）。"""
+        if self.future is not None:
+            try:
+                self.future.result(timeout=timeout)
+            except Exception:
+                pass
+        return self
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def to_dict(self):
+        with self._lock:
+            progress = None
+            if self.bytes_total:
+                progress = round(min(self.bytes_read / self.bytes_total, 1.0), 4)
+            return {
+                'job_id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'phase': self.phase,
+                'bytes_read': self.bytes_read,
+                'bytes_total': self.bytes_total,
+                'rows': self.rows,
+                'progress': progress,
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+
+class JobService:
+    _executor = None
+    _jobs = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_executor():
+        with JobService._lock:
+            if JobService._executor is None:
+                JobService._executor = ThreadPoolExecutor(
+                    max_workers=Config.JOB_WORKERS, thread_name_prefix='insight-job'
+                )
+            return JobService._executor
+
+    @staticmethod
+    def _prune():
+        """清理超过 JOB_TTL_SECONDS 的已结束任务，避免注册表无限增长。"""
+        cutoff = time.time() - Config.JOB_TTL_SECONDS
+        with JobService._lock:
+            for job_id in [k for k, j in JobService._jobs.items()
+                           if j.finished and j.finished_at and j.finished_at < cutoff]:
+                del JobService._jobs[job_id]
+
+    @staticmethod
+    def submit(kind, fn, *args, owner_id=None, on_cancel=None, on_error=None, **kwargs):
+        """
+        提交后台任务。
+
+        Args:
+            kind (str): 任务类型，如 'ingest'。
+            fn (callable): 任务函数，第一个参数为 Job，用于汇报进度与检查取消；返回值写入 job.result。
+            owner_id (int, optional): 发起用户 ID，用于接口鉴权。
+            on_cancel (callable, optional): 任务被取消后的清理回调 on_cancel(job)。
+            on_error (callable, optional): 任务失败后的回调 on_error(job, exc)。
+
+        Returns:
+            Job: 已登记的任务对象。
+        """
+        JobService._prune()
+        job = Job(kind, owner_id=owner_id)
+        with JobService._lock:
+            JobService._jobs[job.id] = job
+
+        def run():
+            if job.cancel_event.is_set():
+                job.status = 'cancelled'
+            else:
+                job.status = 'running'
+                try:
+                    job.result = fn(job, *args, **kwargs)
+                    job.status = 'succeeded'
+                except Exception as e:
+                    # 取消可能表现为 JobCancelled，也可能是被中断的 DuckDB 查询抛出的异常
+                    if job.cancel_event.is_set():
+                        job.status = 'cancelled'
+                    else:
+                        job.status = 'failed'
+                        job.error = str(e)
+                        if on_error is not None:
+                            on_error(job, e)
+            if job.status == 'cancelled' and on_cancel is not None:
+                on_cancel(job)
+            job.finished_at = time.time()
+
+        job.future = JobService._get_executor().submit(run)
+        return job
+
+    @staticmethod
+    def get(job_id):
+        with JobService._lock:
+            return JobService._jobs.get(job_id)
+
+    @staticmethod
+    def cancel(job_id):
+        """
+        请求取消任务。取消是协作式的：任务在下一次 update()/check_cancelled() 时退出。
+
+        Returns:
+            bool: 任务存在且尚未结束时返回 True。
+        """
+        job = JobService.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_event.set()
+        return True
@@ -0,0 +1,223 @@
+"""
+app.services.merge_service.py
+
+数据集合并服务。
+基线表、检验表、随访表等按键连接 (join)，或将新批次纵向追加 (append) 到已有数据集，
+全部在 DuckDB 中完成：输入数据集（含增量链）只读挂载到写出连接上，结果直接写入新的物理文件，
+数据不经过 pandas，多 GB 的合并也只占用 DuckDB 的流式内存。结果登记为新的派生数据集。
+"""
+import contextlib
+import json
+import os
+
+import duckdb
+
+from app import db
+from app.models.dataset import Dataset
+from app.services.data_service import DataService
+from app.services.eda_profile_service import EdaProfileService
+from app.services.storage_service import StorageService
+from app.utils.file_lock import dataset_lock
+
+JOIN_TYPES = {'inner': 'INNER', 'left': 'LEFT', 'right': 'RIGHT', 'outer': 'FULL OUTER'}
+VALIDATE_TYPES = {'1:1', '1:m', 'm:1', 'm:m'}
+
+
+class MergeService:
+    @staticmethod
+    def join(left, right, on=None, left_on=None, right_on=None, how='inner', validate=None,
+             suffixes=('_x', '_y'), name=None):
+        """
+        按键连接两个数据集，生成新的派生数据集（父数据集为 left）。
+
+        Args:
+            left, right (Dataset): 同一项目中的两个数据集。
+            on (list, optional): 两侧同名的键列；结果中只保留一份（外连接时取两侧非空者）。
+            left_on, right_on (list, optional): 两侧键列不同名时分别指定，结果保留两侧键列。
+            how (str): inner / left / right / outer。
+            validate (str, optional): 键关系检查 '1:1' / '1:m' / 'm:1' / 'm:m'，"1" 一侧的键必须唯一。
+            suffixes (tuple): 两侧同名非键列的后缀。
+            name (str, optional): 新数据集显示名。
+
+        Returns:
+            tuple: (新 Dataset, {'row_count', 'columns'})。
+
+        Raises:
+            ValueError: 参数无效、键列不存在、键类型不兼容或违反 validate。
+
+        NOTE: 键匹配遵循 SQL 语义，键为空值的行不会与任何行匹配。
+        """
+        if how not in JOIN_TYPES:
+            raise ValueError(f"不支持的连接方式: {how}")
+        if validate is not None and validate not in VALIDATE_TYPES:
+            raise ValueError(f"validate 必须为 {', '.join(sorted(VALIDATE_TYPES))} 之一")
+        if on:
+            left_on = right_on = list(on) if isinstance(on, (list, tuple)) else [on]
+        else:
+            left_on = list(left_on or [])
+            right_on = list(right_on or [])
+        if not left_on or len(left_on) != len(right_on):
+            raise ValueError("必须提供 on，或等长的 left_on / right_on")
+        if not isinstance(suffixes, (list, tuple)) or len(suffixes) != 2 or suffixes[0] == suffixes[1]:
+            raise ValueError("suffixes 必须为两个不同的后缀")
+        MergeService._check_same_project(left, [right])
+
+        def build(con):
+            lcols = MergeService._columns(con, 'l')
+            rcols = MergeService._columns(con, 'r')
+            missing = [c for c in left_on if c not in lcols] + [c for c in right_on if c not in rcols]
+            if missing:
+                raise ValueError(f"键列不存在: {', '.join(missing)}")
+            if validate in ('1:1', '1:m'):
+                MergeService._check_unique(con, 'l', left_on, '左侧')
+            if validate in ('1:1', 'm:1'):
+                MergeService._check_unique(con, 'r', right_on, '右侧')
+
+            q = DataService.quote_ident
+            shared_keys = set(left_on) if on else set()
+            right_rest = [c for c in rcols if c not in shared_keys]
+            overlap = (set(lcols) - shared_keys) & set(right_rest)
+            select, names = [], []
+            for c in lcols:
+                if c in shared_keys and how in ('right', 'outer'):
+                    expr = f"COALESCE(l.{q(c)}, r.{q(c)})"
+                else:
+                    expr = f"l.{q(c)}"
+                names.append(c + suffixes[0] if c in overlap else c)
+                select.append(f"{expr} AS {q(names[-1])}")
+            for c in right_rest:
+                names.append(c + suffixes[1] if c in overlap else c)
+                select.append(f"r.{q(c)} AS {q(names[-1])}")
+            if len(set(names)) != len(names):
+                raise ValueError("加后缀后列名仍然重复，请更换 suffixes")
+
+            cond = " AND ".join(f"l.{q(a)} = r.{q(b)}" for a, b in zip(left_on, right_on))
+            # 结果行序：主表的行序在前（外连接中只出现在右表的行排在最后）
+            order = "r.__ord, l.__ord" if how == 'right' else "l.__ord NULLS LAST, r.__ord"
+            return (f"SELECT {', '.join(select)} FROM l {JOIN_TYPES[how]} JOIN r ON {cond} "
+                    f"ORDER BY {order}")
+
+        log = {
+            'right_dataset_id': right.id, 'left_on': left_on, 'right_on': right_on,
+            'how': how, 'validate': validate, 'suffixes': list(suffixes)
+        }
+        hash_log = {**log, 'right': right.content_hash} if right.content_hash else None
+        return MergeService._create(left, [('l', left), ('r', right)], build, 'join', 'joined', log, hash_log, name)
+
+    @staticmethod
+    def append(target, others, source_column=None, name=None):
+        """
+        将若干数据集按列名纵向追加到 target 之后，生成新的派生数据集（父数据集为 target）。
+        只在部分批次中出现的列以空值补齐；同名列类型不同时由 DuckDB 提升为兼容类型。
+
+        Args:
+            target (Dataset): 被追加的数据集。
+            others (list): 追加的数据集（按顺序）。
+            source_column (str, optional): 记录每行来源数据集名称的新列名。
+
+        Returns:
+            tuple: (新 Dataset, {'row_count', 'columns'})。
+        """
+        if not others:
+            raise ValueError("至少需要一个追加的数据集")
+        MergeService._check_same_project(target, others)
+        sources = [(f"s{i}", ds) for i, ds in enumerate([target] + list(others))]
+
+        def build(con):
+            if source_column is not None and any(source_column in MergeService._columns(con, a) for a, _ in sources):
+                raise ValueError(f"来源列名与已有列冲突: {source_column}")
+            parts = []
+            for i, (alias, ds) in enumerate(sources):
+                label = ""
+                if source_column is not None:
+                    text = (ds.name or str(ds.id)).replace("'", "''")
+                    label = f", '{text}' AS {DataService.quote_ident(source_column)}"
+                parts.append(f"SELECT *{label}, {i} AS __batch FROM {alias}")
+            return (f"SELECT * EXCLUDE (__batch, __ord) FROM ({' UNION ALL BY NAME '.join(parts)}) "
+                    f"ORDER BY __batch, __ord")
+
+        log = {'dataset_ids': [ds.id for ds in others], 'source_column': source_column}
+        hashes = [ds.content_hash for ds in others]
+        hash_log = {**log, 'sources': hashes} if all(hashes) else None
+        return MergeService._create(target, sources, build, 'append', 'appended', log, hash_log, name)
+
+    @staticmethod
+    def _check_same_project(base, others):
+        for ds in others:
+            if ds.project_id != base.project_id:
+                raise ValueError("只能合并同一项目中的数据集")
+        for ds in [base] + list(others):
+            if not ds.filepath or not ds.filepath.endswith('.duckdb'):
+                raise ValueError("合并仅支持已转换为 DuckDB 格式的数据集")
+            if ds.status != 'ready':
+                raise ValueError(f"数据集 {ds.id} 尚未就绪")
+
+    @staticmethod
+    def _columns(con, alias):
+        return [r[0] for r in con.execute(f"DESCRIBE SELECT * EXCLUDE (__ord) FROM {alias}").fetchall()]
+
+    @staticmethod
+    def _check_unique(con, alias, keys, side):
+        cols = ', '.join(DataService.quote_ident(c) for c in keys)
+        dup = con.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {alias} GROUP BY {cols} HAVING COUNT(*) > 1)"
+        ).fetchone()[0]
+        if dup:
+            raise ValueError(f"{side}数据集的键 ({', '.join(keys)}) 不唯一：{dup} 个键值重复出现")
+
+    @staticmethod
+    def _create(parent, sources, build, action_type, suffix, log, hash_log, name):
+        content_hash = StorageService.derived_hash(parent.content_hash, action_type, hash_log) if hash_log else None
+        existing = StorageService.find_reusable(content_hash)
+        name_part, ext = os.path.splitext(os.path.basename(parent.filepath))
+        if existing is not None:
+            filepath = existing.filepath
+        else:
+            filepath = StorageService.unique_path(
+                os.path.join(os.path.dirname(parent.filepath), f"{name_part}_{suffix}{ext}"))
+            MergeService._write(filepath, [(alias, ds.filepath) for alias, ds in sources], build)
+
+        display_part = os.path.splitext(parent.name)[0] if parent.name else name_part
+        dataset = Dataset(
+            project_id=parent.project_id,
+            name=name or f"{display_part}_{suffix}{ext}",
+            filepath=filepath,
+            parent_id=parent.id,
+            action_type=action_type,
+            action_log=json.dumps(log, ensure_ascii=False),
+            content_hash=content_hash
+        )
+        dataset.meta_data = existing.meta_data if existing is not None else DataService.get_initial_metadata(filepath)
+        db.session.add(dataset)
+        db.session.commit()
+        EdaProfileService.schedule(filepath)
+        return dataset, {
+            'row_count': dataset.row_count,
+            'columns': [v['name'] for v in dataset.meta_data.get('variables', [])]
+        }
+
+    @staticmethod
+    def _write(filepath, sources, build):
+        """在写出连接上挂载各输入数据集（持读锁），执行 build(con) 返回的查询并原子替换到 filepath。"""
+        tmp_path = DataService._tmp_path(filepath)
+        try:
+            with contextlib.ExitStack() as locks:
+                con = duckdb.connect(tmp_path)
+                try:
+                    attached = {}
+                    for alias, path in sources:
+                        locks.enter_context(dataset_lock(path))
+                        for parent in DataService.lineage_chain(path)[1:]:
+                            locks.enter_context(dataset_lock(parent))
+                        DataService.attach_dataset(con, path, alias, attached)
+                    sql = build(con)
+                    try:
+                        con.execute(f"CREATE TABLE data AS {sql}")
+                    except (duckdb.BinderException, duckdb.ConversionException) as e:
+                        # 键列类型不兼容等
+                        raise ValueError(f"合并失败: {e}")
+                finally:
+                    con.close()
+            DataService._replace(tmp_path, filepath)
+        finally:
+            DataService._discard(tmp_path)
@@ -5,6 +5,7 @@ app.services.modeling_service.py
 包含数据完整性校验、策略模式的模型分发以及结果的标准化格式化。
 """
 
+from app.services.correlation_service import CorrelationService
 from app.services.data_service import DataService
 from app.modeling.registry import ModelRegistry
 from app.modeling.linear import LinearRegressionStrategy, LogisticRegressionStrategy
@@ -224,16 +225,10 @@ class ModelingService:
             if numeric_df.empty or numeric_df.shape[1] < 2:
                 return "检测到奇异矩阵。请检查数据是否包含足够的变异，或者样本量是否过小。"
             
-            corr_matrix = numeric_df.corr().abs()
+            corr = CorrelationService.matrix(numeric_df)
             
-            # 寻找具有高度相关性 (>0.95) 的变量对
-            # 迭代上三角矩阵
-            high_corr_pairs = []
-            cols = corr_matrix.columns
-            for i in range(len(cols)):
-                for j in range(i+1, len(cols)):
-                    if corr_matrix.iloc[i, j] > 0.95:
-                        high_corr_pairs.append(f"{cols[i]} & {cols[j]} (r={corr_matrix.iloc[i, j]:.2f})")
+            # 寻找具有高度相关性 (>0.95) 的变量对（上三角）
+            high_corr_pairs = [f"{x} & {y} (r={abs(r):.2f})" for x, y, r in CorrelationService.pairs_above(corr, 0.95)]
             
             if high_corr_pairs:
                 return (
@@ -7,6 +7,8 @@ app.services.preprocessing_service.py
 import pandas as pd
 import numpy as np
 from app.services.data_service import DataService
+from app.services.eda_profile_service import EdaProfileService
+from app.services.storage_service import StorageService
 from app.models.dataset import Dataset
 from app import db
 import os
@@ -25,8 +27,8 @@ class PreprocessingService:
         Returns:
             pd.DataFrame: 处理后的新 DataFrame。
         """
-        # copy to avoid mutating original if needed (though here we want to return new one)
-        df = df.copy()
+        # 浅拷贝：Copy-on-Write 下只有被填补的列会真正复制，调用方的数据保持不变
+        df = df.copy(deep=False)
 
         # 1. 首先处理简单填补和删除
         # (先执行这一步可以确保后续 MICE 预测器在需要时能获得完整的数据)
@@ -128,8 +130,6 @@ class PreprocessingService:
         Returns:
             pd.DataFrame: 编码后的数据集。
         """
-        df = df.copy()
-        
         valid_cols = [c for c in columns if c in df.columns]
         if not valid_cols:
             return df
@@ -141,11 +141,12 @@ class PreprocessingService:
         return df
 
     @staticmethod
-    @staticmethod
-    def save_processed_dataset(original_dataset_id, new_df, suffix, user_id, overwrite_id=None, parent_id=None, action_type=None, log=None):
+    def save_processed_dataset(original_dataset_id, new_df, suffix, user_id, overwrite_id=None, parent_id=None, action_type=None, log=None, changed_columns=None):
         """
         将处理后的 DataFrame 保存为新的数据集记录并生成物理文件。
         如果提供了 overwrite_id，则更新该数据集而非创建新数据集。
+        提供 changed_columns（被修改或新增的列）时，其余列的画像直接沿用来源数据集，不再重新扫描。
+        记录了 action_type 的步骤按 (父数据内容, 步骤, 参数) 做内容寻址：已有相同结果时直接引用其文件。
         """
         if overwrite_id:
             # 覆盖现有数据集
@@ -153,21 +154,36 @@ class PreprocessingService:
             if not target_dataset:
                 raise ValueError("未找到覆盖目标")
             
-            # 使用现有的文件路径
-            new_filepath = target_dataset.filepath
             new_dataset = target_dataset
+            content_hash = StorageService.derived_hash(target_dataset.content_hash, action_type, log)
             
-            # 保存数据 (覆盖)
-            DataService.save_dataframe(new_df, new_filepath)
+            if StorageService.is_shared(target_dataset):
+                # 写时复制：文件仍被其他数据集引用，改写到新文件，其他数据集不受影响
+                new_filepath = StorageService.unique_path(target_dataset.filepath)
+                reuse_from = target_dataset.filepath
+                DataService.save_dataframe(new_df, new_filepath)
+                target_dataset.filepath = new_filepath
+            else:
+                # 保存数据 (覆盖)。以增量形式依赖该文件的派生数据集需先物化，否则会读到被改写的父数据
+                new_filepath = target_dataset.filepath
+                reuse_from = new_filepath
+                PreprocessingService.compact_dependents(target_dataset)
+                DataService.save_dataframe(new_df, new_filepath)
+            new_dataset.content_hash = content_hash
             
-            # 更新元数据
+            # 更新元数据（覆盖前的画像仍在旁路文件中，可按列复用）
             try:
-                meta = DataService.get_initial_metadata(new_filepath)
+                meta = DataService.get_initial_metadata(
+                    new_filepath,
+                    reuse_from=reuse_from if changed_columns is not None else None,
+                    changed_columns=changed_columns
+                )
                 new_dataset.meta_data = meta
             except Exception as e:
                 pass
             
             db.session.commit()
+            EdaProfileService.schedule(new_filepath)
             return new_dataset
             
         else:
@@ -176,18 +192,23 @@ class PreprocessingService:
             if not original:
                 raise ValueError("未找到原始数据集")
     
-            # 创建新文件名
+            # 创建新文件名（显示名沿用原数据集名称，物理文件名保证唯一，避免改写其他数据集的文件）
             dir_name = os.path.dirname(original.filepath)
-            base_name = os.path.basename(original.filepath)
-            name_part, ext = os.path.splitext(base_name)
+            name_part, ext = os.path.splitext(os.path.basename(original.filepath))
+            display_part = os.path.splitext(original.name)[0] if original.name else name_part
             
             # 如果原始文件已经是结果文件，也许需要剥离现有后缀？
             # 目前先保持累积后缀逻辑简单。
-            new_filename = f"{name_part}_{suffix}{ext}"
-            new_filepath = os.path.join(dir_name, new_filename)
+            new_filename = f"{display_part}_{suffix}{ext}"
+            content_hash = StorageService.derived_hash(original.content_hash, action_type, log)
+            existing = StorageService.find_reusable(content_hash)
             
-            # 保存数据 (DuckDB 或 CSV)
-            DataService.save_dataframe(new_df, new_filepath)
+            if existing is not None:
+                new_filepath = existing.filepath
+            else:
+                new_filepath = StorageService.unique_path(os.path.join(dir_name, f"{name_part}_{suffix}{ext}"))
+                # 保存数据：DuckDB 父数据集上只写入变化的列/行（增量），否则写完整文件
+                DataService.save_derived(new_df, new_filepath, original.filepath)
             
             # 创建数据库条目
             new_dataset = Dataset(
@@ -196,20 +217,38 @@ class PreprocessingService:
                 filepath=new_filepath,
                 parent_id=parent_id if parent_id else original.id,
                 action_type=action_type,
-                action_log=json.dumps(log) if log else None
+                action_log=json.dumps(log) if log else None,
+                content_hash=content_hash
             )
             # 生成元数据
-            try:
-                meta = DataService.get_initial_metadata(new_filepath)
-                new_dataset.meta_data = meta
-            except Exception as e:
-                pass 
+            if existing is not None:
+                new_dataset.meta_data = existing.meta_data
+            else:
+                try:
+                    meta = DataService.get_initial_metadata(
+                        new_filepath,
+                        reuse_from=original.filepath if changed_columns is not None else None,
+                        changed_columns=changed_columns
+                    )
+                    new_dataset.meta_data = meta
+                except Exception as e:
+                    pass 
                 
             db.session.add(new_dataset)
             db.session.commit()
+            EdaProfileService.schedule(new_filepath)
             
             return new_dataset
 
+    @staticmethod
+    def compact_dependents(dataset):
+        """
+        将以增量形式依赖该数据集文件的派生数据集物化为独立文件。
+        文件可能被其他项目复用，因此检查全部数据集而非仅本项目。
+        """
+        paths = [fp for (fp,) in db.session.query(Dataset.filepath).distinct().all()]
+        StorageService.compact_dependents(dataset.filepath, paths)
+
     @staticmethod
     def derive_variable(df, type, params):
         """
@@ -223,7 +262,7 @@ class PreprocessingService:
         Returns:
             pd.DataFrame: 除带新变量的数据集
         """
-        df = df.copy()
+        df = df.copy(deep=False)
         
         try:
             if type == 'egfr_ckdepi2009':
@@ -357,7 +396,7 @@ class PreprocessingService:
         Returns:
             pd.DataFrame: With new columns CKD_G_Stage, CKD_A_Stage, CKD_Risk_Level
         """
-        df = df.copy()
+        df = df.copy(deep=False)
         
         egfr_col = params.get('egfr')
         acr_col = params.get('acr') # ACR (mg/g) 或 PCR
@@ -439,7 +478,7 @@ class PreprocessingService:
         Returns:
             pd.DataFrame: Long format [id_col, 'Time', value_name]
         """
-        df = df.copy()
+        df = df.copy(deep=False)
         melted_rows = []
         
         for _, row in df.iterrows():
@@ -498,13 +537,9 @@ class PreprocessingService:
 
     @staticmethod
     def _read_robust(filepath):
-        # 稍微重复了 DataService 的逻辑，但为了安全导入保持独立
-        # 或更好：如果可能，使用 DataService，但避免循环导入更重要。
-        # 目前暂时复制稳健读取逻辑 (KISS)
-        encodings = ['utf-8', 'gb18030', 'latin1']
-        for enc in encodings:
-            try:
-                return pd.read_csv(filepath, encoding=enc, low_memory=False)
-            except:
-                continue
-        return None
+        # 编码按字节采样检测一次（见 DataService.detect_encoding），不再逐个编码重复解析
+        try:
+            return pd.read_csv(filepath, encoding=DataService.detect_encoding(filepath),
+                               encoding_errors='replace', low_memory=False)
+        except Exception:
+            return None
@@ -0,0 +1,457 @@
+"""
+app.services.profile_service.py
+
+数据集画像 (Profile) 服务。
+以批量聚合的方式一次扫描即可得到所有列的计数、缺失、基数、最值、分位数与高频取值，
+替代 SUMMARIZE + 逐列 SELECT DISTINCT 的做法（800 列宽表上后者是上传耗时的主因）。
+画像结果以 <file>.profile.json 的形式保存在数据文件旁，并以文件版本 (mtime, size) 校验是否过期。
+"""
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from app.config import Config
+from app.utils.frame_cache import FrameCache
+from app.utils.connection_pool import connection_pool
+
+PROFILE_FORMAT = 1
+TOP_K = 50
+# 追加行时用于合并分位数的 CDF 草图：0%, 1%, ..., 100% 分位点
+SKETCH_LEVELS = [i / 100 for i in range(101)]
+_HASH_SPACE = 2 ** 64
+
+_NUMERIC_TYPES = {
+    'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT',
+    'UTINYINT', 'USMALLINT', 'UINTEGER', 'UBIGINT', 'FLOAT', 'DOUBLE'
+}
+
+
+def _is_numeric(dtype):
+    return dtype in _NUMERIC_TYPES or dtype.startswith('DECIMAL')
+
+
+def _is_scalar(dtype):
+    # LIST / STRUCT / MAP / BLOB 等嵌套或二进制类型不参与 min/max 与频数统计
+    return not any(x in dtype for x in ('[]', 'STRUCT', 'MAP', 'UNION', 'BLOB', 'BIT'))
+
+
+def _complete(col):
+    """频数表是否覆盖了该列的全部取值（全空列视为完整的空表）。"""
+    if col is None or not col['non_null']:
+        return True
+    top = col.get('top_values')
+    return top is not None and col.get('distinct_exact', True) and len(top) == col['distinct']
+
+
+def _theta_estimate(sketch):
+    """KMV 草图的基数估计：保留的是小于 theta 的全部哈希值。"""
+    if sketch['theta'] >= _HASH_SPACE:
+        return len(sketch['hashes'])
+    return int(round(len(sketch['hashes']) * _HASH_SPACE / sketch['theta']))
+
+
+def _merge_theta(a, b, k):
+    theta = min(a['theta'], b['theta'])
+    hashes = sorted({h for h in a['hashes'] + b['hashes'] if h < theta})
+    if len(hashes) > k:
+        theta, hashes = hashes[k], hashes[:k]
+    return {'theta': theta, 'hashes': hashes}
+
+
+def _merge_cdf(a, n_a, b, n_b):
+    """两段数据分位点草图的混合：按行数加权合并经验分布函数后重新取分位点。"""
+    levels = np.asarray(SKETCH_LEVELS)
+    xs = np.union1d(a, b)
+    cdf = (n_a * np.interp(xs, a, levels, left=0.0, right=1.0) +
+           n_b * np.interp(xs, b, levels, left=0.0, right=1.0)) / (n_a + n_b)
+    return np.interp(levels, cdf, xs).tolist()
+
+
+def _json_value(value):
+    """日期、Decimal 等非 JSON 原生类型统一转为字符串或 float。"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'item'):
+        return value.item()
+    try:
+        return float(value) if value.__class__.__name__ == 'Decimal' else str(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class ProfileService:
+    @staticmethod
+    def sidecar_path(filepath):
+        return filepath + '.profile.json'
+
+    @staticmethod
+    def load(filepath, any_version=False):
+        """
+        读取已保存的画像。
+
+        Args:
+            filepath (str): 数据文件路径。
+            any_version (bool): 为 True 时即使文件已被改写也返回旧画像（用于按列复用）。
+
+        Returns:
+            dict | None: 画像；不存在、格式不符或已过期时返回 None。
+        """
+        try:
+            with open(ProfileService.sidecar_path(filepath), 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if profile.get('format') != PROFILE_FORMAT:
+            return None
+        if not any_version:
+            version = FrameCache.file_version(filepath)
+            if version is None or profile.get('version') != list(version):
+                return None
+        return profile
+
+    @staticmethod
+    def _save(filepath, profile):
+        path = ProfileService.sidecar_path(filepath)
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            # 画像只是加速缓存，写入失败（只读目录等）不影响主流程
+            pass
+
+    @staticmethod
+    def remove(filepath):
+        try:
+            os.remove(ProfileService.sidecar_path(filepath))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _connect(filepath):
+        """返回 (连接, 数据源名)；非 DuckDB 文件通过内存视图访问。"""
+        if filepath.endswith('.duckdb'):
+            from app.services.data_service import DataService
+            return DataService.open_connection(filepath), 'data'
+        # 共享实例上的临时游标：视图/表必须建为 TEMP，只对本连接可见
+        con = connection_pool.cursor()
+        if filepath.endswith('.csv'):
+            from app.services.data_service import DataService
+            with DataService.utf8_csv(filepath) as source:
+                # 转码后的临时文件随上下文删除，此时需要物化
+                kind = 'VIEW' if source == filepath else 'TABLE'
+                con.sql(f"CREATE TEMP {kind} data AS SELECT * FROM {DataService.read_csv_sql(source)}")
+        elif filepath.endswith('.xlsx') or filepath.endswith('.xls'):
+            df = pd.read_excel(filepath)
+            con.register('data', df)
+        else:
+            con.close()
+            raise ValueError("Unsupported format")
+        return con, 'data'
+
+    @staticmethod
+    def profile(filepath, reuse_from=None, changed_columns=None):
+        """
+        生成（或读取已保存的）数据集画像。
+
+        Args:
+            filepath (str): 数据文件路径。
+            reuse_from (str, optional): 来源数据文件。若其画像存在、行数一致，
+                未在 changed_columns 中且类型未变的列直接沿用，不再扫描。
+            changed_columns (list, optional): 相对 reuse_from 被修改或新增的列。
+
+        Returns:
+            dict: {'row_count', 'columns': [...], 'preview': [...]}，
+                  每列包含 type/non_null/null_count/distinct/min/max/mean/std/quantiles/top_values。
+        """
+        persist = filepath.endswith('.duckdb')
+        if persist:
+            cached = ProfileService.load(filepath)
+            if cached is not None:
+                return cached
+        version = FrameCache.file_version(filepath)
+
+        con, source = ProfileService._connect(filepath)
+        try:
+            row_count = con.execute(f"SELECT COUNT(*) FROM {source}").fetchone()[0]
+            schema = [(r[0], str(r[1]).upper()) for r in con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+            preview = ProfileService._preview(con, source)
+
+            reused = {}
+            base = ProfileService.load(reuse_from, any_version=True) if reuse_from else None
+            if base and base.get('row_count') == row_count:
+                changed = set(changed_columns or [])
+                base_cols = {c['name']: c for c in base['columns']}
+                for name, dtype in schema:
+                    prev = base_cols.get(name)
+                    if name not in changed and prev is not None and prev['type'] == dtype:
+                        reused[name] = prev
+
+            pending = [(n, t) for n, t in schema if n not in reused]
+            scanned = ProfileService._scan(con, source, pending, row_count)
+        finally:
+            con.close()
+
+        profile = {
+            'format': PROFILE_FORMAT,
+            'version': list(version) if version else None,
+            'row_count': int(row_count),
+            'columns': [reused.get(name) or scanned[name] for name, _ in schema],
+            'preview': preview
+        }
+        if persist and version is not None:
+            ProfileService._save(filepath, profile)
+        return profile
+
+    @staticmethod
+    def _preview(con, source):
+        preview_df = con.execute(f"SELECT * FROM {source} LIMIT 5").df()
+        return preview_df.replace({np.nan: None}).to_dict(orient='records')
+
+    @staticmethod
+    def store(filepath, profile):
+        """
+        将增量更新得到的画像绑定到文件当前版本并保存。
+
+        Returns:
+            dict: 带新版本号的画像。
+        """
+        version = FrameCache.file_version(filepath)
+        profile = {**profile, 'version': list(version) if version else None}
+        if version is not None:
+            ProfileService._save(filepath, profile)
+        return profile
+
+    @staticmethod
+    def merge_append(con, base, batch_source, types, rescan=()):
+        """
+        追加行时增量合并画像（在 con 上的 data 仍为追加前数据时调用），无需重新扫描已有数据。
+
+        计数、缺失、最值、均值/标准差精确合并；两段都有完整频数表的列合并频数表（基数精确）。
+        其余列借助草图合并：数值列为 101 点分位数草图（合并后的四分位数为近似值），
+        高基数列为 KMV 哈希草图（保留最小的 PROFILE_SKETCH_SIZE 个哈希值）。
+        旧画像缺少所需草图时在已有数据上补算一次，之后随画像保存，后续追加直接复用。
+
+        Args:
+            con: 同时可访问 data（已有数据）与 batch_source（新批次）的连接。
+            base (dict): 追加前的画像。
+            batch_source (str): 新批次的表名。
+            types (dict): 追加后各列的类型 {列名: 类型}。
+            rescan (iterable): 类型被放宽、需在追加后重新扫描的列（见 finish_append）。
+
+        Returns:
+            dict: {列名: 合并后的列画像}，不含 rescan 中的列。
+        """
+        batch_rows = con.execute(f"SELECT COUNT(*) FROM {batch_source}").fetchone()[0]
+        batch_schema = [(r[0], str(r[1]).upper())
+                        for r in con.execute(f"DESCRIBE SELECT * FROM {batch_source}").fetchall()]
+        names = [n for n in types if n not in set(rescan)]
+        base_cols = {c['name']: c for c in base['columns']}
+        batch_cols = ProfileService._scan(con, batch_source, [(n, t) for n, t in batch_schema if n in names], batch_rows)
+
+        sides = []
+        for source, cols, rows in (('data', base_cols, base['row_count']), (batch_source, batch_cols, batch_rows)):
+            cdf, hashed = [], []
+            for name in names:
+                col = cols.get(name)
+                if col is None or not col['non_null']:
+                    continue
+                sketch = col.get('sketch') or {}
+                if _is_numeric(types[name]) and 'cdf' not in sketch:
+                    cdf.append(name)
+                if not (_complete(base_cols.get(name)) and _complete(batch_cols.get(name))) and 'hashes' not in sketch:
+                    hashed.append(name)
+            sides.append((cols, rows, ProfileService._sketch(con, source, cdf, hashed, types, rows)))
+
+        return {name: ProfileService._merge_column(name, types[name], sides) for name in names}
+
+    @staticmethod
+    def finish_append(con, merged, types, rescan=()):
+        """
+        追加完成后（con 上的 data 已包含新行）组装完整画像：补扫 rescan 中的列并刷新预览。
+        返回的画像尚未绑定文件版本，替换到位后用 store() 保存。
+        """
+        row_count = con.execute("SELECT COUNT(*) FROM data").fetchone()[0]
+        scanned = ProfileService._scan(con, 'data', [(n, types[n]) for n in rescan], row_count)
+        return {
+            'format': PROFILE_FORMAT,
+            'version': None,
+            'row_count': int(row_count),
+            'columns': [merged.get(name) or scanned[name] for name in types],
+            'preview': ProfileService._preview(con, 'data')
+        }
+
+    @staticmethod
+    def _sketch(con, source, cdf_columns, hash_columns, types, row_count):
+        """计算分位数草图（批量聚合）与 KMV 哈希草图（每列一次 Top-k 查询）。"""
+        from app.services.data_service import DataService
+
+        sketches = {}
+        fn = 'quantile_cont' if row_count <= Config.PROFILE_EXACT_DISTINCT_MAX_ROWS else 'approx_quantile'
+        batch_size = max(1, Config.PROFILE_BATCH_COLUMNS)
+        for start in range(0, len(cdf_columns), batch_size):
+            batch = cdf_columns[start:start + batch_size]
+            exprs = [f"{fn}({DataService.quote_ident(n)}::DOUBLE, {SKETCH_LEVELS})" for n in batch]
+            for name, values in zip(batch, con.execute(f"SELECT {', '.join(exprs)} FROM {source}").fetchone()):
+                sketches.setdefault(name, {})['cdf'] = [float(v) for v in values]
+
+        k = max(1, Config.PROFILE_SKETCH_SIZE)
+        for name in hash_columns:
+            q = DataService.quote_ident(name)
+            # 按合并后的列类型取哈希，两段数据的同一取值才会得到相同的哈希
+            hashes = con.execute(
+                f"SELECT list(h ORDER BY h) FROM (SELECT DISTINCT hash(CAST({q} AS {types[name]})) AS h "
+                f"FROM {source} WHERE {q} IS NOT NULL ORDER BY h LIMIT {k + 1})"
+            ).fetchone()[0] or []
+            if len(hashes) > k:
+                sketches.setdefault(name, {}).update(theta=int(hashes[k]), hashes=[int(h) for h in hashes[:k]])
+            else:
+                sketches.setdefault(name, {}).update(theta=_HASH_SPACE, hashes=[int(h) for h in hashes])
+        return sketches
+
+    @staticmethod
+    def _merge_column(name, dtype, sides):
+        parts = []
+        for cols, rows, sketches in sides:
+            col = cols.get(name)
+            if col is not None and col['non_null']:
+                sketch = {**(col.get('sketch') or {}), **sketches.get(name, {})}
+                parts.append((col, sketch))
+        row_count = sum(rows for _, rows, _ in sides)
+        non_null = sum(col['non_null'] for col, _ in parts)
+        merged = {
+            'name': name, 'type': dtype, 'non_null': int(non_null), 'null_count': int(row_count - non_null),
+            'distinct': 0, 'distinct_exact': True,
+            'min': None, 'max': None, 'mean': None, 'std': None,
+            'quantiles': None, 'top_values': [] if _is_scalar(dtype) else None
+        }
+        if not parts:
+            return merged
+        if len(parts) == 1:
+            col, sketch = parts[0]
+            merged.update({k: col[k] for k in ('distinct', 'distinct_exact', 'min', 'max', 'mean', 'std',
+                                                'quantiles', 'top_values')})
+            if sketch:
+                merged['sketch'] = sketch
+            return merged
+
+        (a, sa), (b, sb) = parts
+        n_a, n_b = a['non_null'], b['non_null']
+        numeric = _is_numeric(dtype)
+        key = float if numeric else str
+        for field, pick in (('min', min), ('max', max)):
+            values = [c[field] for c in (a, b) if c[field] is not None]
+            merged[field] = pick(values, key=key) if values else None
+
+        sketch = {}
+        if numeric and a['mean'] is not None and b['mean'] is not None:
+            n = n_a + n_b
+            mean = (n_a * a['mean'] + n_b * b['mean']) / n
+            # 方差的并行合并公式（Chan et al.）
+            ss = sum((c['std'] or 0.0) ** 2 * (c['non_null'] - 1) for c in (a, b))
+            ss += n_a * n_b / n * (a['mean'] - b['mean']) ** 2
+            merged['mean'] = mean
+            merged['std'] = math.sqrt(ss / (n - 1)) if n > 1 else None
+            if 'cdf' in sa and 'cdf' in sb:
+                sketch['cdf'] = _merge_cdf(sa['cdf'], n_a, sb['cdf'], n_b)
+                merged['quantiles'] = {'q25': sketch['cdf'][25], 'q50': sketch['cdf'][50], 'q75': sketch['cdf'][75]}
+
+        if _complete(a) and _complete(b):
+            counts = {}
+            for col in (a, b):
+                for value, count in col['top_values']:
+                    k = json.dumps(value)
+                    counts[k] = (value, counts.get(k, (value, 0))[1] + count)
+            pairs = sorted(counts.values(), key=lambda kv: kv[1], reverse=True)
+            merged['distinct'] = len(pairs)
+            merged['top_values'] = [[v, int(c)] for v, c in pairs] if len(pairs) <= TOP_K else None
+        elif 'hashes' in sa and 'hashes' in sb:
+            theta = _merge_theta(sa, sb, max(1, Config.PROFILE_SKETCH_SIZE))
+            sketch.update(theta)
+            merged['distinct'] = _theta_estimate(theta)
+            merged['distinct_exact'] = theta['theta'] >= _HASH_SPACE
+            merged['top_values'] = None
+        else:
+            merged['distinct'] = None
+            merged['distinct_exact'] = False
+            merged['top_values'] = None
+        if sketch:
+            merged['sketch'] = sketch
+        return merged
+
+    @staticmethod
+    def _scan(con, source, columns, row_count):
+        """
+        对给定列做批量聚合。第一轮扫描得到计数/基数/最值/分位数；
+        第二轮只对低基数列用 histogram() 统计频数（两轮扫描的次数与列数无关）。
+        """
+        from app.services.data_service import DataService
+
+        exact = row_count <= Config.PROFILE_EXACT_DISTINCT_MAX_ROWS
+        quantile_fn = 'quantile_cont' if exact else 'approx_quantile'
+        batch_size = max(1, Config.PROFILE_BATCH_COLUMNS)
+        results = {}
+
+        for start in range(0, len(columns), batch_size):
+            batch = columns[start:start + batch_size]
+            exprs, slots = [], []
+            for name, dtype in batch:
+                q = DataService.quote_ident(name)
+                fields = [('non_null', f"count({q})")]
+                if _is_scalar(dtype):
+                    distinct = f"count(DISTINCT {q})" if exact else f"approx_count_distinct({q})"
+                    fields.append(('distinct', distinct))
+                if _is_numeric(dtype):
+                    x = f"{q}::DOUBLE"
+                    fields += [
+                        ('min', f"min({x})"), ('max', f"max({x})"),
+                        ('mean', f"avg({x})"), ('std', DataService.stddev_sql(x)),
+                        ('quantiles', f"{quantile_fn}({x}, [0.25, 0.5, 0.75])")
+                    ]
+                elif _is_scalar(dtype):
+                    fields += [('min', f"min({q})::VARCHAR"), ('max', f"max({q})::VARCHAR")]
+                for key, expr in fields:
+                    exprs.append(expr)
+                    slots.append((name, key))
+            values = con.execute(f"SELECT {', '.join(exprs)} FROM {source}").fetchone()
+
+            for name, dtype in batch:
+                results[name] = {
+                    'name': name, 'type': dtype, 'non_null': 0, 'null_count': 0,
+                    'distinct': None, 'distinct_exact': exact,
+                    'min': None, 'max': None, 'mean': None, 'std': None,
+                    'quantiles': None, 'top_values': None
+                }
+            for (name, key), value in zip(slots, values):
+                if key == 'quantiles' and value is not None:
+                    value = dict(zip(['q25', 'q50', 'q75'], [_json_value(v) for v in value]))
+                else:
+                    value = _json_value(value)
+                results[name][key] = value
+            for name, _ in batch:
+                col = results[name]
+                col['non_null'] = int(col['non_null'] or 0)
+                col['null_count'] = int(row_count) - col['non_null']
+
+        # 第二轮：低基数列的频数表。HLL 估计有约 2% 误差，阈值放宽以免漏掉边界列；
+        # histogram 结果是精确的，顺便把这些列的基数校正为精确值。
+        limit = TOP_K if exact else int(TOP_K * 1.2)
+        low_card = [(n, t) for n, t in columns
+                    if _is_scalar(t) and results[n]['distinct'] is not None and results[n]['distinct'] <= limit]
+        for start in range(0, len(low_card), batch_size):
+            batch = low_card[start:start + batch_size]
+            exprs = [f"histogram({DataService.quote_ident(n)})" for n, _ in batch]
+            values = con.execute(f"SELECT {', '.join(exprs)} FROM {source}").fetchone()
+            for (name, _), hist in zip(batch, values):
+                pairs = list(zip(hist['key'], hist['value'])) if hist else []
+                pairs.sort(key=lambda kv: kv[1], reverse=True)
+                col = results[name]
+                col['distinct'] = len(pairs)
+                col['distinct_exact'] = True
+                col['top_values'] = [[_json_value(k), int(v)] for k, v in pairs[:TOP_K]]
+
+        return results
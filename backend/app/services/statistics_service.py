@@ -767,6 +767,46 @@ class StatisticsService:
                 }
             }
 
+    @staticmethod
+    def format_distribution(dist):
+        """
+        将 DistributionService 在 DuckDB 中聚合得到的分布转换为 get_distribution 的输出格式（叠加正态曲线）。
+        分类变量只包含 Top N 类别，其余类别的合计见 stats['other']。
+        """
+        if dist is None:
+            return None
+        from app.services.data_service import DataService
+        summary = dist['stats']
+        if dist['type'] == 'numerical':
+            mu, std = summary['mean'], summary['std']
+            x_range = np.linspace(summary['min'], summary['max'], 100)
+            y_norm = stats.norm.pdf(x_range, mu, std) if std and std > 0 else []
+            return DataService.sanitize_for_json({
+                'type': 'numeric',
+                'bins': {
+                    'counts': dist['y'],
+                    'edges': dist['edges']
+                },
+                'curve': {
+                    'x': x_range.tolist(),
+                    'y': list(y_norm)
+                },
+                'stats': {
+                    'mean': mu,
+                    'std': std,
+                    'n': summary['n']
+                }
+            })
+        return {
+            'type': 'categorical',
+            'counts': dict(zip(dist['x'], dist['y'])),
+            'stats': {
+                'n': summary['n'],
+                'unique': summary['unique'],
+                'other': dist['other']
+            }
+        }
+
     @staticmethod
     def _calc_smd(df1, df2, var):
         # 处理数值型
@@ -784,10 +824,11 @@ class StatisticsService:
              return 0.0
 
     @staticmethod
-    def check_multicollinearity(df, features):
+    def check_multicollinearity(df, features, source=None):
         """
         检查特征变量之间的多重共线性。
-        计算两两相关系数 (Correlation) 和方差膨胀因子 (VIF)。
+        计算两两相关系数 (Correlation，逐对完整样本) 和方差膨胀因子 (VIF)。
+        提供数据文件路径 source 时，相关系数取自 CorrelationService 的数据集缓存（与 EDA 热力图共用）。
         """
         if not features or len(features) < 2:
             return {'status': 'ok', 'report': []}
@@ -798,7 +839,13 @@ class StatisticsService:
         if numeric_df.empty or numeric_df.shape[1] < 2:
              return {'status': 'ok', 'report': []}
  
-        # 为了计算，需要处理缺失值
+        from app.services.correlation_service import CorrelationService
+        if source is not None:
+            corr = CorrelationService.dataset_matrix(source, columns=list(numeric_df.columns))
+        else:
+            corr = CorrelationService.matrix(numeric_df)
+
+        # VIF 需要处理缺失值
         numeric_df = numeric_df.dropna()
         if numeric_df.empty:
              return {'status': 'warning', 'message': '有效样本量不足，无法计算共线性。'}
@@ -806,22 +853,15 @@ class StatisticsService:
         report = []
         status = 'ok'
         
-        # 1. 两两相关性
-        corr_matrix = numeric_df.corr().abs()
-        
-        # 上三角矩阵
-        cols = corr_matrix.columns
-        for i in range(len(cols)):
-            for j in range(i+1, len(cols)):
-                r = corr_matrix.iloc[i, j]
-                if r > 0.8: # Threshold 0.8
-                    status = 'warning'
-                    report.append({
-                        'type': 'correlation',
-                        'vars': [cols[i], cols[j]],
-                        'value': float(r),
-                        'message': f"'{cols[i]}' 与 '{cols[j]}' 高度相关 (r={r:.2f})"
-                    })
+        # 1. 两两相关性 (上三角, Threshold 0.8)
+        for x, y, r in CorrelationService.pairs_above(corr, 0.8):
+            status = 'warning'
+            report.append({
+                'type': 'correlation',
+                'vars': [x, y],
+                'value': abs(r),
+                'message': f"'{x}' 与 '{y}' 高度相关 (r={abs(r):.2f})"
+            })
 
         # 2. VIF (方差膨胀因子)
         # 仅在不存在完全线性依赖的情况下计算
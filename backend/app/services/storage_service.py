@@ -0,0 +1,168 @@
+"""
+app.services.storage_service.py
+
+内容寻址存储服务。
+相同的上传文件、在同一父数据上重复执行的相同处理步骤共享同一个物理文件：
+- 上传：对原始字节流做 sha256；
+- 派生：对 (父数据内容哈希, action_type, action_log) 做 sha256。
+物理文件按引用计数回收：只有最后一个指向它的 Dataset 被删除时才删除文件。
+"""
+import hashlib
+import json
+import os
+
+from app.services.data_service import DataService
+
+# 导入/存储格式变化时递增，使旧哈希不再命中
+STORAGE_FORMAT = 'v1'
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+class StorageService:
+    @staticmethod
+    def save_upload(stream, path):
+        """
+        流式写入上传文件并同时计算 sha256，避免为了求哈希再完整读一遍大文件。
+
+        Returns:
+            str: 原始字节的 sha256 十六进制摘要。
+        """
+        digest = hashlib.sha256()
+        with open(path, 'wb') as f:
+            while True:
+                chunk = stream.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def upload_hash(digest, ext):
+        """上传数据集的内容哈希（扩展名参与计算：同样的字节按 CSV/Excel 解析结果不同）。"""
+        payload = f"upload|{STORAGE_FORMAT}|{ext.lower()}|{digest}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def derived_hash(parent_hash, action_type, log):
+        """
+        派生数据集的内容哈希。父数据没有内容哈希（历史数据）或步骤未记录 action_type 时返回 None，不参与复用。
+        """
+        if not parent_hash or not action_type:
+            return None
+        payload = json.dumps(
+            {'format': STORAGE_FORMAT, 'parent': parent_hash, 'action': action_type, 'log': log},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def find_reusable(content_hash):
+        """
+        查找内容相同且文件仍存在的就绪数据集。
+
+        Returns:
+            Dataset | None
+        """
+        from app.models.dataset import Dataset
+
+        if not content_hash:
+            return None
+        for dataset in Dataset.query.filter_by(content_hash=content_hash, status='ready').all():
+            if dataset.filepath and os.path.exists(dataset.filepath):
+                return dataset
+        return None
+
+    @staticmethod
+    def object_path(folder, content_hash, ext='.duckdb'):
+        return os.path.join(folder, f"ds_{content_hash[:32]}{ext}")
+
+    @staticmethod
+    def unique_path(path):
+        """路径已被占用时追加 _1, _2 ... 后缀。"""
+        if not os.path.exists(path):
+            return path
+        stem, ext = os.path.splitext(path)
+        n = 1
+        while os.path.exists(f"{stem}_{n}{ext}"):
+            n += 1
+        return f"{stem}_{n}{ext}"
+
+    @staticmethod
+    def is_shared(dataset):
+        """是否还有其他 Dataset 指向同一物理文件（覆盖写前需要写时复制）。"""
+        from app.models.dataset import Dataset
+
+        return Dataset.query.filter(
+            Dataset.filepath == dataset.filepath, Dataset.id != dataset.id
+        ).count() > 0
+
+    @staticmethod
+    def compact_dependents(filepath, candidates):
+        """
+        将 candidates 中以增量形式（直接或间接）依赖 filepath 的文件物化为独立文件（后代先于祖先）。
+        在 filepath 被原地改写或删除之前调用。
+        """
+        if not filepath or not filepath.endswith('.duckdb') or not os.path.exists(filepath):
+            return
+        target = os.path.abspath(filepath)
+        dependents = []
+        # 按传入顺序去重（不用 set：遍历顺序随哈希种子变化）；物化顺序由 compact_all 按链深度决定
+        for other in dict.fromkeys(candidates):
+            if not other or not other.endswith('.duckdb') or not os.path.exists(other):
+                continue
+            if os.path.abspath(other) == target:
+                continue
+            try:
+                chain = [os.path.abspath(p) for p in DataService.lineage_chain(other)[1:]]
+            except ValueError:
+                # 父链已损坏的文件无法物化，留给加载时的自愈逻辑处理
+                continue
+            if target in chain:
+                dependents.append(other)
+        DataService.compact_all(dependents)
+
+    @staticmethod
+    def release(connection, table, filepath):
+        """
+        Dataset 删除后的存储回收（在 after_delete 事件中调用）。
+
+        仍有其他记录引用该文件时不做任何事；否则先把以增量形式依赖它的文件物化，
+        再删除数据文件、画像旁路文件以及导入时保留的原始文件。
+        """
+        from sqlalchemy import select, func
+        from app.services.eda_profile_service import EdaProfileService
+        from app.services.profile_service import ProfileService
+        from app.utils.frame_cache import frame_cache
+        from app.utils.connection_pool import connection_pool
+        from app.utils.file_lock import dataset_lock, remove_lock_file
+
+        refs = connection.execute(
+            select(func.count()).select_from(table).where(table.c.filepath == filepath)
+        ).scalar()
+        if refs:
+            return False
+
+        frame_cache.invalidate(filepath)
+        connection_pool.invalidate(filepath)
+        others = connection.execute(select(table.c.filepath).distinct()).scalars().all()
+        StorageService.compact_dependents(filepath, others)
+
+        ProfileService.remove(filepath)
+        EdaProfileService.remove(filepath)
+        paths = [filepath]
+        if os.path.basename(filepath).startswith('ds_'):
+            # 内容寻址的上传会在数据文件旁保留同名原始文件（用于自愈重建）
+            stem = os.path.splitext(filepath)[0]
+            paths += [stem + ext for ext in ('.csv', '.xlsx', '.xls')]
+        with dataset_lock(filepath, exclusive=True):
+            for path in paths:
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        # Log warning in production, for now pass
+                        pass
+            remove_lock_file(filepath)
+        return True
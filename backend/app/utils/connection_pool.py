@@ -0,0 +1,282 @@
+"""
+app.utils.connection_pool.py
+
+工具模块：进程级 DuckDB 只读连接池。
+小查询（列名、预览、计数）的耗时主要花在打开文件与加载 catalog 上。本模块维护一个共享的
+内存 DuckDB 实例（memory_limit / threads 取自配置），数据文件以只读方式 ATTACH 到该实例，
+每个文件（或增量链）保留有限个已初始化的游标供复用，空闲超时后关闭并 DETACH。
+
+文件被重写后（os.replace / 删除重建）签名 (mtime_ns, size) 变化：旧版本的挂载不再分配新连接，
+已借出的连接归还时关闭，全部归还后 DETACH 并挂载新版本；过渡期间的请求使用一次性独立连接。
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import duckdb
+
+from app.config import Config
+
+
+class _Attachment:
+    """一个数据文件某个版本在共享实例中的挂载。"""
+
+    def __init__(self, path, version, alias):
+        self.path = path
+        self.version = version
+        self.alias = alias
+        self.refs = 0          # 依赖该挂载的存活游标数（借出 + 空闲）
+        self.stale = False     # 文件已被重写或删除，不再分配新连接
+        self.last_used = time.monotonic()
+
+
+class PooledConnection:
+    """
+    借出的连接。用法与 DuckDBPyConnection 相同，close() 将其归还连接池。
+    """
+
+    def __init__(self, pool, key, cursor, attachments):
+        self._pool = pool
+        self._key = key
+        self._cursor = cursor
+        self._attachments = attachments
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._pool._release(self._key, self._cursor, self._attachments)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    按数据文件分组的只读连接池（线程安全）。
+
+    DuckDB 的单个连接不能被多个线程同时使用，因此连接以独占方式借出；
+    共享实例本身支持多个连接并发查询。
+    """
+
+    SWEEP_INTERVAL = 30
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._db = None
+        self._attachments = {}   # abspath -> 当前 _Attachment
+        self._idle = {}          # key -> deque[(cursor, attachments, idle_since)]
+        self._seq = 0
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def _version(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _instance(self):
+        if self._db is None:
+            config = {'memory_limit': Config.DUCKDB_MEMORY_LIMIT}
+            if Config.DUCKDB_THREADS:
+                config['threads'] = Config.DUCKDB_THREADS
+            self._db = duckdb.connect(':memory:', config=config)
+        return self._db
+
+    def cursor(self):
+        """
+        返回共享实例上的一个新游标（不入池，调用方负责 close()），用于 CSV/Excel 等临时数据源。
+        """
+        with self._lock:
+            return self._instance().cursor()
+
+    def acquire(self, paths, setup=None):
+        """
+        借出一个可直接查询 `data` 的连接。
+
+        Args:
+            paths (list): 数据文件路径。单个物理文件时连接默认库切换到该文件；
+                多个文件（增量链）时按顺序挂载，由 setup 创建视图。
+            setup (callable, optional): setup(cursor, aliases)，新建连接时调用一次，
+                aliases 与 paths 一一对应。
+
+        Returns:
+            PooledConnection | None: 文件版本正在切换且旧版本仍被占用时返回 None，
+            调用方应改用独立连接。
+        """
+        key = tuple((os.path.abspath(p), self._version(p)) for p in paths)
+        with self._lock:
+            self._sweep()
+            idle = self._idle.get(key)
+            while idle:
+                cursor, attachments, _ = idle.pop()
+                if all(not a.stale for a in attachments):
+                    self.hits += 1
+                    for a in attachments:
+                        a.last_used = time.monotonic()
+                    return PooledConnection(self, key, cursor, attachments)
+                self._close_cursor(cursor, attachments)
+
+            attachments = []
+            for path, version in key:
+                attachment = self._attach(path, version)
+                if attachment is None:
+                    self.fallbacks += 1
+                    return None
+                attachments.append(attachment)
+            for a in attachments:
+                a.refs += 1
+            self.misses += 1
+            cursor = self._instance().cursor()
+
+        try:
+            if setup is None:
+                cursor.execute(f"USE {attachments[0].alias}")
+            else:
+                setup(cursor, [a.alias for a in attachments])
+        except Exception:
+            with self._lock:
+                self._close_cursor(cursor, attachments)
+            raise
+        return PooledConnection(self, key, cursor, attachments)
+
+    def invalidate(self, filepath):
+        """
+        文件即将被重写或已删除：关闭该文件的空闲连接，并在无人使用时立即 DETACH（释放文件句柄）。
+        """
+        path = os.path.abspath(filepath)
+        with self._lock:
+            attachment = self._attachments.get(path)
+            if attachment is None:
+                return
+            attachment.stale = True
+            self._close_idle(lambda attachments: attachment in attachments)
+            self._detach_unused()
+
+    def clear(self):
+        """关闭所有空闲连接并卸载未被占用的文件。"""
+        with self._lock:
+            for a in self._attachments.values():
+                a.stale = True
+            self._close_idle(lambda attachments: True)
+            self._detach_unused()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'fallbacks': self.fallbacks,
+                'attached_files': len(self._attachments),
+                'idle_connections': sum(len(q) for q in self._idle.values())
+            }
+
+    # --- 以下方法均在持有 self._lock 时调用 ---
+
+    def _attach(self, path, version):
+        attachment = self._attachments.get(path)
+        if attachment is not None and (attachment.version != version or attachment.stale):
+            # 文件已被重写：同一路径不能重复 ATTACH，需等旧版本的连接全部归还
+            attachment.stale = True
+            self._close_idle(lambda attachments: attachment in attachments)
+            if attachment.refs:
+                return None
+            self._detach(attachment)
+            attachment = None
+        if attachment is None:
+            if version is None:
+                raise FileNotFoundError(f"文件未找到: {path}")
+            if len(self._attachments) >= Config.DUCKDB_POOL_MAX_FILES:
+                self._evict()
+            self._seq += 1
+            attachment = _Attachment(path, version, f"pool_{self._seq}")
+            escaped = path.replace("'", "''")
+            self._instance().execute(f"ATTACH '{escaped}' AS {attachment.alias} (READ_ONLY)")
+            self._attachments[path] = attachment
+        attachment.last_used = time.monotonic()
+        return attachment
+
+    def _release(self, key, cursor, attachments):
+        with self._lock:
+            current = all(not a.stale and self._version(a.path) == a.version for a in attachments)
+            idle = self._idle.setdefault(key, deque())
+            if current and len(idle) < Config.DUCKDB_POOL_SIZE:
+                idle.append((cursor, attachments, time.monotonic()))
+            else:
+                if not current:
+                    for a in attachments:
+                        if self._version(a.path) != a.version:
+                            a.stale = True
+                self._close_cursor(cursor, attachments)
+                if not idle:
+                    del self._idle[key]
+            self._detach_unused()
+
+    def _close_cursor(self, cursor, attachments):
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        for a in attachments:
+            a.refs -= 1
+
+    def _close_idle(self, predicate, older_than=None):
+        for key in list(self._idle):
+            kept = deque()
+            for cursor, attachments, since in self._idle[key]:
+                if predicate(attachments) and (older_than is None or since < older_than):
+                    self._close_cursor(cursor, attachments)
+                else:
+                    kept.append((cursor, attachments, since))
+            if kept:
+                self._idle[key] = kept
+            else:
+                del self._idle[key]
+
+    def _detach(self, attachment):
+        try:
+            self._instance().execute(f"DETACH {attachment.alias}")
+        except Exception:
+            pass
+        if self._attachments.get(attachment.path) is attachment:
+            del self._attachments[attachment.path]
+
+    def _detach_unused(self, older_than=None):
+        for attachment in list(self._attachments.values()):
+            if attachment.refs:
+                continue
+            if attachment.stale or (older_than is not None and attachment.last_used < older_than):
+                self._detach(attachment)
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep < self.SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        cutoff = now - Config.DUCKDB_POOL_IDLE_SECONDS
+        self._close_idle(lambda attachments: True, older_than=cutoff)
+        self._detach_unused(older_than=cutoff)
+
+    def _evict(self):
+        # 挂载文件数达到上限：按最近使用时间关闭空闲连接并卸载，直到低于上限（占用中的无法卸载）
+        for attachment in sorted(self._attachments.values(), key=lambda a: a.last_used):
+            if len(self._attachments) < Config.DUCKDB_POOL_MAX_FILES:
+                return
+            self._close_idle(lambda attachments: attachment in attachments)
+            if not attachment.refs:
+                self._detach(attachment)
+
+
+connection_pool = ConnectionPool()
@@ -30,7 +30,7 @@ class ModelDiagnostics:
             return []
             
         try:
-            X = df[features].copy()
+            X = df[features]
             # 是否需要处理未编码的分类变量？
             # ModelingService 通常接收原始 DataFrame，而策略类 (Strategies) 处理编码。
             # 本项目中的特定策略（线性/逻辑回归）通常假设输入已完成数值化或独热编码。
@@ -44,14 +44,23 @@ class ModelDiagnostics:
             
             # 为计算 VIF 删除包含缺失值的行
             X = X.dropna()
+
+            fast = ModelDiagnostics._vif_from_correlation(X)
+            if fast is not None:
+                return [
+                    {'variable': col, 'vif': ResultFormatter.format_float(val, 2)}
+                    for col, val in zip(X.columns, fast)
+                ]
+
             X = add_constant(X)
+            values = X.values
             
             vif_data = []
             for i, col in enumerate(X.columns):
                 if col == 'const': continue
                 # 处理 VIF 计算中的奇异矩阵或错误
                 try:
-                    val = variance_inflation_factor(X.values, i)
+                    val = variance_inflation_factor(values, i)
                     vif_data.append({
                         'variable': col,
                         'vif': ResultFormatter.format_float(val, 2) if not np.isinf(val) else 'Inf'
@@ -63,3 +72,26 @@ class ModelDiagnostics:
         except Exception as e:
             print(f"VIF 计算失败: {e}")
             return []
+
+    @staticmethod
+    def _vif_from_correlation(X):
+        """
+        由相关矩阵求 VIF：VIF_i = (R^-1)_ii，等价于逐列做 x_i ~ 其余变量 + 常数项 的回归。
+        只复制一次特征矩阵（用于中心化），不再为每个变量各复制一份 n×(k-1) 的设计矩阵并做 SVD。
+
+        Returns:
+            np.ndarray | None: 各列的 VIF；存在非数值列、常数列或矩阵接近奇异时返回 None，
+            由调用方回退到逐列回归（保持原有的 Inf / Error 输出）。
+        """
+        if len(X) < 2 or not all(pd.api.types.is_numeric_dtype(t) for t in X.dtypes):
+            return None
+        Z = X.to_numpy(dtype='float64', copy=True)
+        Z -= Z.mean(axis=0)
+        scale = np.sqrt(np.einsum('ij,ij->j', Z, Z))
+        if not np.all(scale > 0):
+            return None
+        Z /= scale
+        R = Z.T @ Z
+        if not np.isfinite(R).all() or np.linalg.cond(R) > 1e10:
+            return None
+        return np.diag(np.linalg.inv(R))
@@ -0,0 +1,131 @@
+"""
+app.utils.file_lock.py
+
+工具模块：数据文件的读写锁（跨进程、跨线程）。
+多个 gunicorn worker 共享同一批 .duckdb 文件：写入方先写临时文件，持写锁 os.replace 到目标路径；
+读取方在解析增量链并打开文件期间持读锁，保证看到的是同一时刻的完整文件集合。
+文件一旦打开即固定在对应 inode 上，之后的查询不再需要持锁，读写双方都不会被长时间阻塞。
+
+基于 flock（每次加锁单独打开锁文件，同一进程内的不同线程之间同样互斥）；
+同一线程内可重入。无 fcntl 的平台（Windows）退化为进程内互斥锁。
+锁文件只在持写锁时删除；加锁后确认打开的仍是路径上的锁文件，否则重新打开，
+避免删除前打开旧锁文件的一方与新建锁文件的一方同时持锁。
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+from app.config import Config
+
+LOCK_DIR = '.locks'
+
+_local = threading.local()
+_fallback_locks = {}
+_fallback_guard = threading.Lock()
+
+
+def lock_path(filepath):
+    """锁文件路径：与数据文件同目录的 .locks/<文件名>.lock。"""
+    filepath = os.path.abspath(filepath)
+    return os.path.join(os.path.dirname(filepath), LOCK_DIR, os.path.basename(filepath) + '.lock')
+
+
+def _held():
+    held = getattr(_local, 'held', None)
+    if held is None:
+        held = _local.held = {}
+    return held
+
+
+@contextmanager
+def dataset_lock(filepath, exclusive=False, timeout=None):
+    """
+    获取数据文件的读锁（默认）或写锁。
+
+    Args:
+        filepath (str): 数据文件路径。
+        exclusive (bool): True 为写锁。
+        timeout (float, optional): 等待上限（秒），默认 Config.DATASET_LOCK_TIMEOUT。
+
+    Raises:
+        TimeoutError: 超时仍未获得锁。
+        RuntimeError: 同一线程持有读锁时请求写锁（升级会与其他读者死锁）。
+    """
+    key = os.path.abspath(filepath)
+    held = _held()
+    if key in held:
+        if exclusive and not held[key][0]:
+            raise RuntimeError(f"不能在持有读锁时申请写锁: {os.path.basename(key)}")
+        held[key][1] += 1
+        try:
+            yield
+        finally:
+            held[key][1] -= 1
+        return
+
+    release = _acquire(key, exclusive, Config.DATASET_LOCK_TIMEOUT if timeout is None else timeout)
+    held[key] = [exclusive, 1]
+    try:
+        yield
+    finally:
+        del held[key]
+        release()
+
+
+def _acquire(key, exclusive, timeout):
+    deadline = time.monotonic() + timeout
+    if fcntl is None:
+        with _fallback_guard:
+            lock = _fallback_locks.setdefault(key, threading.Lock())
+        if not lock.acquire(timeout=timeout):
+            raise TimeoutError(f"等待数据文件锁超时: {os.path.basename(key)}")
+        return lock.release
+
+    path = lock_path(key)
+    mode = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB
+    delay = 0.005
+    while True:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+        except BlockingIOError:
+            os.close(fd)
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"等待数据文件锁超时: {os.path.basename(key)}")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+            continue
+        # 等待期间锁文件可能已被删除（或删除后被重新创建）：锁住的是旧 inode，重新打开
+        try:
+            current = os.stat(path).st_ino
+        except FileNotFoundError:
+            current = None
+        if current == os.fstat(fd).st_ino:
+            break
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def release():
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+    return release
+
+
+def remove_lock_file(filepath):
+    """数据文件删除后清理其锁文件（持写锁删除，同一线程已持有写锁时可直接调用）。"""
+    if fcntl is None:
+        return
+    with dataset_lock(filepath, exclusive=True):
+        try:
+            os.remove(lock_path(filepath))
+        except OSError:
+            pass
@@ -0,0 +1,191 @@
+"""
+app.utils.frame_cache.py
+
+工具模块：进程级 DataFrame 缓存与分析结果缓存。
+EDA、统计、临床、纵向分析等接口几乎每次点击都会从 DuckDB 重新物化整张表，
+大队列（数百万行）下这是交互延迟的主要来源。本模块提供一个按内存预算淘汰的 LRU 缓存，
+键为 (文件路径, 增量链上各文件的版本, 投影列)，文件或其任一祖先被覆盖后旧版本自然失效。
+描述统计、相关矩阵、近似 EDA 样本等计算结果使用同一套 LRU（ResultCache），
+键以 (文件路径, DataService.chain_version(文件路径)) 开头，计数器一并由 /cache/stats 汇报。
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from app.config import Config
+
+# 名称 -> ResultCache，供 /cache/stats 汇总
+result_caches = {}
+
+
+class ResultCache:
+    """
+    按条目数和 / 或字节预算淘汰的 LRU 结果缓存（线程安全）。
+
+    键的前两项约定为 (文件路径, ((链上文件路径, 版本), ...))，invalidate 据此删除某个文件
+    及以它为祖先的数据集的全部条目。值为 None 时视为未命中，不要缓存 None。
+    """
+
+    def __init__(self, name=None, max_bytes=None, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        if name is not None:
+            result_caches[name] = self
+
+    def _size(self, value):
+        return 0
+
+    def _copy(self, value):
+        return value
+
+    def get(self, key):
+        """
+        查找缓存，未命中时返回 None。
+        """
+        if key is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._copy(entry[0])
+
+    def find(self, prefix, match):
+        """
+        在以 prefix 开头的键中从新到旧查找：match(key, value) 返回非 None 的结果即命中并返回该结果
+        （如从已缓存的大结果中切出所需部分），全部不匹配时返回 None。
+        """
+        with self._lock:
+            for key, (value, _) in reversed(self._entries.items()):
+                if key[:len(prefix)] != prefix:
+                    continue
+                result = match(key, value)
+                if result is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+            self.misses += 1
+            return None
+
+    def put(self, key, value, nbytes=None):
+        """
+        写入缓存并返回可交给调用方的值。超过字节预算的单个结果不缓存。
+        """
+        if key is None:
+            return value
+        nbytes = self._size(value) if nbytes is None else int(nbytes)
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self._entries and (
+                    (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+                    or (self.max_entries is not None and len(self._entries) > max(0, self.max_entries))):
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+        return self._copy(value)
+
+    def invalidate(self, filepath):
+        """
+        删除某个文件以及以它为祖先的增量数据集的全部缓存版本（文件被覆盖或删除时调用，立即释放内存）。
+        """
+        path = os.path.abspath(filepath)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == path or any(p == path for p, _ in k[1])]:
+                _, nbytes = self._entries.pop(key)
+                self.current_bytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        返回缓存计数器，用于监控命中率与内存占用。
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0,
+                'evictions': self.evictions,
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes
+            }
+            if self.max_entries is not None:
+                stats['max_entries'] = self.max_entries
+            return stats
+
+
+class FrameCache(ResultCache):
+    """
+    按字节预算淘汰的 LRU DataFrame 缓存（线程安全）。
+
+    对外只发放浅拷贝。应用启用了 pandas Copy-on-Write（见 app/__init__.py）：
+    调用方新增/替换列或原地写值（如 df.loc[...] = v）时，被写的列先复制一份，
+    缓存中的数据保持不变，一个请求不会悄悄污染其他请求看到的数据。
+    """
+
+    def __init__(self, max_bytes):
+        super().__init__(max_bytes=max_bytes)
+
+    @staticmethod
+    def file_version(filepath):
+        """
+        返回文件版本签名 (mtime_ns, size)。文件不存在时返回 None。
+        """
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def make_key(filepath, columns=None, variant=None, chain=None):
+        """
+        构建缓存键。
+
+        Args:
+            filepath (str): 数据文件路径。
+            columns (list, optional): 投影列；None 表示全部列。
+            variant (hashable, optional): 加载方式的附加区分（如行过滤条件）。
+            chain (list, optional): 增量数据集的整条文件链 [filepath, parent, ..., root]（见
+                DataService.lineage_chain）；键包含链上每个文件的版本，任一祖先被改写后旧结果即失效。
+
+        Returns:
+            tuple | None: 缓存键；链上有文件不存在时返回 None（不缓存）。
+        """
+        versions = []
+        for path in chain or [filepath]:
+            version = FrameCache.file_version(path)
+            if version is None:
+                return None
+            versions.append((os.path.abspath(path), version))
+        cols = tuple(columns) if columns else None
+        return (os.path.abspath(filepath), tuple(versions), cols, variant)
+
+    def _size(self, df):
+        return int(df.memory_usage(index=True, deep=True).sum())
+
+    def _copy(self, df):
+        return df.copy(deep=False)
+
+
+frame_cache = FrameCache(max_bytes=Config.FRAME_CACHE_MAX_MB * 1024 * 1024)
@@ -0,0 +1,94 @@
+"""
+app.utils.json_provider.py
+
+工具模块：基于 orjson 的 Flask JSON Provider。
+建模/评价结果中常含数十万个数值（生存预测、ROC/KM 曲线、聚类标签），
+Python json 模块逐元素编码很慢，且会把 NaN/Inf 输出为非法 JSON。本模块：
+
+- numpy 数组与标量直接在 C 层编码（OPT_SERIALIZE_NUMPY），NaN/Inf 一律输出为 null；
+- pandas Series/Index/DataFrame、pd.NA/NaT 转为对应的 JSON 值；
+- datetime/date、Decimal、UUID、dataclass 等沿用 Flask 默认 Provider 的表示（RFC 822 日期等），接口输出保持不变。
+
+orjson 为可选依赖：未安装时退化为 Flask 默认实现（仍支持 numpy/pandas 对象）。
+"""
+import numpy as np
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider, _default as _flask_default
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖：缺失时使用标准库 json
+    orjson = None
+
+_ORJSON_KWARGS = {'indent', 'separators', 'default', 'sort_keys', 'ensure_ascii'}
+
+
+def _default(o):
+    """序列化库不认识的对象时的回调：numpy / pandas 对象，其余交给 Flask 默认规则。"""
+    if o is pd.NA or o is pd.NaT:
+        return None
+    if isinstance(o, np.ndarray):
+        if orjson is not None and o.dtype.kind in 'biuf' and o.dtype.itemsize >= 4:
+            return np.ascontiguousarray(o)
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, (pd.Series, pd.Index)):
+        if isinstance(o.dtype, np.dtype) and o.dtype.kind in 'biuf':
+            return _default(o.to_numpy())
+        return o.astype(object).where(o.notna(), None).tolist()
+    if isinstance(o, pd.DataFrame):
+        return o.astype(object).where(o.notna(), None).to_dict(orient='records')
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    return _flask_default(o)
+
+
+def _plain_keys(obj):
+    # orjson 的 OPT_NON_STR_KEYS 不接受 numpy 标量键：仅在编码失败时才走这条较慢的路径
+    if isinstance(obj, dict):
+        return {(k.item() if isinstance(k, np.generic) else k): _plain_keys(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain_keys(v) for v in obj]
+    return obj
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    使用 orjson 的 JSON Provider。jsonify / request.get_json / flask.json 均经由此类。
+    """
+
+    default = staticmethod(_default)
+
+    def _options(self, indent=False):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dump_bytes(self, obj, indent=False):
+        """将对象编码为 UTF-8 JSON 字节串。"""
+        option = self._options(indent)
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except orjson.JSONEncodeError:
+            return orjson.dumps(_plain_keys(obj), default=_default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or not set(kwargs) <= _ORJSON_KWARGS or 'default' in kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dump_bytes(obj, indent=bool(kwargs.get('indent'))).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dump_bytes(obj, indent) + b"\n", mimetype=self.mimetype)
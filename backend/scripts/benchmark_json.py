@@ -0,0 +1,97 @@
+"""
+JSON 序列化基准：10 万患者 Cox 模型结果（时间依赖 ROC、NRI/IDI 用预测值、校准曲线）。
+
+比较：
+  legacy   逐元素递归 sanitize（pd.isna / .item()）+ 标准库 json
+  current  DataService.sanitize_for_json（数值列表批量转换）+ FastJSONProvider (orjson)
+  provider 结果不经 sanitize，numpy 数组直接交给 FastJSONProvider
+
+用法: python scripts/benchmark_json.py [患者数，默认 100000]
+"""
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+import numpy as np
+import pandas as pd
+
+from app import create_app
+from app.services.data_service import DataService
+
+
+def legacy_sanitize(obj):
+    if isinstance(obj, dict):
+        return {k: legacy_sanitize(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [legacy_sanitize(v) for v in obj]
+    elif isinstance(obj, float):
+        if pd.isna(obj) or math.isinf(obj):
+            return None
+        return float(obj)
+    elif isinstance(obj, int):
+        return int(obj)
+    elif hasattr(obj, 'item'):
+        val = obj.item()
+        if isinstance(val, float) and (pd.isna(val) or math.isinf(val)):
+            return None
+        return val
+    elif pd.isna(obj):
+        return None
+    return obj
+
+
+def cox_result(n, as_lists=True):
+    rng = np.random.default_rng(0)
+    convert = (lambda a: a.tolist()) if as_lists else (lambda a: a)
+    result = {
+        'model_type': 'cox',
+        'summary': [{'variable': f'x{i}', 'coef': rng.normal(), 'p_value': rng.random(), 'hr': math.exp(rng.normal())}
+                    for i in range(12)],
+        'clinical_eval': {'time_unit': 'months', 'roc': {}, 'predictions': {}, 'calibration': {}, 'dca': {}}
+    }
+    for t in (12, 36, 48, 60):
+        y_pred = rng.random(n)
+        y_pred[rng.integers(0, n, n // 1000)] = np.nan
+        fpr = np.sort(rng.random(n // 2))
+        ev = result['clinical_eval']
+        ev['predictions'][t] = {'y_true': convert(rng.integers(0, 2, n)), 'y_pred': convert(y_pred)}
+        ev['roc'][t] = {'fpr': convert(fpr), 'tpr': convert(np.sqrt(fpr)), 'auc': 0.71}
+        ev['calibration'][t] = {'predicted': convert(rng.random(10)), 'observed': convert(rng.random(10))}
+        thresholds = np.linspace(0, 0.99, 100)
+        ev['dca'][t] = {'thresholds': convert(thresholds), 'net_benefit': convert(rng.normal(size=100))}
+    return result
+
+
+def timed(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    app = create_app()
+    provider = app.json
+    lists = cox_result(n)
+    arrays = cox_result(n, as_lists=False)
+
+    legacy_t, legacy_out = timed(lambda: json.dumps(legacy_sanitize(lists), sort_keys=True, separators=(',', ':')))
+    current_t, current_out = timed(lambda: provider.dump_bytes(DataService.sanitize_for_json(lists)))
+    provider_t, _ = timed(lambda: provider.dump_bytes(arrays))
+
+    assert json.loads(legacy_out) == json.loads(current_out)
+    print(f"Cox result, {n} patients, {len(current_out) / 2 ** 20:.1f} MB JSON")
+    print(f"  legacy   (recursive sanitize + json): {legacy_t * 1000:8.1f} ms")
+    print(f"  current  (bulk sanitize + orjson):    {current_t * 1000:8.1f} ms  ({legacy_t / current_t:.1f}x)")
+    print(f"  provider (numpy arrays, orjson):      {provider_t * 1000:8.1f} ms  ({legacy_t / provider_t:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -50,3 +50,66 @@ def load_golden_dataset(golden_data_path):
             pytest.skip(f"Golden dataset {filename} not found.")
         return pd.read_csv(path, **kwargs)
     return _load
+
+@pytest.fixture
+def duckdb_frame():
+    """duckdb_file 的内容；测试模块可重写该 fixture 以使用自己的数据。"""
+    import pandas as pd
+    return pd.DataFrame({"id": range(100), "val": [i * 0.5 for i in range(100)]})
+
+@pytest.fixture
+def duckdb_file(tmp_path, duckdb_frame):
+    """保存为 DuckDB 数据文件的 duckdb_frame，并清空进程级的 DataFrame 缓存与连接池。"""
+    from app.services.data_service import DataService
+    from app.utils.connection_pool import connection_pool
+    from app.utils.frame_cache import frame_cache
+    path = str(tmp_path / "data.duckdb")
+    DataService.save_dataframe(duckdb_frame, path)
+    frame_cache.clear()
+    connection_pool.clear()
+    return path
+
+@pytest.fixture
+def auth_headers(client, app, tmp_path):
+    """已注册并登录的测试用户的请求头；上传目录指向 tmp_path。"""
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    client.post("/api/auth/register", json={"username": "tester", "email": "tester@example.com", "password": "pw123456"})
+    token = client.post("/api/auth/login", json={"username": "tester", "password": "pw123456"}).get_json()['token']
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def project_id(client, auth_headers):
+    """测试用户名下的一个项目。"""
+    return client.post("/api/projects/", headers=auth_headers, json={"name": "P"}).get_json()['id']
+
+@pytest.fixture
+def upload(client, auth_headers, project_id):
+    """
+    上传函数 upload(content, name='cohort.csv', project=None, query_string=None) -> 响应。
+    content 为 CSV 字节或 DataFrame；project 默认为 project_id。
+    """
+    import io
+    import pandas as pd
+
+    def _upload(content, name='cohort.csv', project=None, query_string=None):
+        if isinstance(content, pd.DataFrame):
+            content = content.to_csv(index=False).encode()
+        return client.post(f"/api/data/upload/{project or project_id}", headers=auth_headers,
+                           query_string=query_string, data={'file': (io.BytesIO(content), name)},
+                           content_type='multipart/form-data')
+    return _upload
+
+@pytest.fixture
+def cohort_rows():
+    """cohort_csv 的行数；测试模块可重写该 fixture。"""
+    return 30
+
+@pytest.fixture
+def cohort_csv(cohort_rows):
+    """age,sex,outcome 三列的示例队列 CSV。"""
+    return b"age,sex,outcome\n" + b"".join(f"{20 + i},{'MF'[i % 2]},{i % 2}\n".encode() for i in range(cohort_rows))
+
+@pytest.fixture
+def uploaded_dataset(upload, cohort_csv):
+    """上传 cohort_csv 得到的数据集 ID。"""
+    return upload(cohort_csv).get_json()['dataset_id']
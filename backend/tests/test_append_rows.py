@@ -0,0 +1,123 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import Config
+from app.models.dataset import Dataset
+from app.services.data_service import DataService
+from app.services.profile_service import ProfileService
+
+
+def _frame(start, n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "pid": np.arange(start, start + n),
+        "age": rng.integers(18, 90, n),
+        "sbp": rng.normal(130, 15, n).round(1),
+        "sex": rng.choice(["M", "F"], n),
+        "code": [f"C{v}" for v in rng.integers(0, 5000, n)],
+    })
+
+
+def _by_name(profile):
+    return {c["name"]: c for c in profile["columns"]}
+
+
+@pytest.fixture
+def base_file(tmp_path):
+    raw = tmp_path / "base.csv"
+    df = _frame(0, 3000, 0)
+    df.loc[::10, "sbp"] = np.nan
+    df.to_csv(raw, index=False)
+    path = str(tmp_path / "base.duckdb")
+    DataService.ingest_data(str(raw), path)
+    DataService.get_initial_metadata(path)
+    return path, df
+
+
+def test_append_reconciles_schema_and_merges_profile(base_file, tmp_path, monkeypatch):
+    path, base = base_file
+    batch = _frame(3000, 2000, 1).drop(columns=["sex"])
+    batch["age"] = batch["age"] + 0.5  # INTEGER column receives decimals
+    batch["visit"] = "m1"
+    batch.to_csv(tmp_path / "batch.csv", index=False)
+
+    scanned = []
+    real_scan = ProfileService._scan
+    monkeypatch.setattr(ProfileService, "_scan", staticmethod(
+        lambda con, source, columns, rows: scanned.append((source, [n for n, _ in columns])) or
+        real_scan(con, source, columns, rows)))
+    info = DataService.append_rows(str(tmp_path / "batch.csv"), path)
+    assert info == {"rows_appended": 2000, "row_count": 5000, "added_columns": ["visit"], "widened_columns": ["age"]}
+    # Existing rows are only rescanned for the column whose type changed
+    assert [cols for source, cols in scanned if source == "data"] == [["age"]]
+
+    df = DataService.load_data(path)
+    expected = pd.concat([base, batch], ignore_index=True)[["pid", "age", "sbp", "sex", "code", "visit"]]
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    merged = ProfileService.load(path)
+    assert merged is not None and merged["row_count"] == 5000
+    ProfileService.remove(path)
+    fresh = _by_name(ProfileService.profile(path))
+    for name, col in _by_name(merged).items():
+        ref = fresh[name]
+        assert col["type"] == ref["type"]
+        for key in ("non_null", "null_count", "min", "max", "top_values"):
+            assert col[key] == ref[key], (name, key)
+        if ref["mean"] is not None:
+            assert col["mean"] == pytest.approx(ref["mean"])
+            assert col["std"] == pytest.approx(ref["std"])
+            for q in ("q25", "q50", "q75"):
+                assert col["quantiles"][q] == pytest.approx(ref["quantiles"][q], rel=0.02)
+        assert col["distinct"] == pytest.approx(ref["distinct"], rel=0.1)
+    assert _by_name(merged)["sex"]["top_values"] == fresh["sex"]["top_values"]
+    assert _by_name(merged)["visit"]["null_count"] == 3000
+
+
+def test_sketches_are_kept_for_later_appends(base_file, tmp_path, monkeypatch):
+    path, base = base_file
+    monkeypatch.setattr(Config, "PROFILE_SKETCH_SIZE", 64)
+    _frame(3000, 500, 1).to_csv(tmp_path / "m1.csv", index=False)
+    DataService.append_rows(str(tmp_path / "m1.csv"), path)
+    code = _by_name(ProfileService.load(path))["code"]
+    assert len(code["sketch"]["hashes"]) == 64 and not code["distinct_exact"]
+
+    calls = []
+    real_sketch = ProfileService._sketch
+    monkeypatch.setattr(ProfileService, "_sketch", staticmethod(
+        lambda con, source, cdf, hashed, types, rows: calls.append((source, cdf, hashed)) or
+        real_sketch(con, source, cdf, hashed, types, rows)))
+    _frame(3500, 500, 2).to_csv(tmp_path / "m2.csv", index=False)
+    DataService.append_rows(str(tmp_path / "m2.csv"), path)
+    assert [(cdf, hashed) for source, cdf, hashed in calls if source == "data"] == [([], [])]
+    assert ProfileService.load(path)["row_count"] == 4000
+
+
+def test_append_rows_endpoint(client, auth_headers, upload):
+    headers = auth_headers
+    base = _frame(0, 300, 0)
+    ds_id = upload(base, "registry.csv").get_json()['dataset_id']
+    # A second dataset sharing the same file must not see the appended rows
+    twin_id = upload(base, "registry_copy.csv").get_json()['dataset_id']
+    before = Dataset.query.get(ds_id)
+    version, old_hash = before.version, before.content_hash
+
+    resp = client.post(f"/api/data/{ds_id}/rows", headers=headers,
+                       data={'file': (io.BytesIO(_frame(300, 50, 1).to_csv(index=False).encode()), "2024-02.csv")},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["rows_appended"] == 50 and body["row_count"] == 350
+
+    ds = Dataset.query.get(ds_id)
+    assert ds.version == version + 1 and ds.row_count == 350
+    assert ds.content_hash != old_hash
+    twin = Dataset.query.get(twin_id)
+    assert twin.filepath != ds.filepath and len(DataService.load_data(twin.filepath)) == 300
+    rows = client.get(f"/api/data/{ds_id}/rows", headers=headers, query_string={"total": 1, "columns": "pid"})
+    assert rows.get_json()["total"] == 350
+
+    bad = client.post(f"/api/data/{ds_id}/rows", headers=headers,
+                      data={'file': (io.BytesIO(b"x"), "notes.txt")}, content_type='multipart/form-data')
+    assert bad.status_code == 400
@@ -0,0 +1,108 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import Config
+from app.models.dataset import Dataset
+from app.services.approximate_eda_service import ApproximateEdaService
+from app.services.data_service import DataService
+from app.services.eda_profile_service import EdaProfileService
+
+
+def _frame(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 90, n).astype(float),
+        "sbp": rng.normal(130, 15, n).round(1),
+        "site": rng.choice(["A", "B", "C", "D"], n, p=[0.4, 0.3, 0.2, 0.1]),
+    })
+    df["dbp"] = (df["sbp"] * 0.6 + rng.normal(0, 8, n)).round(1)
+    df.loc[rng.random(n) < 0.1, "age"] = np.nan
+    return df
+
+
+@pytest.fixture
+def small_sample(monkeypatch):
+    monkeypatch.setattr(Config, "EDA_SAMPLE_ROWS", 2000)
+
+
+def _inside(value, interval):
+    # 95% 区间约有 1/20 的机会不覆盖真值：允许一个区间宽度的余量，只检查区间的位置与量级
+    lo, hi = interval
+    return lo - (hi - lo) <= value <= hi + (hi - lo)
+
+
+def test_sample_estimates_cover_exact_values(tmp_path, small_sample):
+    path = str(tmp_path / "visits.duckdb")
+    df = _frame()
+    DataService.save_dataframe(df, path)
+    info = ApproximateEdaService.sample(path)
+    assert info["row_count"] == len(df) and 1500 < info["sample_size"] < 2500
+    assert ApproximateEdaService.sample(path) is info
+
+    stats = {s["name"]: s for s in ApproximateEdaService.stats(info)}
+    age = stats["age"]
+    assert _inside(int(df["age"].count()), age["intervals"]["count"])
+    assert age["count"] + age["missing"] == len(df)
+    assert _inside(df["age"].mean(), age["intervals"]["mean"])
+    for name, p in (("q25", 0.25), ("q50", 0.5), ("q75", 0.75)):
+        assert _inside(df["sbp"].quantile(p), stats["sbp"]["intervals"][name])
+    assert stats["site"]["top_values"][0] == "A"
+
+    edges = [60.0, 100.0, 120.0, 140.0, 160.0, 200.0]
+    dist = ApproximateEdaService.distributions(info, ["sbp", "site"], edges)
+    exact = np.histogram(df["sbp"], bins=edges)[0]
+    assert all(_inside(k, ci) for k, ci in zip(exact, dist["sbp"]["intervals"]))
+    counts = df["site"].value_counts()
+    assert dist["site"]["x"] == list(counts.index)
+    assert all(_inside(counts[v], ci) for v, ci in zip(dist["site"]["x"], dist["site"]["intervals"]))
+
+    heatmap = ApproximateEdaService.correlation(info)
+    i, j = heatmap["columns"].index("sbp"), heatmap["columns"].index("dbp")
+    assert heatmap["lower"][i][j] <= df["sbp"].corr(df["dbp"]) <= heatmap["upper"][i][j]
+    top = ApproximateEdaService.correlation(info, top_k=1)["pairs"][0]
+    assert {top["x"], top["y"]} == {"sbp", "dbp"} and _inside(df["sbp"].corr(df["dbp"]), top["interval"])
+
+    # 不超过样本量的数据集直接精确计算
+    DataService.save_dataframe(df.head(1000), path)
+    assert ApproximateEdaService.sample(path) is None
+
+
+def test_progressive_endpoints_stream_approximate_then_exact(client, auth_headers, upload, small_sample):
+    headers = auth_headers
+    df = _frame()
+    ds_id = upload(df, "visits.csv").get_json()['dataset_id']
+
+    def stream(url, **params):
+        resp = client.get(url, headers=headers, query_string={"progressive": 1, **params})
+        assert resp.status_code == 200 and resp.mimetype == "application/x-ndjson"
+        return [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+
+    def check(url, params):
+        approximate, exact = stream(url, **params)
+        assert approximate["stage"] == "approximate" and exact["stage"] == "exact"
+        assert approximate["row_count"] == len(df)
+        assert exact["result"] == client.get(url, headers=headers, query_string=params).get_json()
+        return approximate
+
+    # 指定列的请求现场抽样，只读取需要的列
+    check(f"/api/eda/distribution/{ds_id}/site", {})
+    check(f"/api/eda/distributions/{ds_id}", {"columns": "sbp,site"})
+    filepath = Dataset.query.get(ds_id).filepath
+    sampled = ApproximateEdaService.sample(filepath, ["site"], build=False)
+    assert list(sampled["con"].execute("SELECT * FROM data LIMIT 0").df().columns) == ["sbp", "site"]
+    assert ApproximateEdaService.sample(filepath, build=False) is None
+
+    # 涉及全部列的请求只用预先抽取的样本（画像后台任务），尚无样本时只返回精确结果
+    assert [line["stage"] for line in stream(f"/api/eda/stats/{ds_id}")] == ["exact"]
+    ApproximateEdaService.sample(filepath)
+    approximate = check(f"/api/eda/stats/{ds_id}", {})
+    assert "intervals" in approximate["result"]["stats"][0]
+    check(f"/api/eda/correlation/{ds_id}", {"top_k": 2})
+    bad = client.get(f"/api/eda/correlation/{ds_id}", headers=headers,
+                     query_string={"progressive": 1, "method": "kendall"})
+    assert bad.status_code == 400
+
+    # 画像已能回答时只有精确结果
+    EdaProfileService.build(filepath)
+    assert [line["stage"] for line in stream(f"/api/eda/stats/{ds_id}")] == ["exact"]
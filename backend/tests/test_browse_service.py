@@ -0,0 +1,132 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.browse_service import BrowseService
+from app.services.data_service import DataService
+
+
+@pytest.fixture
+def grid_file(tmp_path):
+    n = 500
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "id": np.arange(n),
+        "age": rng.integers(30, 40, n).astype(float),  # many ties
+        "site": rng.choice(["Alpha", "beta", "Gamma"], n),
+        "visit": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 30, n), unit="D"),
+    })
+    df.loc[::11, "age"] = np.nan
+    df.loc[::13, "site"] = None
+    path = str(tmp_path / "grid.duckdb")
+    DataService.save_dataframe(df, path)
+    return path, df
+
+
+def _pages(path, **kwargs):
+    ids, cursor = [], None
+    while True:
+        page = BrowseService.page(path, cursor=cursor, **kwargs)
+        ids += page["row_ids"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids, page
+
+
+def test_pages_cover_table_in_order(grid_file):
+    path, df = grid_file
+    ids, last = _pages(path, limit=64)
+    assert ids == list(range(len(df)))
+    assert last["rows"] == len(df) % 64
+
+    page = BrowseService.page(path, columns=["site", "id"], limit=3)
+    assert [c["name"] for c in page["columns"]] == ["site", "id"]
+    assert page["data"] == {"site": df["site"][:3].tolist(), "id": [0, 1, 2]}
+
+
+@pytest.mark.parametrize("sort", [
+    [("age", "DESC")],
+    [("site", "ASC"), ("age", "DESC")],
+    [("visit", "ASC"), ("site", "DESC"), ("age", "ASC")],
+])
+def test_keyset_sort_matches_full_sort(grid_file, sort):
+    path, df = grid_file
+    ids, _ = _pages(path, sort=sort, limit=37)
+    expected = df.assign(_row=np.arange(len(df))).sort_values(
+        [c for c, _ in sort] + ["_row"],
+        ascending=[d == "ASC" for _, d in sort] + [True],
+        na_position="last", kind="mergesort")
+    assert ids == expected["_row"].tolist()
+
+
+def test_filters_and_total(grid_file):
+    path, df = grid_file
+    filters = [
+        {"column": "site", "op": "contains", "value": "A"},
+        {"column": "age", "op": "between", "value": [32, 36]},
+        {"column": "visit", "op": "ge", "value": "2024-01-10"},
+    ]
+    ids, _ = _pages(path, filters=filters, sort=[("age", "DESC")], limit=25)
+    mask = (df["site"].str.lower().str.contains("a", na=False) & df["age"].between(32, 36)
+            & (df["visit"] >= datetime.datetime(2024, 1, 10)))
+    assert sorted(ids) == np.flatnonzero(mask).tolist()
+
+    page = BrowseService.page(path, filters=filters + [{"column": "id", "op": "not_in", "value": ids[:5]}],
+                              with_total=True, limit=5)
+    assert page["total"] == int(mask.sum()) - 5
+    assert BrowseService.page(path, filters=[{"column": "age", "op": "is_null"}], with_total=True)["total"] == \
+        int(df["age"].isna().sum())
+
+
+def test_invalid_requests_raise_value_error(grid_file):
+    path, _ = grid_file
+    first = BrowseService.page(path, sort=[("age", "ASC")], limit=10)
+    with pytest.raises(ValueError):
+        BrowseService.page(path, sort=[("age", "DESC")], cursor=first["next_cursor"])
+    with pytest.raises(ValueError):
+        BrowseService.page(path, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        BrowseService.page(path, columns=["nope"])
+    with pytest.raises(ValueError):
+        BrowseService.page(path, filters=[{"column": "age", "op": "eq", "value": "abc"}])
+    with pytest.raises(ValueError):
+        BrowseService.page(path, filters=[{"column": "age", "op": "like", "value": 1}])
+
+
+def test_delta_dataset_rows_follow_logical_order(grid_file, tmp_path):
+    path, df = grid_file
+    child = DataService.load_data(path).dropna(subset=["age"]).sort_values("age", kind="mergesort")
+    child = child.assign(decade=child["age"] // 10)
+    child_path = str(tmp_path / "child.duckdb")
+    assert DataService.save_derived(child, child_path, path)
+
+    ids, _ = _pages(child_path, limit=50)
+    assert ids == list(range(len(child)))
+    page = BrowseService.page(child_path, columns=["id", "decade"], limit=4)
+    assert page["data"]["id"] == child["id"][:4].tolist()
+
+    ids, _ = _pages(child_path, sort=[("id", "DESC")], limit=50)
+    assert ids == np.argsort(-child["id"].to_numpy(), kind="stable").tolist()
+
+
+def test_rows_endpoint(client, auth_headers, upload):
+    headers = auth_headers
+    csv = b"age,sex\n" + b"".join(f"{20 + i % 50},{'MF'[i % 2]}\n".encode() for i in range(120))
+    ds_id = upload(csv, 'grid.csv').get_json()['dataset_id']
+
+    url = f"/api/data/{ds_id}/rows"
+    resp = client.get(url, headers=headers,
+                      query_string={"columns": "age", "sort": "age:desc", "limit": 50, "total": 1,
+                                    "filter": '[{"column": "sex", "op": "eq", "value": "M"}]'})
+    assert resp.status_code == 200
+    body = resp.get_json()
+    assert body["total"] == 60 and body["rows"] == 50
+    assert body["data"]["age"][:3] == [68, 68, 66]
+    nxt = client.get(url, headers=headers,
+                     query_string={"columns": "age", "sort": "age:desc", "limit": 50,
+                                   "filter": '[{"column": "sex", "op": "eq", "value": "M"}]',
+                                   "cursor": body["next_cursor"]}).get_json()
+    assert nxt["rows"] == 10 and nxt["next_cursor"] is None
+
+    assert client.get(url, headers=headers, query_string={"filter": "{bad"}).status_code == 400
+    assert client.get(url, headers=headers, query_string={"sort": "missing"}).status_code == 400
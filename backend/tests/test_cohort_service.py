@@ -0,0 +1,116 @@
+import json
+import duckdb
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import Config
+from app.models.dataset import Dataset
+from app.services.browse_service import BrowseService
+from app.services.cohort_service import CohortService
+from app.services.data_service import DataService
+
+
+@pytest.fixture
+def root_file(tmp_path):
+    n = 400
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "id": np.arange(n),
+        "age": rng.integers(10, 90, n),
+        "egfr": rng.normal(70, 25, n).round(1),
+        "outcome": rng.integers(0, 2, n).astype(float),
+        "site": rng.choice(["A", "B", "O'Neil"], n),
+    })
+    df.loc[::9, "outcome"] = np.nan
+    path = str(tmp_path / "root.duckdb")
+    DataService.save_dataframe(df, path)
+    return path, df
+
+
+ADULT_CKD = {"conditions": [
+    {"column": "age", "op": "ge", "value": 18},
+    {"column": "egfr", "op": "lt", "value": 60},
+    {"column": "outcome", "op": "not_null"},
+]}
+
+
+def test_filtered_view_stores_no_rows(root_file, tmp_path):
+    path, df = root_file
+    info = CohortService.preview(path, ADULT_CKD)
+    expected = df[(df["age"] >= 18) & (df["egfr"] < 60) & df["outcome"].notna()]
+    assert info["row_count"] == len(expected) and info["parent_row_count"] == len(df)
+
+    child = str(tmp_path / "cohort.duckdb")
+    assert DataService.save_filtered(child, path, info["predicate"], info["definition"])
+    assert DataService.lineage_chain(child) == [child, path]
+    con = duckdb.connect(child, read_only=True)
+    assert {r[0] for r in con.execute("SELECT table_name FROM information_schema.tables").fetchall()} == \
+        {"__lineage", "__columns", "__filter"}
+    con.close()
+
+    pd.testing.assert_frame_equal(DataService.load_data(child), expected.reset_index(drop=True))
+    proj = DataService.load_data_optimized(child, columns=["id", "site"])
+    assert proj["id"].tolist() == expected["id"].tolist()
+    assert BrowseService.page(child, columns=["id"], limit=5)["row_ids"] == [0, 1, 2, 3, 4]
+
+    # Derived steps and nested cohorts build on the view like on any other dataset
+    sub = CohortService.preview(child, {"match": "any", "conditions": [
+        {"column": "site", "op": "eq", "value": "O'Neil"},
+        {"match": "all", "conditions": [{"column": "age", "op": "between", "value": [20, 30]}]},
+    ]})
+    grandchild = str(tmp_path / "sub.duckdb")
+    DataService.save_filtered(grandchild, child, sub["predicate"])
+    mask = (expected["site"] == "O'Neil") | expected["age"].between(20, 30)
+    assert DataService.load_data(grandchild)["id"].tolist() == expected.loc[mask, "id"].tolist()
+    derived = DataService.load_data(grandchild).assign(ckd=1)
+    assert DataService.save_derived(derived, str(tmp_path / "derived.duckdb"), grandchild)
+    pd.testing.assert_frame_equal(DataService.load_data(str(tmp_path / "derived.duckdb")), derived)
+
+
+def test_deep_chain_is_materialized(root_file, tmp_path, monkeypatch):
+    path, df = root_file
+    monkeypatch.setattr(Config, "DELTA_MAX_DEPTH", 0)
+    child = str(tmp_path / "cohort.duckdb")
+    info = CohortService.preview(path, ADULT_CKD)
+    assert not DataService.save_filtered(child, path, info["predicate"])
+    assert DataService.lineage_chain(child) == [child]
+    assert len(DataService.load_data(child)) == info["row_count"]
+
+
+def test_invalid_definitions(root_file):
+    path, _ = root_file
+    for definition in [
+        {"conditions": []},
+        {"match": "xor", "conditions": [{"column": "age", "op": "ge", "value": 1}]},
+        {"conditions": [{"column": "nope", "op": "eq", "value": 1}]},
+        {"conditions": [{"column": "age", "op": "ge", "value": "old"}]},
+        {"conditions": [{"column": "age", "op": "between", "value": [1]}]},
+        {"conditions": [{"column": "age", "op": "eq", "value": "1; DROP TABLE data"}]},
+    ]:
+        with pytest.raises(ValueError):
+            CohortService.preview(path, definition)
+
+
+def test_cohort_endpoint(client, auth_headers, upload):
+    headers = auth_headers
+    csv = b"age,egfr,outcome\n" + b"".join(f"{i % 80},{30 + i % 70},{i % 2}\n".encode() for i in range(300))
+    ds_id = upload(csv, 'ckd.csv').get_json()['dataset_id']
+
+    body = {"conditions": [{"column": "age", "op": "ge", "value": 18}, {"column": "egfr", "op": "lt", "value": 60}]}
+    dry = client.post(f"/api/data/{ds_id}/cohort", headers=headers, json={**body, "dry_run": True}).get_json()
+    resp = client.post(f"/api/data/{ds_id}/cohort", headers=headers, json={**body, "name": "成人 CKD"})
+    assert resp.status_code == 201
+    created = resp.get_json()
+    assert created["row_count"] == dry["row_count"] == sum(1 for i in range(300) if i % 80 >= 18 and 30 + i % 70 < 60)
+
+    cohort = Dataset.query.get(created["new_dataset_id"])
+    assert cohort.parent_id == ds_id and cohort.action_type == "cohort"
+    assert json.loads(cohort.action_log)["conditions"][0] == {"column": "age", "op": "ge", "value": 18}
+    assert cohort.row_count == created["row_count"]
+
+    again = client.post(f"/api/data/{ds_id}/cohort", headers=headers, json=body).get_json()
+    assert Dataset.query.get(again["new_dataset_id"]).filepath == cohort.filepath
+
+    bad = client.post(f"/api/data/{ds_id}/cohort", headers=headers,
+                      json={"conditions": [{"column": "age", "op": "gt", "value": "x"}]})
+    assert bad.status_code == 400
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.data_service import DataService
+
+
+@pytest.fixture
+def clinical_file(tmp_path):
+    n = 5000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "id": np.arange(n),
+        "visits": pd.array(rng.integers(0, 20, n), dtype="Int64"),
+        "bmi": rng.normal(25, 4, n),
+        "sex": rng.choice(["Male", "Female"], n),
+        "site": rng.choice([f"Hospital {i}" for i in range(12)], n),
+        "note": [f"free text {i}" for i in range(n)],
+    })
+    df.loc[::9, "visits"] = pd.NA
+    path = str(tmp_path / "clinical.duckdb")
+    DataService.save_dataframe(df, path)
+    return path
+
+
+def test_compact_load_narrows_types(clinical_file):
+    cols = ["id", "visits", "bmi", "sex", "site", "note"]
+    wide = DataService.load_data_optimized(clinical_file, columns=cols)
+    df = DataService.load_data_optimized(clinical_file, columns=cols, compact=True)
+
+    assert df["id"].dtype == np.int32
+    assert df["visits"].dtype == np.float32
+    assert df["bmi"].dtype == np.float64
+    assert list(df["sex"].cat.categories) == ["Female", "Male"]
+    assert df["note"].dtype == object
+    assert df.attrs["schema"] == {
+        "id": "numeric", "visits": "numeric", "bmi": "numeric",
+        "sex": "category", "site": "category", "note": "text"
+    }
+    # Values are unchanged, only their representation
+    pd.testing.assert_frame_equal(DataService.to_numpy_frame(df).astype({"sex": object, "site": object, "id": "int64"}),
+                                  wide, check_dtype=False)
+    assert df.memory_usage(deep=True).sum() * 2 < wide.memory_usage(deep=True).sum()
+
+
+def test_compact_load_gives_identical_model_inputs(clinical_file):
+    cols = ["visits", "bmi", "sex", "site"]
+    wide = DataService.preprocess_for_formula(DataService.load_data_optimized(clinical_file, columns=cols).dropna())
+    df = DataService.preprocess_for_formula(
+        DataService.load_data_optimized(clinical_file, columns=cols, compact=True).dropna())
+
+    for col in cols:
+        assert df[col].dtype == wide[col].dtype
+    pd.testing.assert_frame_equal(df, wide)
+
+    X, features = DataService.preprocess_for_matrix(
+        DataService.load_data_optimized(clinical_file, columns=cols, compact=True).dropna(), ["bmi", "sex", "site"])
+    X_wide, features_wide = DataService.preprocess_for_matrix(
+        DataService.load_data_optimized(clinical_file, columns=cols).dropna(), ["bmi", "sex", "site"])
+    assert features == features_wide
+
+
+def test_unused_categories_are_dropped_after_filtering(clinical_file):
+    df = DataService.load_data_optimized(clinical_file, columns=["sex", "site"], compact=True)
+    subset = df[df["site"] == "Hospital 3"]
+
+    out = DataService.preprocess_for_formula(subset)
+    assert list(out["site"].cat.categories) == ["Hospital 3"]
+
+    _, features = DataService.preprocess_for_matrix(subset, ["sex", "site"])
+    assert not [f for f in features if f.startswith("site_")]
@@ -0,0 +1,103 @@
+import io
+import os
+import pandas as pd
+import pytest
+from app import db
+from app.models.dataset import Dataset
+from app.services.data_service import DataService
+from app.services.preprocessing_service import PreprocessingService
+
+
+@pytest.fixture
+def auth(client, auth_headers, project_id, upload, cohort_csv):
+    other = client.post("/api/projects/", headers=auth_headers, json={"name": "P2"}).get_json()['id']
+
+    def _upload(project, content=cohort_csv):
+        resp = upload(content, project=project)
+        assert resp.status_code == 201, resp.get_json()
+        return resp.get_json()
+    return auth_headers, (project_id, other), _upload
+
+
+def test_identical_upload_shares_file_and_refcounts(client, auth):
+    headers, (p1, p2), _upload = auth
+    first = _upload(p1)
+    second = _upload(p2)
+    assert second['reused'] is True
+
+    a = db.session.get(Dataset, first['dataset_id'])
+    b = db.session.get(Dataset, second['dataset_id'])
+    assert a.filepath == b.filepath and a.content_hash == b.content_hash
+    assert b.meta_data['row_count'] == 30
+    path = a.filepath
+
+    # Deleting one reference keeps the shared file alive
+    assert client.delete(f"/api/data/{a.id}", headers=headers).status_code == 200
+    assert os.path.exists(path)
+    assert DataService.load_data(path).shape == (30, 3)
+
+    # Deleting the last reference removes storage, including the kept raw upload
+    assert client.delete(f"/api/data/{b.id}", headers=headers).status_code == 200
+    assert not os.path.exists(path)
+    assert not os.path.exists(os.path.splitext(path)[0] + '.csv')
+
+
+def test_different_content_gets_distinct_files(auth, cohort_csv):
+    _, (p1, _), _upload = auth
+    first = _upload(p1)
+    second = _upload(p1, content=cohort_csv + b"99,M,1\n")
+    a = db.session.get(Dataset, first['dataset_id'])
+    b = db.session.get(Dataset, second['dataset_id'])
+    assert a.filepath != b.filepath
+    assert 'reused' not in second
+
+
+def test_repeated_derived_step_reuses_result(auth):
+    _, (p1, _), _upload = auth
+    root = db.session.get(Dataset, _upload(p1)['dataset_id'])
+    df = DataService.load_data(root.filepath).assign(age2=lambda d: d['age'] * 2)
+
+    one = PreprocessingService.save_processed_dataset(root.id, df, 'x2', None, action_type='derive', log={'k': 1})
+    two = PreprocessingService.save_processed_dataset(root.id, df, 'x2', None, action_type='derive', log={'k': 1})
+    other = PreprocessingService.save_processed_dataset(root.id, df, 'x2', None, action_type='derive', log={'k': 2})
+
+    assert one.filepath == two.filepath
+    assert other.filepath != one.filepath  # same suffix, different parameters: no clobbering
+    assert two.meta_data == one.meta_data
+
+
+def test_overwrite_of_shared_file_is_copy_on_write(auth):
+    _, (p1, p2), _upload = auth
+    a = db.session.get(Dataset, _upload(p1)['dataset_id'])
+    b = db.session.get(Dataset, _upload(p2)['dataset_id'])
+    shared = a.filepath
+
+    new_df = DataService.load_data(shared).assign(flag=1)
+    PreprocessingService.save_processed_dataset(b.id, new_df, 'flag', None, overwrite_id=b.id,
+                                                action_type='derive', log={'flag': 1})
+
+    assert b.filepath != shared
+    assert 'flag' in DataService.get_columns(b.filepath)
+    assert 'flag' not in DataService.get_columns(a.filepath)
+
+
+def test_appending_to_root_compacts_whole_delta_chain(client, auth):
+    headers, (p1, _), _upload = auth
+    root = db.session.get(Dataset, _upload(p1)['dataset_id'])
+    parent, chain = root, []
+    for step in range(5):
+        df = DataService.load_data(parent.filepath).iloc[1:]
+        parent = PreprocessingService.save_processed_dataset(parent.id, df.assign(**{f"s{step}": step}), f"s{step}", None)
+        chain.append(parent)
+    assert len(DataService.lineage_chain(chain[-1].filepath)) == 6
+    expected = {ds.id: DataService.load_data(ds.filepath) for ds in chain}
+
+    # 原地追加会改写根文件：五个派生文件都需物化，且与候选顺序无关地先物化后代
+    resp = client.post(f"/api/data/{root.id}/rows", headers=headers,
+                       data={'file': (io.BytesIO(b"age,sex,outcome\n90,M,1\n"), "more.csv")},
+                       content_type='multipart/form-data')
+    assert resp.status_code == 200
+    assert db.session.get(Dataset, root.id).filepath == root.filepath
+    for ds in chain:
+        assert DataService.read_lineage(ds.filepath) is None
+        pd.testing.assert_frame_equal(DataService.load_data(ds.filepath), expected[ds.id])
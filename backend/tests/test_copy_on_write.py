@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+from app import create_app
+from app.config import TestConfig
+from app.services.data_service import DataService
+from app.services.modeling_service import ModelingService
+from app.services.preprocessing_service import PreprocessingService
+from app.utils.alloc_report import allocation_report
+from app.utils.diagnostics import ModelDiagnostics
+
+
+@pytest.fixture
+def wide_frame():
+    rng = np.random.default_rng(0)
+    n = 20000
+    df = pd.DataFrame({f"x{i}": rng.normal(size=n) for i in range(6)})
+    df["grp"] = rng.choice(["a", "b", "c"], n)
+    df["y"] = (df[[f"x{i}" for i in range(6)]].sum(axis=1) + rng.normal(size=n) > 0).astype(int)
+    for i in range(20):
+        df[f"unused{i}"] = rng.normal(size=n)
+    return df
+
+
+def test_copy_on_write_is_enabled():
+    assert pd.options.mode.copy_on_write
+
+
+def test_preprocessing_does_not_copy_untouched_columns(wide_frame):
+    frame_bytes = wide_frame.memory_usage(index=False).sum()
+    column_bytes = wide_frame["x0"].nbytes
+    before = wide_frame.copy()
+
+    with allocation_report(top=0) as report:
+        imputed = PreprocessingService.impute_data(wide_frame, {"x0": "mean"})
+    assert report["peak_bytes"] < 2 * column_bytes
+
+    with allocation_report(top=0) as report:
+        formula_df = DataService.preprocess_for_formula(wide_frame)
+    # Only the string column is converted; numeric columns stay shared with the input
+    assert report["peak_bytes"] < 0.2 * frame_bytes
+
+    # ...and writes to the results never reach the caller's frame
+    imputed.loc[0, "x1"] = 1e9
+    formula_df.loc[0, "x2"] = 1e9
+    pd.testing.assert_frame_equal(wide_frame, before)
+
+
+def test_vif_matches_per_column_regression(wide_frame, monkeypatch):
+    features = [f"x{i}" for i in range(6)] + ["unused0"]
+    frame = wide_frame.assign(unused0=wide_frame["x0"] * 0.7 + wide_frame["unused0"] * 0.3)
+    fast = ModelDiagnostics.calculate_vif(frame, features)
+    monkeypatch.setattr(ModelDiagnostics, "_vif_from_correlation", staticmethod(lambda X: None))
+    assert ModelDiagnostics.calculate_vif(frame, features) == fast
+
+
+def test_run_model_peak_is_bounded_by_the_fit(wide_frame):
+    features = [f"x{i}" for i in range(6)] + ["grp"]
+    projected = wide_frame[features + ["y"]]
+    matrix_bytes = len(projected) * 8 * (len(features) + 2)
+    ModelingService.run_model(projected.iloc[:500], "logistic", "y", features)  # warm up lazy imports
+
+    df_fit, new_features = DataService.preprocess_for_matrix(projected, features)
+    with allocation_report(top=0) as bare:
+        sm.Logit(df_fit["y"], sm.add_constant(df_fit[new_features])).fit(disp=0)
+    with allocation_report(top=0) as report:
+        ModelingService.run_model(projected, "logistic", "y", features)
+
+    # On top of the solver's own work run_model keeps the encoded design frame (one copy of the
+    # projected matrix) and, while cross-validating, one fold's training slice; no whole-frame copies
+    assert report["peak_bytes"] - bare["peak_bytes"] < 3 * matrix_bytes
+
+
+def test_request_allocation_header():
+    class AllocConfig(TestConfig):
+        ALLOC_REPORT = True
+
+    app = create_app(AllocConfig)
+    resp = app.test_client().get("/api/does-not-exist")
+    assert int(resp.headers["X-Alloc-Peak-Bytes"]) >= 0
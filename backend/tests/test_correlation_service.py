@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.config import Config
+from app.services.correlation_service import CorrelationService
+from app.services.data_service import DataService
+from app.services.statistics_service import StatisticsService
+
+
+def _frame(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, 6)), columns=list("abcdef"))
+    df["g"] = df["a"] * 2 + rng.normal(size=n) * 0.1
+    df["const"] = 1.0
+    df["site"] = rng.choice(["A", "B"], n)
+    return df
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # 小分块，确保跨块与块内的拼接都被覆盖
+    monkeypatch.setattr(Config, "CORRELATION_BLOCK_COLUMNS", 3)
+
+
+def test_pairwise_complete_matches_pandas(small_blocks):
+    df = _frame()
+    rng = np.random.default_rng(1)
+    df.loc[rng.random(len(df)) < 0.2, "b"] = np.nan
+    df.loc[rng.random(len(df)) < 0.3, "g"] = np.nan
+    df.loc[:280, "f"] = np.nan
+
+    result = CorrelationService.matrix(df)
+    numeric = df.select_dtypes("number")
+    assert result["columns"] == list(numeric.columns)
+    np.testing.assert_allclose(result["r"], numeric.corr().to_numpy(), atol=1e-12)
+    mask = numeric.notna().astype(int)
+    np.testing.assert_array_equal(result["n"], mask.T @ mask)
+
+    complete = df.dropna()
+    spearman = CorrelationService.matrix(complete, "spearman")
+    np.testing.assert_allclose(spearman["r"], complete.select_dtypes("number").corr("spearman").to_numpy(),
+                               atol=1e-12)
+    with pytest.raises(ValueError):
+        CorrelationService.matrix(df, "kendall")
+
+
+def test_top_pairs_without_full_matrix(small_blocks):
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame(rng.normal(size=(200, 20)), columns=[f"x{i}" for i in range(20)])
+    df["x17"] = df["x3"] - df["x11"] * 0.5
+    df.loc[::4, "x5"] = np.nan
+
+    top = CorrelationService.top_pairs(df, k=5)
+    corr = df.corr()
+    expected = sorted(((abs(corr.iloc[i, j]), corr.columns[i], corr.columns[j])
+                       for i in range(20) for j in range(i + 1, 20)), reverse=True)[:5]
+    assert [(p["x"], p["y"]) for p in top["pairs"]] == [(x, y) for _, x, y in expected]
+    assert top["pairs"][0]["r"] == pytest.approx(corr.loc["x3", "x17"])
+    assert top["column_count"] == 20
+
+
+def test_dataset_cache_reused_by_collinearity_check(tmp_path, monkeypatch):
+    path = str(tmp_path / "wide.duckdb")
+    df = _frame()
+    DataService.save_dataframe(df, path)
+
+    calls = []
+    real = CorrelationService.matrix
+    monkeypatch.setattr(CorrelationService, "matrix", staticmethod(
+        lambda frame, method="pearson": calls.append(list(frame.columns)) or real(frame, method)))
+
+    full = CorrelationService.dataset_matrix(path)
+    assert full["columns"] == ["a", "b", "c", "d", "e", "f", "g", "const"]
+    # 列子集（含非数值列）直接从缓存切片
+    subset = CorrelationService.dataset_matrix(path, columns=["g", "site", "a"])
+    assert subset["columns"] == ["g", "a"]
+    assert subset["r"][0, 1] == pytest.approx(df["a"].corr(df["g"]))
+
+    report = StatisticsService.check_multicollinearity(df, ["a", "b", "g"], source=path)
+    assert [item["vars"] for item in report["report"] if item["type"] == "correlation"] == [["a", "g"]]
+    assert len(calls) == 1
+
+    # 文件改写后缓存失效
+    DataService.save_dataframe(df.head(50), path)
+    assert CorrelationService.dataset_matrix(path, columns=["a", "g"])["n"][0, 1] == 50
+    assert len(calls) == 2
+
+
+def test_correlation_endpoint(client, auth_headers, upload):
+    headers = auth_headers
+    df = _frame()
+    ds_id = upload(df, "wide.csv").get_json()['dataset_id']
+
+    heatmap = client.get(f"/api/eda/correlation/{ds_id}", headers=headers,
+                         query_string={"method": "spearman"}).get_json()
+    assert heatmap["method"] == "spearman" and "site" not in heatmap["columns"]
+    assert heatmap["counts"][0][0] == len(df)
+    top = client.get(f"/api/eda/correlation/{ds_id}", headers=headers, query_string={"top_k": 1}).get_json()
+    assert [top["pairs"][0]["x"], top["pairs"][0]["y"]] == ["a", "g"]
+    bad = client.get(f"/api/eda/correlation/{ds_id}", headers=headers, query_string={"method": "kendall"})
+    assert bad.status_code == 400
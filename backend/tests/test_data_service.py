@@ -82,3 +82,37 @@ class TestDataService:
             
         result = DataService.get_initial_metadata(str(filepath))
         assert result['row_count'] == 1
+
+    def test_detect_encoding_from_byte_sample(self, tmp_path):
+        """Encoding is decided from a bounded byte sample, without parsing."""
+        def write(name, data):
+            path = tmp_path / name
+            path.write_bytes(data)
+            return str(path)
+
+        assert DataService.detect_encoding(write("a.csv", b"x,y\n1,2\n")) == 'utf-8'
+        assert DataService.detect_encoding(write("bom.csv", "﻿变量\n1\n".encode('utf-8'))) == 'utf-8-sig'
+        assert DataService.detect_encoding(write("w.csv", b"col1\n\x80\xff")) == 'latin1'
+        assert DataService.detect_encoding(write("fr.csv", "ville\nMontréal\n".encode('latin1'))) == 'latin1'
+
+        # Sample boundary inside a multi-byte character is not mistaken for invalid UTF-8
+        text = "诊断\n" + "慢性肾病\n" * 100
+        assert DataService.detect_encoding(write("u.csv", text.encode('utf-8')), sample_bytes=64) == 'utf-8'
+        assert DataService.detect_encoding(write("g.csv", text.encode('gb18030')), sample_bytes=64) == 'gb18030'
+
+        # Non-ASCII content that only appears after a long ASCII prefix is still found
+        late = b"id,value\n" + b"1,2\n" * 50000 + "3,男性\n".encode('gb18030')
+        assert DataService.detect_encoding(write("late.csv", late), sample_bytes=1024) == 'gb18030'
+
+    def test_ingest_gb18030_csv_transcodes_once(self, tmp_path):
+        """GB18030 CSV is transcoded for DuckDB and keeps Chinese headers and values."""
+        raw = tmp_path / "gbk.csv"
+        raw.write_bytes("姓名,性别\n张三,男\n李四,女\n".encode('gb18030'))
+        db_path = str(tmp_path / "gbk.duckdb")
+
+        assert DataService.ingest_data(str(raw), db_path, encoding='gb18030') == 2
+        df = DataService.load_data(db_path)
+        assert list(df.columns) == ["姓名", "性别"]
+        assert df["性别"].tolist() == ["男", "女"]
+        # The transcoded temp file is removed
+        assert sorted(f for f in os.listdir(tmp_path) if not f.startswith('.')) == ["gbk.csv", "gbk.duckdb"]
@@ -0,0 +1,96 @@
+import gzip
+import io
+import os
+import pandas as pd
+import pyarrow as pa
+import pytest
+from app import db
+from app.config import Config
+from app.models.dataset import Dataset
+from app.services.data_service import DataService
+from app.services.export_service import ExportService
+
+
+@pytest.fixture
+def cohort_rows():
+    return 300
+
+
+@pytest.fixture
+def uploaded(auth_headers, upload, cohort_csv, tmp_path):
+    resp = upload(cohort_csv, '队列.csv')
+    return auth_headers, resp.get_json()['dataset_id'], tmp_path
+
+
+def _exports(tmp_path):
+    folder = tmp_path / 'exports'
+    return sorted(os.listdir(folder)) if folder.exists() else []
+
+
+def test_csv_download_streams_and_caches(client, uploaded, monkeypatch):
+    headers, ds_id, tmp_path = uploaded
+    monkeypatch.setattr(Config, 'EXPORT_BATCH_ROWS', 64)
+
+    resp = client.get(f"/api/data/download/dataset/{ds_id}", headers=headers)
+    assert resp.status_code == 200
+    assert resp.content_length is None  # streamed, size unknown up front
+    assert "filename*=UTF-8''%E9%98%9F%E5%88%97.csv" in resp.headers['Content-Disposition']
+    df = pd.read_csv(io.BytesIO(resp.get_data()))
+    assert df.shape == (300, 3) and df['age'].iloc[-1] == 319
+    assert _exports(tmp_path) == [f"{ds_id}_v1.csv"]
+    # No temp CSV left next to the data files
+    assert not [f for f in os.listdir(tmp_path) if f.startswith('export_')]
+
+    again = client.get(f"/api/data/download/dataset/{ds_id}", headers=headers)
+    assert again.content_length == len(resp.get_data())  # served from the export cache
+    assert again.get_data() == resp.get_data()
+
+
+def test_parquet_arrow_and_gzip_formats(client, uploaded):
+    headers, ds_id, _ = uploaded
+    resp = client.get(f"/api/data/download/dataset/{ds_id}?format=parquet", headers=headers)
+    assert resp.status_code == 200
+    assert len(pd.read_parquet(io.BytesIO(resp.get_data()))) == 300
+
+    resp = client.get(f"/api/data/download/dataset/{ds_id}?format=arrow&compression=gzip", headers=headers)
+    assert resp.mimetype == 'application/gzip'
+    table = pa.ipc.open_stream(gzip.decompress(resp.get_data())).read_all()
+    assert table.column_names == ['age', 'sex', 'outcome'] and table.num_rows == 300
+
+    resp = client.get(f"/api/data/download/dataset/{ds_id}?format=csv&compression=gzip", headers=headers)
+    assert pd.read_csv(io.BytesIO(gzip.decompress(resp.get_data()))).shape == (300, 3)
+
+    assert client.get(f"/api/data/download/dataset/{ds_id}?format=xml", headers=headers).status_code == 400
+    assert client.get(f"/api/data/download/dataset/{ds_id}?format=parquet&compression=gzip",
+                      headers=headers).status_code == 400
+
+
+def test_new_version_replaces_cache_and_delete_purges(client, uploaded):
+    headers, ds_id, tmp_path = uploaded
+    client.get(f"/api/data/download/dataset/{ds_id}", headers=headers).get_data()
+    client.get(f"/api/data/download/dataset/{ds_id}?format=parquet", headers=headers).get_data()
+    assert _exports(tmp_path) == [f"{ds_id}_v1.csv", f"{ds_id}_v1.parquet"]
+
+    dataset = db.session.get(Dataset, ds_id)
+    DataService.save_dataframe(DataService.load_data(dataset.filepath).head(10), dataset.filepath)
+    dataset.meta_data = DataService.get_initial_metadata(dataset.filepath)
+    db.session.commit()
+
+    resp = client.get(f"/api/data/download/dataset/{ds_id}", headers=headers)
+    assert len(pd.read_csv(io.BytesIO(resp.get_data()))) == 10
+    assert _exports(tmp_path) == [f"{ds_id}_v2.csv"]
+
+    assert client.delete(f"/api/data/{ds_id}", headers=headers).status_code == 200
+    assert _exports(tmp_path) == []
+
+
+def test_abandoned_stream_leaves_no_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'EXPORT_BATCH_ROWS', 10)
+    path = str(tmp_path / "d.duckdb")
+    DataService.save_dataframe(pd.DataFrame({'x': range(100)}), path)
+    cache = str(tmp_path / 'exports' / '1_v1.csv')
+
+    chunks = ExportService.stream(path, 'csv', cache_path=cache)
+    next(chunks)
+    chunks.close()
+    assert os.listdir(tmp_path / 'exports') == []
@@ -0,0 +1,51 @@
+import json
+import pytest
+from app import db
+from app.models.dataset import Dataset
+
+
+@pytest.fixture
+def cohort_rows():
+    return 25
+
+
+@pytest.fixture
+def uploaded(auth_headers, project_id, uploaded_dataset):
+    return auth_headers, project_id, uploaded_dataset
+
+
+def test_project_endpoint_returns_summaries_only(client, uploaded):
+    headers, project_id, dataset_id = uploaded
+    body = client.get(f"/api/projects/{project_id}", headers=headers).get_json()
+
+    ds = body['datasets'][0]
+    assert ds['id'] == dataset_id
+    assert ds['row_count'] == 25
+    assert ds['column_count'] == 3
+    assert ds['version'] == 1
+    assert 'meta_data' not in ds
+
+
+def test_profile_endpoint_filters_columns(client, uploaded):
+    headers, _, dataset_id = uploaded
+    body = client.get(f"/api/data/{dataset_id}/profile?columns=age", headers=headers).get_json()
+
+    assert body['row_count'] == 25
+    assert [c['name'] for c in body['columns']] == ['age']
+    assert body['columns'][0]['min'] == 20
+
+
+def test_meta_data_parsed_once_per_instance(uploaded, monkeypatch):
+    dataset = db.session.get(Dataset, uploaded[2])
+    first = dataset.meta_data
+
+    calls = []
+    real_loads = json.loads
+    monkeypatch.setattr(json, "loads", lambda s, *a, **k: calls.append(1) or real_loads(s, *a, **k))
+    assert dataset.meta_data is first
+    assert calls == []
+
+    dataset.meta_data = {'variables': [], 'row_count': 0}
+    assert dataset.meta_data['row_count'] == 0
+    assert dataset.row_count == 0 and dataset.column_count == 0
+    assert dataset.version == 2
@@ -0,0 +1,151 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from app import db
+from app.config import Config
+from app.models.dataset import Dataset
+from app.models.project import Project
+from app.services.data_service import DataService
+from app.services.preprocessing_service import PreprocessingService
+
+
+@pytest.fixture
+def root_file(tmp_path):
+    path = str(tmp_path / "root.duckdb")
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "id": np.arange(200),
+        "age": rng.normal(60, 10, 200).round(1),
+        "sex": rng.choice(["M", "F"], 200),
+        "scr": rng.normal(1.0, 0.2, 200).round(2),
+        "site": rng.choice(["A", "B", "C"], 200),
+    })
+    df.loc[::7, "scr"] = np.nan
+    DataService.save_dataframe(df, path)
+    return path
+
+
+def test_added_column_stored_as_delta(root_file, tmp_path):
+    parent = DataService.load_data(root_file)
+    child = parent.assign(egfr=lambda d: 140 - d["age"])
+    child_path = str(tmp_path / "child.duckdb")
+
+    assert DataService.save_derived(child, child_path, root_file)
+    assert DataService.read_lineage(child_path) == (root_file, 1)
+    assert os.path.getsize(child_path) <= os.path.getsize(root_file) * 2  # only the delta + bookkeeping
+
+    loaded = DataService.load_data(child_path)
+    pd.testing.assert_frame_equal(loaded, child)
+    assert DataService.get_columns(child_path) == list(child.columns)
+
+
+def test_row_selection_and_replaced_column(root_file, tmp_path):
+    parent = DataService.load_data(root_file)
+    # dropna keeps parent positions in the index; reorder to check that row order is preserved too
+    child = parent.dropna(subset=["scr"]).sort_values("age")
+    child = child.assign(scr=child["scr"] * 88.4)
+    child_path = str(tmp_path / "child.duckdb")
+
+    assert DataService.save_derived(child, child_path, root_file)
+    loaded = DataService.load_data(child_path)
+    pd.testing.assert_frame_equal(loaded, child.reset_index(drop=True))
+
+    proj = DataService.load_data_optimized(child_path, columns=["id", "scr"], dropna=["scr"])
+    assert proj["id"].tolist() == child["id"].tolist()
+
+    grandchild = loaded.iloc[:50].assign(flag=1)
+    gc_path = str(tmp_path / "grandchild.duckdb")
+    assert DataService.save_derived(grandchild, gc_path, child_path)
+    assert DataService.lineage_chain(gc_path) == [gc_path, child_path, root_file]
+    pd.testing.assert_frame_equal(DataService.load_data(gc_path), grandchild)
+
+
+def test_deep_chain_and_wide_changes_write_physical(root_file, tmp_path, monkeypatch):
+    parent = DataService.load_data(root_file)
+    wide = parent.assign(age=parent["age"] + 1, scr=parent["scr"] + 1, site="X")
+    assert not DataService.save_derived(wide, str(tmp_path / "wide.duckdb"), root_file)
+
+    monkeypatch.setattr(Config, "DELTA_MAX_DEPTH", 1)
+    first = str(tmp_path / "d1.duckdb")
+    second = str(tmp_path / "d2.duckdb")
+    assert DataService.save_derived(parent.assign(a=1), first, root_file)
+    assert not DataService.save_derived(DataService.load_data(first).assign(b=2), second, first)
+    assert DataService.read_lineage(second) is None
+
+
+def test_metadata_and_export_on_delta(root_file, tmp_path):
+    child_path = str(tmp_path / "child.duckdb")
+    DataService.save_derived(DataService.load_data(root_file).assign(flag=0), child_path, root_file)
+
+    meta = DataService.get_initial_metadata(child_path)
+    assert meta["row_count"] == 200
+    assert [v["name"] for v in meta["variables"]][-1] == "flag"
+
+    out = str(tmp_path / "out.csv")
+    DataService.export_to_csv(child_path, out)
+    assert len(pd.read_csv(out)) == 200
+
+
+def test_overwrite_parent_compacts_dependents(app, root_file, tmp_path):
+    project = Project(name="delta")
+    db.session.add(project)
+    db.session.commit()
+    root = Dataset(project_id=project.id, name="root", filepath=root_file)
+    db.session.add(root)
+    db.session.commit()
+
+    child = PreprocessingService.save_processed_dataset(
+        root.id, DataService.load_data(root_file).assign(flag=1), "flag", None)
+    assert DataService.read_lineage(child.filepath) is not None
+    expected = DataService.load_data(child.filepath)
+
+    PreprocessingService.save_processed_dataset(
+        root.id, pd.DataFrame({"id": [1, 2]}), "x", None, overwrite_id=root.id)
+
+    assert DataService.read_lineage(child.filepath) is None
+    pd.testing.assert_frame_equal(DataService.load_data(child.filepath), expected)
+
+
+def test_compact_all_orders_descendants_first(root_file, tmp_path):
+    a, b = str(tmp_path / "a.duckdb"), str(tmp_path / "b.duckdb")
+    assert DataService.save_derived(DataService.load_data(root_file).iloc[5:15], a, root_file)
+    df = DataService.load_data(a)
+    assert DataService.save_derived(df.assign(z=df["age"] * 10), b, a)
+    expected = DataService.load_data(b)
+
+    # 父在前传入：若先物化 a，b 按根表 rowid 引用的行会错位
+    assert DataService.compact_all([a, b, a]) == [b, a]
+    pd.testing.assert_frame_equal(DataService.load_data(b), expected)
+    assert DataService.read_lineage(b) is None
+
+
+def test_overwrite_compacts_descendants_before_ancestors(app, root_file):
+    project = Project(name="chain")
+    db.session.add(project)
+    db.session.commit()
+    root = Dataset(project_id=project.id, name="root", filepath=root_file)
+    db.session.add(root)
+    db.session.commit()
+
+    # root ← a ← b ← c ← d；数据集按从父到子的顺序创建，查询顺序即父先于子
+    a = PreprocessingService.save_processed_dataset(root.id, DataService.load_data(root_file).iloc[20:150], "a", None)
+    df = DataService.load_data(a.filepath)
+    b = PreprocessingService.save_processed_dataset(a.id, df.assign(z=df["age"] * 10), "b", None)
+    df = DataService.load_data(b.filepath)
+    c = PreprocessingService.save_processed_dataset(b.id, df.iloc[10:60].assign(w=1), "c", None)
+    df = DataService.load_data(c.filepath)
+    d = PreprocessingService.save_processed_dataset(c.id, df.iloc[::10].assign(v=2), "d", None)
+    assert len(DataService.lineage_chain(d.filepath)) == 5
+    expected = {ds.id: DataService.load_data(ds.filepath) for ds in (a, b, c, d)}
+
+    # 改写链中间的文件：只有它的后代被物化
+    PreprocessingService.save_processed_dataset(b.id, expected[b.id].head(3), "b2", None, overwrite_id=b.id)
+    assert DataService.read_lineage(c.filepath) is None and DataService.read_lineage(d.filepath) is None
+    for ds in (c, d):
+        pd.testing.assert_frame_equal(DataService.load_data(ds.filepath), expected[ds.id])
+
+    PreprocessingService.save_processed_dataset(root.id, pd.DataFrame({"id": [1, 2]}), "x", None, overwrite_id=root.id)
+    for ds in (a, c, d):
+        assert DataService.read_lineage(ds.filepath) is None
+        pd.testing.assert_frame_equal(DataService.load_data(ds.filepath), expected[ds.id])
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.services.data_service import DataService
+from app.services.distribution_service import DistributionService
+
+
+@pytest.fixture
+def cohort_file(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 91, 2000),
+        "sbp": rng.normal(130, 15, 2000),
+        "dose": 2.5,
+        "site": rng.choice(list("ABCDEFG"), 2000, p=[0.3, 0.2, 0.2, 0.1, 0.1, 0.05, 0.05]),
+    })
+    df.loc[::11, "sbp"] = np.nan
+    df.loc[::13, "site"] = None
+    path = str(tmp_path / "cohort.duckdb")
+    DataService.save_dataframe(df, path)
+    return path, df
+
+
+@pytest.mark.parametrize("bins", [20, 24, "fd", "sturges", "auto", [20.0, 40.0, 60.0, 80.0]])
+def test_histograms_match_numpy(cohort_file, bins):
+    path, df = cohort_file
+    result = DistributionService.batch(path, ["age", "sbp", "dose"], bins=bins)
+    for col in ("age", "sbp", "dose"):
+        counts, edges = np.histogram(df[col].dropna(), bins=bins)
+        assert result[col]["y"] == counts.tolist(), col
+        np.testing.assert_allclose(result[col]["edges"], edges)
+        assert result[col]["stats"]["n"] == df[col].count()
+
+
+def test_infinite_values_excluded(tmp_path):
+    path = str(tmp_path / "inf.duckdb")
+    df = pd.DataFrame({
+        "egfr": [60.0, np.inf, 90.0, -np.inf, np.nan, 75.0],
+        "log_crp": [-np.inf, np.inf, np.nan, -np.inf, np.nan, np.inf],
+        "age": [50, 60, 70, 80, 90, 55],
+    })
+    DataService.save_dataframe(df, path)
+    for bins in (5, "fd", [50.0, 70.0, 100.0]):
+        result = DistributionService.batch(path, bins=bins)
+        counts, _ = np.histogram([60.0, 90.0, 75.0], bins=bins)
+        assert result["egfr"]["y"] == counts.tolist()
+        assert result["egfr"]["stats"]["n"] == 3
+        assert result["egfr"]["stats"]["std"] == pytest.approx(np.std([60.0, 90.0, 75.0], ddof=1))
+        assert result["log_crp"] is None
+        assert sum(result["age"]["y"]) == 6
+
+
+def test_top_categories_with_other_bucket(cohort_file):
+    path, df = cohort_file
+    dist = DistributionService.distribution(path, "site", top_n=3)
+    expected = df["site"].value_counts()
+    assert dist["x"] == expected.index[:3].tolist()
+    assert dist["y"] == expected.iloc[:3].tolist()
+    assert dist["other"] == expected.iloc[3:].sum()
+    assert dist["stats"] == {"n": df["site"].count(), "unique": 7}
+    assert DistributionService.distribution(path, "missing_column") is None
+
+    with pytest.raises(ValueError):
+        DistributionService.parse_bins("0")
+    with pytest.raises(ValueError):
+        DistributionService.parse_bins("5,1")
+    assert DistributionService.parse_bins("0,10,20") == [0.0, 10.0, 20.0]
+
+
+def test_distribution_endpoints(client, auth_headers, upload, cohort_file):
+    _, df = cohort_file
+    headers = auth_headers
+    ds_id = upload(df).get_json()['dataset_id']
+
+    batch = client.get(f"/api/eda/distributions/{ds_id}", headers=headers,
+                       query_string={"columns": "age,site", "bins": "fd"}).get_json()["distributions"]
+    assert batch["age"]["y"] == np.histogram(df["age"], bins="fd")[0].tolist()
+    assert batch["site"]["type"] == "categorical"
+
+    single = client.get(f"/api/eda/distribution/{ds_id}/sbp", headers=headers, query_string={"bins": 10}).get_json()
+    assert single["type"] == "numerical" and sum(single["y"]) == df["sbp"].count()
+    assert client.get(f"/api/eda/distribution/{ds_id}/sbp", headers=headers,
+                      query_string={"bins": "many"}).status_code == 400
+
+    stats = client.post("/api/statistics/distribution", headers=headers,
+                        json={"dataset_id": ds_id, "variable": "sbp"}).get_json()["distribution"]
+    counts, edges = np.histogram(df["sbp"].dropna(), bins="auto")
+    assert stats["bins"]["counts"] == counts.tolist() and len(stats["curve"]["x"]) == 100
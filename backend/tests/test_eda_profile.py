@@ -0,0 +1,117 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from app.models.dataset import Dataset
+from app.services.correlation_service import CorrelationService
+from app.services.data_service import DataService
+from app.services.distribution_service import DistributionService
+from app.services.eda_profile_service import EdaProfileService
+from app.services.eda_service import EdaService
+
+
+def _frame(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 90, n),
+        "sbp": rng.normal(130, 15, n).round(1),
+        "site": [f"S{v}" for v in rng.integers(0, 30, n)],
+    })
+    df["dbp"] = (df["sbp"] * 0.6 + rng.normal(0, 3, n)).round(1)
+    return df
+
+
+@pytest.fixture
+def session(auth_headers, upload):
+    return auth_headers, lambda df: upload(df, "visits.csv").get_json()['dataset_id']
+
+
+def _wait_ready(client, ds_id, headers):
+    deadline = time.time() + 30
+    while True:
+        resp = client.get(f"/api/eda/profile/{ds_id}", headers=headers)
+        if resp.status_code != 202 or time.time() > deadline:
+            return resp
+        time.sleep(0.1)
+
+
+def test_endpoints_serve_the_stored_profile(client, session, monkeypatch):
+    headers, upload = session
+    df = _frame()
+    ds = Dataset.query.get(upload(df))
+    assert client.get(f"/api/eda/profile/{ds.id}", headers=headers).status_code == 202  # 未开启预计算时按需提交
+    assert _wait_ready(client, ds.id, headers).status_code == 200
+    assert os.path.exists(EdaProfileService.sidecar_path(ds.filepath))
+    expected_stats = client.get(f"/api/eda/stats/{ds.id}", headers=headers).get_json()["stats"]
+
+    def no_compute(*args, **kwargs):
+        raise AssertionError("served from the stored profile")
+    for owner, name in [(EdaService, "get_basic_stats_sql"), (DistributionService, "batch"),
+                        (CorrelationService, "dataset_matrix"), (CorrelationService, "dataset_top_pairs")]:
+        monkeypatch.setattr(owner, name, staticmethod(no_compute))
+
+    profile = client.get(f"/api/eda/profile/{ds.id}", headers=headers).get_json()
+    assert profile["status"] == "ready" and profile["stats"] == expected_stats
+    assert client.get(f"/api/eda/stats/{ds.id}", headers=headers).get_json()["stats"] == expected_stats
+    heatmap = client.get(f"/api/eda/correlation/{ds.id}", headers=headers).get_json()
+    assert heatmap["columns"] == ["age", "sbp", "dbp"]
+    top = client.get(f"/api/eda/correlation/{ds.id}", headers=headers, query_string={"top_k": 1}).get_json()
+    assert {top["pairs"][0]["x"], top["pairs"][0]["y"]} == {"sbp", "dbp"}
+
+    # 所需类别少于画像保存的类别：截断并把其余类别计入 other
+    site = client.get(f"/api/eda/distribution/{ds.id}/site", headers=headers, query_string={"top_n": 5}).get_json()
+    counts = df["site"].value_counts()
+    assert site["y"] == counts.iloc[:5].tolist() and site["other"] == counts.iloc[5:].sum()
+    thumbs = client.get(f"/api/eda/distributions/{ds.id}", headers=headers).get_json()["distributions"]
+    assert set(thumbs) == {"age", "sbp", "site", "dbp"}
+    assert thumbs["sbp"]["y"] == np.histogram(df["sbp"], bins=20)[0].tolist()
+
+    # 其他分箱参数仍然实时计算
+    resp = client.get(f"/api/eda/distribution/{ds.id}/sbp", headers=headers, query_string={"bins": 10})
+    assert resp.status_code == 500
+
+
+def test_profile_goes_stale_when_data_changes(session):
+    _, upload = session
+    ds = Dataset.query.get(upload(_frame()))
+    EdaProfileService.build(ds.filepath)
+    assert EdaProfileService.load(ds.filepath) is not None
+    DataService.save_dataframe(_frame(100, seed=1), ds.filepath)
+    assert EdaProfileService.load(ds.filepath) is None
+    assert EdaProfileService.build(ds.filepath)["stats"][0]["count"] == 100
+
+
+def test_profile_built_in_background_after_upload(client, app, session):
+    app.config['EDA_PROFILE_PRECOMPUTE'] = True
+    headers, upload = session
+    ds_id = upload(_frame())
+    resp = _wait_ready(client, ds_id, headers)
+    assert resp.status_code == 200
+    assert [s["name"] for s in resp.get_json()["stats"]] == ["age", "sbp", "site", "dbp"]
+
+
+def test_failed_build_is_reported_not_retried(client, app, session, monkeypatch):
+    headers, upload = session
+    ds = Dataset.query.get(upload(_frame()))
+    calls = []
+
+    def broken(*args, **kwargs):
+        calls.append(args)
+        raise RuntimeError("boom")
+    monkeypatch.setattr(EdaService, "get_basic_stats_sql", staticmethod(broken))
+
+    job = EdaProfileService.schedule(ds.filepath, force=True).wait(timeout=30)
+    assert job.status == "failed" and job.error == "boom"
+    resp = client.get(f"/api/eda/profile/{ds.id}", headers=headers)
+    assert resp.status_code == 500
+    assert resp.get_json()["status"] == "failed" and "boom" in resp.get_json()["message"]
+    assert EdaProfileService.schedule(ds.filepath, force=True) is None
+    assert len(calls) == 1
+
+    # 数据被改写后失败记录失效，重新构建
+    monkeypatch.undo()
+    DataService.save_dataframe(_frame(100, seed=1), ds.filepath)
+    assert EdaProfileService.failure(ds.filepath) is None
+    EdaProfileService.schedule(ds.filepath, force=True).wait(timeout=30)
+    assert client.get(f"/api/eda/profile/{ds.id}", headers=headers).status_code == 200
@@ -62,3 +62,52 @@ class TestEdaService:
         counts = dict(zip(dist['x'], dist['y']))
         assert counts['cat'] == 2
         assert counts['bird'] == 1
+
+
+def test_basic_stats_sql_matches_pandas(tmp_path, monkeypatch):
+    import duckdb
+    from app.config import Config
+    from app.services.data_service import DataService
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "age": rng.integers(18, 90, 500).astype(float),
+        "sbp": rng.normal(130, 15, 500),
+        "sex": rng.choice(["M", "F", "U"], 500, p=[0.5, 0.4, 0.1]),
+    })
+    df.loc[::7, "age"] = np.nan
+    df.loc[::9, "sex"] = None
+    # Derived columns (e.g. log(0)) may hold ±inf: std is None as in pandas instead of failing the request
+    df["ratio"] = df["sbp"] / 100
+    df.loc[3, "ratio"] = np.inf
+    df.loc[11, "ratio"] = -np.inf
+    path = str(tmp_path / "stats.duckdb")
+    con = duckdb.connect(path)
+    con.execute("CREATE TABLE data AS SELECT *, NULL::VARCHAR AS empty FROM df")
+    con.close()
+    df["empty"] = pd.Series([None] * 500, dtype=object)
+
+    expected = {s["name"]: s for s in EdaService.get_basic_stats(df)}
+    got = {s["name"]: s for s in EdaService.get_basic_stats_sql(path)}
+    assert list(got) == list(expected)
+    for name, ref in expected.items():
+        assert got[name].keys() == ref.keys(), name
+        for key, value in ref.items():
+            if isinstance(value, float):
+                assert got[name][key] == pytest.approx(value), (name, key)
+            elif key != "type":
+                assert got[name][key] == value, (name, key)
+
+    # Results are cached per file version; rewriting the file invalidates them
+    calls = []
+    real = EdaService._aggregate_stats
+    monkeypatch.setattr(EdaService, "_aggregate_stats", staticmethod(
+        lambda *args: calls.append(args[-1]) or real(*args)))
+    EdaService.get_basic_stats_sql(path)
+    assert calls == []
+    DataService.save_dataframe(df.head(100), path)
+    # Large tables use approximate quantiles unless exact ones are requested
+    monkeypatch.setattr(Config, "EDA_EXACT_STATS_MAX_ROWS", 10)
+    assert EdaService.get_basic_stats_sql(path)[0]["count"] == df["age"].head(100).count()
+    EdaService.get_basic_stats_sql(path, exact=True)
+    assert calls == [False, True]
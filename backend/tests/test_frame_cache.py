@@ -0,0 +1,98 @@
+import pytest
+import pandas as pd
+import numpy as np
+from app.services.data_service import DataService
+from app.utils.frame_cache import FrameCache, ResultCache, frame_cache
+
+
+@pytest.fixture
+def duckdb_frame():
+    return pd.DataFrame({"age": [25, 30, 35], "sex": ["M", "F", "M"], "val": [1.1, 2.2, 3.3]})
+
+
+def test_repeated_load_hits_cache(duckdb_file):
+    before = frame_cache.stats()
+    df1 = DataService.load_data(duckdb_file)
+    df2 = DataService.load_data(duckdb_file)
+    after = frame_cache.stats()
+
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 1
+    assert after['bytes'] > 0
+    pd.testing.assert_frame_equal(df1, df2)
+
+
+def test_projection_is_part_of_key(duckdb_file):
+    full = DataService.load_data(duckdb_file)
+    proj = DataService.load_data_optimized(duckdb_file, columns=['age'])
+    assert list(proj.columns) == ['age']
+    assert len(full.columns) == 3
+
+
+def test_cached_frame_is_isolated(duckdb_file):
+    df = DataService.load_data(duckdb_file)
+    # Adding columns only touches the caller's shallow copy
+    df['new'] = 1
+    assert 'new' not in DataService.load_data(duckdb_file).columns
+    # In-place value writes copy the column first and never leak into the shared cache
+    df.loc[0, 'age'] = 99
+    assert df['age'].iloc[0] == 99
+    assert DataService.load_data(duckdb_file)['age'].iloc[0] == 25
+
+
+def test_overwrite_invalidates(duckdb_file):
+    DataService.load_data(duckdb_file)
+    DataService.save_dataframe(pd.DataFrame({"age": [1]}), duckdb_file)
+    df = DataService.load_data(duckdb_file)
+    assert list(df.columns) == ['age']
+    assert len(df) == 1
+
+
+def test_eviction_by_bytes():
+    cache = FrameCache(max_bytes=2000)
+    big = pd.DataFrame({"x": np.arange(100, dtype='int64')})  # ~928 bytes incl. index
+    cache.put(('a', (1, 1), None, None), big.copy())
+    cache.put(('b', (1, 1), None, None), big.copy())
+    cache.put(('c', (1, 1), None, None), big.copy())
+
+    stats = cache.stats()
+    assert stats['bytes'] <= 2000
+    assert stats['evictions'] >= 1
+    assert cache.get(('a', (1, 1), None, None)) is None
+    assert cache.get(('c', (1, 1), None, None)) is not None
+
+
+def test_result_cache_lru_and_chain_invalidation(duckdb_file):
+    cache = ResultCache(max_entries=2)
+    base = (duckdb_file, DataService.chain_version(duckdb_file))
+    cache.put(base + ("a",), {"v": 1})
+    cache.put(base + ("b",), {"v": 2})
+    assert cache.get(base + ("a",)) == {"v": 1}
+    cache.put(base + ("c",), {"v": 3})  # "b" is least recently used
+    assert cache.get(base + ("b",)) is None
+    assert cache.find(base, lambda key, value: value["v"] if key[2] == "a" else None) == 1
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+    cache.invalidate(duckdb_file)
+    assert cache.stats()["entries"] == 0
+
+
+def test_result_caches_reported_by_stats_endpoint(client, auth_headers, duckdb_file):
+    from app.services.eda_service import EdaService
+    EdaService.get_basic_stats_sql(duckdb_file)
+    EdaService.get_basic_stats_sql(duckdb_file)
+    body = client.get("/api/data/cache/stats", headers=auth_headers).get_json()
+    assert {"eda_stats", "correlation", "eda_samples"} <= set(body["results"])
+    assert body["results"]["eda_stats"]["hits"] >= 1
+
+
+def test_delta_child_invalidated_when_ancestor_changes(tmp_path):
+    root = str(tmp_path / "root.duckdb")
+    child = str(tmp_path / "child.duckdb")
+    DataService.save_dataframe(pd.DataFrame({"x": np.arange(20)}), root)
+    base = DataService.load_data(root)
+    assert DataService.save_derived(base.iloc[5:15].assign(z=base["x"] * 10), child, root)
+    assert DataService.load_data(child)["x"].tolist() == list(range(5, 15))
+
+    # 只改写父文件（如自愈），子文件本身不变
+    DataService.save_dataframe(pd.DataFrame({"x": np.arange(20) + 100}), root)
+    assert DataService.load_data(child)["x"].tolist() == list(range(105, 115))
@@ -0,0 +1,71 @@
+import datetime
+import json
+import numpy as np
+import pandas as pd
+from flask import jsonify
+from app.services.data_service import DataService
+
+
+def test_jsonify_numpy_and_pandas(app):
+    payload = {
+        "pred": np.array([0.1, np.nan, np.inf]),
+        "codes": np.arange(6)[::2],
+        "n": np.int64(3),
+        "hr": np.float32(1.5),
+        "series": pd.Series([1.0, None]),
+        "labels": pd.Series(["a", None], dtype="string"),
+        "frame": pd.DataFrame({"x": [1, 2], "y": ["a", None]}),
+        "na": pd.NA,
+        "curves": {12: [0.5], 36.5: [0.25], np.int64(60): []},
+        "nan": float("nan"),
+    }
+    body = json.loads(jsonify(payload).get_data())
+    assert body == {
+        "pred": [0.1, None, None],
+        "codes": [0, 2, 4],
+        "n": 3,
+        "hr": 1.5,
+        "series": [1.0, None],
+        "labels": ["a", None],
+        "frame": [{"x": 1, "y": "a"}, {"x": 2, "y": None}],
+        "na": None,
+        "curves": {"12": [0.5], "36.5": [0.25], "60": []},
+        "nan": None,
+    }
+
+
+def test_jsonify_keeps_flask_formats(app):
+    when = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    resp = jsonify({"created_at": when, "b": 1, "a": "中文"})
+    assert resp.mimetype == "application/json"
+    text = resp.get_data(as_text=True)
+    # Keys stay sorted and dates keep Flask's RFC 822 format
+    assert text.index('"a"') < text.index('"b"')
+    assert json.loads(text) == {"created_at": "Tue, 02 Jan 2024 03:04:05 GMT", "b": 1, "a": "中文"}
+
+
+def test_request_json_round_trip(app, client):
+    assert app.json.loads(app.json.dumps({"x": [1, 2.5, None]})) == {"x": [1, 2.5, None]}
+    client.post("/api/auth/register", json={"username": "张三", "email": "z@example.com", "password": "pw123456"})
+    resp = client.post("/api/auth/login", json={"username": "张三", "password": "pw123456"})
+    assert resp.status_code == 200 and resp.get_json()["token"]
+
+
+def test_sanitize_numeric_lists_in_bulk():
+    obj = {
+        "pred": [0.5, float("nan"), float("inf")],
+        "grid": [[1.0, float("nan")], [2.0, 3.0]],
+        "ints": [np.int64(1), 2],
+        "array": np.array([1.0, np.nan]),
+        "mixed": [1, None, "a", float("nan")],
+        "rows": [{"v": np.float64("nan")}],
+    }
+    assert DataService.sanitize_for_json(obj) == {
+        "pred": [0.5, None, None],
+        "grid": [[1.0, None], [2.0, 3.0]],
+        "ints": [1, 2],
+        "array": [1.0, None],
+        "mixed": [1, None, "a", None],
+        "rows": [{"v": None}],
+    }
+    assert all(type(v) is int for v in DataService.sanitize_for_json([np.int64(1), 2]))
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app import db
+from app.models.dataset import Dataset
+from app.services.cohort_service import CohortService
+from app.services.data_service import DataService
+from app.services.merge_service import MergeService
+
+
+@pytest.fixture
+def project(auth_headers, upload):
+    rng = np.random.default_rng(0)
+    tables = {
+        "baseline": pd.DataFrame({"pid": np.arange(50), "age": rng.integers(20, 80, 50),
+                                  "value": rng.normal(size=50).round(3)}),
+        "labs": pd.DataFrame({"pid": rng.integers(0, 60, 120), "value": rng.normal(size=120).round(3),
+                              "test": rng.choice(["scr", "alb"], 120)}),
+        "visits_2": pd.DataFrame({"pid": [3, 4], "age": [41, 52], "visit": ["v2", "v2"]}),
+    }
+    ids = {name: upload(df, f"{name}.csv").get_json()['dataset_id'] for name, df in tables.items()}
+    return auth_headers, ids, tables
+
+
+@pytest.mark.parametrize("how", ["inner", "left", "right", "outer"])
+def test_join_matches_pandas_merge(client, project, how):
+    headers, ids, tables = project
+    resp = client.post(f"/api/data/{ids['baseline']}/join", headers=headers,
+                       json={"right_dataset_id": ids["labs"], "on": ["pid"], "how": how, "validate": "1:m"})
+    assert resp.status_code == 201
+    body = resp.get_json()
+    joined = Dataset.query.get(body["new_dataset_id"])
+    assert joined.parent_id == ids["baseline"] and joined.action_type == "join"
+
+    expected = tables["baseline"].merge(tables["labs"], on="pid", how=how)
+    got = DataService.load_data(joined.filepath)
+    assert body["row_count"] == len(expected) == joined.row_count
+    assert list(got.columns) == ["pid", "age", "value_x", "value_y", "test"] == body["columns"]
+    key = ["pid", "value_y"]
+    pd.testing.assert_frame_equal(got.sort_values(key, ignore_index=True),
+                                  expected.sort_values(key, ignore_index=True), check_dtype=False)
+    if how in ("inner", "left"):
+        # Rows keep the left table's order
+        assert got["pid"].is_monotonic_increasing
+
+
+def test_join_validation_and_errors(client, project):
+    headers, ids, _ = project
+    url = f"/api/data/{ids['baseline']}/join"
+    dup = client.post(url, headers=headers, json={"right_dataset_id": ids["labs"], "on": "pid", "validate": "1:1"})
+    assert dup.status_code == 400
+    assert client.post(url, headers=headers, json={"right_dataset_id": ids["labs"], "on": "nope"}).status_code == 400
+    assert client.post(url, headers=headers, json={"right_dataset_id": ids["labs"], "on": "pid",
+                                                   "how": "cross"}).status_code == 400
+    assert client.post(url, headers=headers, json={"right_dataset_id": 999, "on": "pid"}).status_code == 404
+
+    renamed = client.post(url, headers=headers, json={
+        "right_dataset_id": ids["labs"], "left_on": ["pid"], "right_on": ["pid"], "suffixes": ["", "_lab"]})
+    assert renamed.get_json()["columns"] == ["pid", "age", "value", "pid_lab", "value_lab", "test"]
+
+
+def test_append_batches(client, project):
+    headers, ids, tables = project
+    resp = client.post(f"/api/data/{ids['baseline']}/append", headers=headers,
+                       json={"dataset_ids": [ids["visits_2"]], "source_column": "batch"})
+    assert resp.status_code == 201
+    appended = Dataset.query.get(resp.get_json()["new_dataset_id"])
+    got = DataService.load_data(appended.filepath)
+    expected = pd.concat([tables["baseline"].assign(batch="baseline.csv"),
+                          tables["visits_2"].assign(batch="visits_2.csv")], ignore_index=True)
+    pd.testing.assert_frame_equal(got, expected[["pid", "age", "value", "batch", "visit"]], check_dtype=False)
+    assert appended.action_type == "append" and appended.row_count == 52
+
+    conflict = client.post(f"/api/data/{ids['baseline']}/append", headers=headers,
+                           json={"dataset_ids": [ids["visits_2"]], "source_column": "age"})
+    assert conflict.status_code == 400
+
+
+def test_join_reads_delta_inputs(project):
+    _, ids, tables = project
+    baseline = db.session.get(Dataset, ids["baseline"])
+    cohort, _ = CohortService.create_cohort(baseline, {"conditions": [{"column": "age", "op": "ge", "value": 50}]})
+    labs = db.session.get(Dataset, ids["labs"])
+    labs_cohort, _ = CohortService.create_cohort(labs, {"conditions": [{"column": "test", "op": "eq", "value": "scr"}]})
+
+    joined, info = MergeService.join(cohort, labs_cohort, on=["pid"], how="left")
+    base = tables["baseline"][tables["baseline"]["age"] >= 50]
+    labs_df = tables["labs"][tables["labs"]["test"] == "scr"]
+    expected = base.merge(labs_df, on="pid", how="left")
+    got = DataService.load_data(joined.filepath)
+    assert DataService.lineage_chain(joined.filepath) == [joined.filepath]
+    assert info["row_count"] == len(expected)
+    pd.testing.assert_frame_equal(got.sort_values(["pid", "value_y"], ignore_index=True),
+                                  expected.sort_values(["pid", "value_y"], ignore_index=True), check_dtype=False)
+
+    # Self-append reuses the attached file
+    doubled, info = MergeService.append(cohort, [cohort])
+    assert info["row_count"] == 2 * len(base)
@@ -0,0 +1,103 @@
+import os
+import pandas as pd
+import pytest
+from app.config import Config
+from app.services.data_service import DataService
+from app.services.profile_service import ProfileService
+
+
+@pytest.fixture
+def dataset_file(tmp_path):
+    path = str(tmp_path / "profile.duckdb")
+    df = pd.DataFrame({
+        "age": [float(20 + i) for i in range(40)],
+        "sex": ["M", "F", "F", None] * 10,
+        "flag": [0, 1] * 20,
+        "pid": [f"P{i:03d}" for i in range(40)],
+    })
+    df.loc[3, "age"] = None
+    DataService.save_dataframe(df, path)
+    return path
+
+
+def _by_name(profile):
+    return {c["name"]: c for c in profile["columns"]}
+
+
+def test_profile_single_scan_statistics(dataset_file):
+    cols = _by_name(ProfileService.profile(dataset_file))
+
+    assert cols["age"]["null_count"] == 1
+    assert cols["age"]["min"] == 20.0 and cols["age"]["max"] == 59.0
+    assert cols["age"]["quantiles"]["q50"] == pytest.approx(pd.Series([20 + i for i in range(40) if i != 3]).median())
+    assert cols["sex"]["distinct"] == 2
+    assert cols["sex"]["top_values"] == [["F", 20], ["M", 10]]
+    assert cols["pid"]["distinct"] == 40
+    assert cols["pid"]["top_values"] is not None  # 40 <= TOP_K
+
+
+def test_profile_infinite_values(tmp_path):
+    path = str(tmp_path / "inf.duckdb")
+    DataService.save_dataframe(pd.DataFrame({"egfr": [60.0, float("inf"), 90.0, float("-inf")]}), path)
+    col = _by_name(ProfileService.profile(path))["egfr"]
+    assert col["non_null"] == 4
+    assert col["std"] is None
+
+
+def test_metadata_heuristics_from_profile(dataset_file):
+    meta = DataService.get_initial_metadata(dataset_file)
+    variables = {v["name"]: v for v in meta["variables"]}
+
+    assert meta["row_count"] == 40
+    assert variables["age"]["type"] == "continuous"
+    assert variables["flag"]["type"] == "categorical"
+    assert sorted(variables["flag"]["categories"]) == [0, 1]
+    assert variables["sex"]["categories"] == ["F", "M"]
+    assert variables["sex"]["missing_count"] == 10
+    assert len(meta["preview"]) == 5
+
+
+def test_profile_persisted_and_invalidated(dataset_file, monkeypatch):
+    ProfileService.profile(dataset_file)
+    assert os.path.exists(ProfileService.sidecar_path(dataset_file))
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("profile should be served from the sidecar")
+    monkeypatch.setattr(ProfileService, "_scan", staticmethod(no_scan))
+    DataService.get_initial_metadata(dataset_file)
+
+    # Rewriting the file makes the sidecar stale
+    monkeypatch.undo()
+    DataService.save_dataframe(pd.DataFrame({"x": [1, 2]}), dataset_file)
+    assert ProfileService.load(dataset_file) is None
+    assert ProfileService.profile(dataset_file)["row_count"] == 2
+
+
+def test_profile_reuses_unchanged_columns(dataset_file, tmp_path, monkeypatch):
+    ProfileService.profile(dataset_file)
+    df = DataService.load_data(dataset_file).assign(age2=lambda d: d["age"] * 2)
+    derived = str(tmp_path / "derived.duckdb")
+    DataService.save_dataframe(df, derived)
+
+    scanned = []
+    original_scan = ProfileService._scan
+    def spy(con, source, columns, row_count):
+        scanned.extend(n for n, _ in columns)
+        return original_scan(con, source, columns, row_count)
+    monkeypatch.setattr(ProfileService, "_scan", staticmethod(spy))
+
+    profile = ProfileService.profile(derived, reuse_from=dataset_file, changed_columns=["age2"])
+    assert scanned == ["age2"]
+    assert [c["name"] for c in profile["columns"]] == ["age", "sex", "flag", "pid", "age2"]
+    assert _by_name(profile)["age2"]["max"] == 118.0
+
+
+def test_profile_approximate_mode(dataset_file, monkeypatch):
+    monkeypatch.setattr(Config, "PROFILE_EXACT_DISTINCT_MAX_ROWS", 10)
+    monkeypatch.setattr(Config, "PROFILE_BATCH_COLUMNS", 2)
+    ProfileService.remove(dataset_file)
+    cols = _by_name(ProfileService.profile(dataset_file))
+
+    # low-cardinality columns get exact counts back from the histogram pass
+    assert cols["sex"]["distinct"] == 2 and cols["sex"]["distinct_exact"]
+    assert cols["age"]["quantiles"]["q25"] is not None
@@ -113,3 +113,86 @@ def test_download_csv_export(target_db_file):
     finally:
         if os.path.exists(output_csv):
             os.remove(output_csv)
+
+def test_load_data_optimized_dropna_pushdown(target_db_file):
+    """Test projection plus non-null row filter pushed into DuckDB"""
+    con = duckdb.connect(target_db_file)
+    con.sql("CREATE OR REPLACE TABLE data (id INTEGER, time DOUBLE, event INTEGER, extra VARCHAR)")
+    con.sql("INSERT INTO data VALUES (1, 1.5, 1, 'a'), (2, NULL, 0, 'b'), (3, 3.0, NULL, 'c'), (4, 4.0, 0, NULL)")
+    con.close()
+
+    df = DataService.load_data_optimized(target_db_file, columns=['time', 'event'], dropna=['time', 'event'])
+    assert list(df.columns) == ['time', 'event']
+    assert len(df) == 2
+
+    # strict=False silently skips unknown columns (Table 1 style)
+    df = DataService.load_data_optimized(target_db_file, columns=['id', 'ghost'], strict=False)
+    assert list(df.columns) == ['id']
+
+def test_collect_columns():
+    cols = DataService.collect_columns('time', None, ['age', 'time'], {'scr': 'Scr', 'race': None}, '')
+    assert cols == ['time', 'age', 'Scr']
+
+def test_load_data_arrow_mode(target_db_file):
+    """Test Arrow-backed string columns and conversion back to numpy"""
+    pytest.importorskip("pyarrow")
+    from app.services.statistics_service import StatisticsService
+
+    con = duckdb.connect(target_db_file)
+    con.sql("CREATE OR REPLACE TABLE data AS SELECT range::INTEGER AS id, 'grp_' || (range % 3) AS grp, "
+            "CASE WHEN range % 7 = 0 THEN NULL ELSE 'note_' || range END AS note, range * 0.5 AS val FROM range(200)")
+    con.close()
+
+    df_np = DataService.load_data(target_db_file)
+    df_arrow = DataService.load_data(target_db_file, arrow=True)
+
+    assert df_np['grp'].dtype == object
+    assert isinstance(df_arrow['grp'].dtype, pd.StringDtype)
+    assert df_arrow['val'].dtype == 'float64'
+    assert df_arrow.memory_usage(deep=True).sum() < df_np.memory_usage(deep=True).sum()
+
+    # Conversion layer: numpy-only dtypes, NaN (not pd.NA) for missing strings
+    converted = DataService.to_numpy_frame(df_arrow)
+    assert converted['note'].dtype == object
+    assert converted['note'].isnull().sum() == df_np['note'].isnull().sum()
+    assert all(v is not pd.NA for v in converted['note'])
+
+    # Results are identical regardless of load mode
+    t_np = StatisticsService.generate_table_one(df_np, 'grp', ['val'])
+    t_arrow = StatisticsService.generate_table_one(df_arrow, 'grp', ['val'])
+    assert t_np['table_data'] == t_arrow['table_data']
+
+def test_ingest_xlsx_streams_batches(tmp_path, target_db_file, monkeypatch):
+    """XLSX is read in row batches; later batches widen column types instead of failing"""
+    from openpyxl import Workbook
+    from app.config import Config
+    monkeypatch.setattr(Config, "INGEST_BATCH_ROWS", 3)
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["id", "score", "code", None])
+    for i in range(1, 8):
+        # score turns float after the first batch, code turns text in the last batch
+        ws.append([i, i if i <= 3 else i + 0.5, i if i < 7 else "X7", None])
+    xlsx = str(tmp_path / "stream.xlsx")
+    wb.save(xlsx)
+
+    events = []
+    rows = DataService.ingest_data(xlsx, target_db_file,
+                                   progress_callback=lambda *args: events.append(args))
+
+    assert rows == 7
+    assert events[0][0] == 'reading'
+    assert events[-1] == ('done', os.path.getsize(xlsx), os.path.getsize(xlsx), 7)
+
+    df = DataService.load_data(target_db_file)
+    assert list(df.columns) == ["id", "score", "code", "Unnamed: 3"]
+    assert df["score"].tolist() == [1, 2, 3, 4.5, 5.5, 6.5, 7.5]
+    assert df["code"].tolist() == ["1", "2", "3", "4", "5", "6", "X7"]
+
+def test_load_data_large_csv_uses_duckdb(temp_csv_file, monkeypatch):
+    """Raw CSVs above MAX_FILE_SIZE_MB are parsed by DuckDB instead of being rejected"""
+    monkeypatch.setattr(DataService, "MAX_FILE_SIZE_MB", 0)
+    df = DataService.load_data(temp_csv_file)
+    assert len(df) == 4
+    assert list(df.columns) == ["id", "age", "sex", "group"]
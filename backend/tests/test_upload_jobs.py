@@ -0,0 +1,51 @@
+import time
+from app import db
+from app.models.dataset import Dataset
+from app.services.job_service import JobService
+
+
+def test_async_upload_flips_dataset_to_ready(client, auth_headers, upload, cohort_csv):
+    headers = auth_headers
+    resp = upload(cohort_csv, query_string={'async': 1})
+    assert resp.status_code == 202, resp.get_json()
+    body = resp.get_json()
+    assert body['status'] == 'pending'
+
+    JobService.get(body['job_id']).wait(timeout=30)
+
+    job = client.get(f"/api/data/jobs/{body['job_id']}", headers=headers).get_json()
+    assert job['status'] == 'succeeded', job
+    assert job['rows'] == 30
+    assert job['progress'] == 1.0
+
+    db.session.expire_all()
+    dataset = db.session.get(Dataset, body['dataset_id'])
+    assert dataset.status == 'ready'
+    assert dataset.meta_data['row_count'] == 30
+    assert dataset.project.active_dataset_id == dataset.id
+
+
+def test_job_cancellation_runs_cleanup():
+    cleaned = []
+
+    def slow(job):
+        for i in range(500):
+            job.update(phase='reading', rows=i)
+            time.sleep(0.01)
+        return 'never'
+
+    job = JobService.submit('test', slow, on_cancel=lambda j: cleaned.append(j.id))
+    time.sleep(0.05)
+    assert JobService.cancel(job.id)
+    job.wait(timeout=10)
+
+    assert job.status == 'cancelled'
+    assert job.result is None
+    assert cleaned == [job.id]
+    assert not JobService.cancel(job.id)
+
+
+def test_job_endpoint_hides_other_users_jobs(client, auth_headers):
+    headers = auth_headers
+    job = JobService.submit('test', lambda j: 1, owner_id=-1).wait(timeout=10)
+    assert client.get(f"/api/data/jobs/{job.id}", headers=headers).status_code == 404